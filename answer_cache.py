@@ -0,0 +1,78 @@
+import re
+import string
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_ENTRIES = 512
+ANSWER_TTL = 300  # Seconds an answer stays valid; the answers describe a live system
+SIMILARITY_THRESHOLD = 0.95  # Cosine similarity above which two questions count as the same
+
+PUNCTUATION = str.maketrans('', '', string.punctuation)
+WHITESPACE = re.compile(r'\s+')
+
+def normalize(question):
+    """Lower-case the question and drop punctuation and repeated whitespace."""
+    return WHITESPACE.sub(' ', question.lower().strip().translate(PUNCTUATION))
+
+class AnswerCache:
+    """Answers keyed by question: exact matches first, then paraphrases by embedding similarity.
+
+    embed must return unit-length vectors, so a dot product is the cosine similarity.
+    """
+
+    def __init__(self, embed, maxsize=MAX_ENTRIES, ttl=ANSWER_TTL, threshold=SIMILARITY_THRESHOLD):
+        self.embed = embed
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = OrderedDict()  # normalized question -> (answer, stored at), oldest first
+        self.keys = []  # Row i of vectors belongs to keys[i]
+        self.vectors = None
+        self.lock = threading.Lock()
+
+    def get(self, question):
+        """Return (answer, query vector); answer is None on a miss and the vector can be passed to put()."""
+        key = normalize(question)
+        with self.lock:
+            self._expire()
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0], None
+        vector = np.asarray(self.embed(question), dtype=np.float32)
+        with self.lock:
+            if self.vectors is not None and len(self.keys):
+                sims = self.vectors @ vector
+                best = int(sims.argmax())
+                if sims[best] >= self.threshold:
+                    match = self.keys[best]
+                    self.entries.move_to_end(match)
+                    return self.entries[match][0], vector
+        return None, vector
+
+    def put(self, question, answer, vector=None):
+        key = normalize(question)
+        if vector is None:
+            vector = np.asarray(self.embed(question), dtype=np.float32)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            while len(self.entries) >= self.maxsize:
+                self._remove(next(iter(self.entries)))  # Least recently used
+            self.entries[key] = (answer, time.time())
+            self.keys.append(key)
+            row = vector[np.newaxis, :]
+            self.vectors = row if self.vectors is None else np.vstack((self.vectors, row))
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for key in [k for k, (_, stored) in self.entries.items() if stored < cutoff]:
+            self._remove(key)
+
+    def _remove(self, key):
+        del self.entries[key]
+        row = self.keys.index(key)
+        del self.keys[row]
+        self.vectors = np.delete(self.vectors, row, axis=0)
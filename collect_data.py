@@ -7,13 +7,32 @@ import subprocess
 import shutil
 import time
 import argparse
+import glob
 import re
-from collections import OrderedDict
+import shlex
+import stat
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from tqdm import tqdm
 
+try:
+    import orjson  # Optional: much faster serializer for large NIC/sensor configs
+except ImportError:
+    orjson = None
+
 # -------------------- Helpers --------------------
 
-def locate_file(filename, default_paths=None, prompt_message=None):
+# Tool lookups don't change during a run, so resolve each tool only once
+_which = lru_cache(maxsize=None)(shutil.which)
+
+@lru_cache(maxsize=None)
+def _usable_path(path):
+    return os.path.exists(path) or os.access(os.path.dirname(path), os.W_OK)
+
+def locate_file(filename, default_paths=None, prompt_message=None, interactive=True):
     script_dir = os.path.dirname(os.path.abspath(__file__))
     if default_paths is None:
         default_paths = [
@@ -21,10 +40,12 @@ def locate_file(filename, default_paths=None, prompt_message=None):
             os.path.expanduser(os.path.join("~", filename)),
         ]
     for path in default_paths:
-        if os.path.exists(path) or os.access(os.path.dirname(path), os.W_OK):
+        if _usable_path(path):
             return path
     if prompt_message:
         print(prompt_message)
+    if not interactive:  # Called from the server or chatbot: nobody is reading stdin
+        return None
     while True:
         user_path = input(f"Enter path to '{filename}' (or press Enter to skip): ").strip()
         if not user_path:
@@ -34,7 +55,7 @@ def locate_file(filename, default_paths=None, prompt_message=None):
         print(f"Error: File '{user_path}' not found or directory not writable. Try again or skip.")
 
 def check_required_tools(tools):
-    missing = [t for t in tools if shutil.which(t) is None]
+    missing = [t for t in tools if _which(t) is None]
     for tool in missing:
         install_cmd = {
             "sensors": "sudo apt install lm-sensors",
@@ -66,18 +87,31 @@ def check_required_tools(tools):
         print(f"Missing '{tool}'. Install with: {install_cmd}")
     return missing
 
+# Commands containing any of these need a shell; everything else can be exec'd directly
+SHELL_METACHARS = re.compile(r"""[|&;<>()$`\\"'*?\[\]#~{}!\n]""")
+
 def run_command(cmd, error_msg=None):
+    """Run a shell command string, or an argv list/tuple directly without a shell."""
     try:
-        return subprocess.check_output(cmd, shell=True, text=True, stderr=subprocess.STDOUT).strip()
-    except subprocess.CalledProcessError:
+        return subprocess.check_output(cmd, shell=isinstance(cmd, str), text=True, stderr=subprocess.STDOUT).strip()
+    except (subprocess.CalledProcessError, OSError):
         if error_msg:
             print(f"Warning: {error_msg}")
         return None
 
-def is_valid_metric(metric):
-    cmd = metric["command"]
-    metric_type = metric["type"]
-    output = run_command(cmd, error_msg=None)
+@lru_cache(maxsize=None)
+def cached_run(cmd):
+    """Run a discovery probe once; repeated probes of the same command reuse the output."""
+    return run_command(cmd, error_msg=None)
+
+def plain_argv(cmd):
+    """Tokenize a config command that needs no shell features, else None."""
+    if SHELL_METACHARS.search(cmd):
+        return None
+    argv = shlex.split(cmd)
+    return argv if argv and "=" not in argv[0] else None
+
+def is_valid_output(metric_type, output):
     if output is None:  # Command failed (e.g., tool not found)
         return False
     if metric_type == "dynamic_single":  # Numeric metrics
@@ -89,21 +123,251 @@ def is_valid_metric(metric):
     else:  # static or dynamic_multi (e.g., rpm -qa)
         return bool(output.strip())  # True only if output is non-empty
 
-def detect_nics():
-    cmd = "ls /sys/class/net | grep -v lo"
-    output = run_command(cmd, "No network interfaces detected")
+BATCH_MARKER = "###BATCH###"
+
+def run_command_batch(cmds):
+    """Run commands through a single shell and return {cmd: output}, None where a command failed."""
+    cmds = list(dict.fromkeys(cmds))
+    if not cmds:
+        return {}
+    script = "".join(
+        f"printf '%s %d\\n' '{BATCH_MARKER}' {i}\n( {cmd}\n) 2>&1\nprintf '\\n%s %d %d\\n' '{BATCH_MARKER}' {i} $?\n"
+        for i, cmd in enumerate(cmds)
+    )
+    try:
+        proc = subprocess.run(["/bin/sh", "-c", script], stdin=subprocess.DEVNULL,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    except OSError:
+        return {cmd: run_command(cmd, error_msg=None) for cmd in cmds}
+    results = {}
+    current, lines = None, []
+    for line in proc.stdout.splitlines():
+        if line.startswith(BATCH_MARKER):
+            fields = line.split()
+            if len(fields) == 2:
+                current, lines = int(fields[1]), []
+            elif len(fields) == 3 and current is not None:
+                results[cmds[current]] = "\n".join(lines).strip() if fields[2] == "0" else None
+                current = None
+        elif current is not None:
+            lines.append(line)
+    return {cmd: results.get(cmd) for cmd in cmds}
+
+PIPELINE_STAGE = re.compile(r"\|\|?|&&|;|\$\(")
+ENV_ASSIGNMENT = re.compile(r"^\w+=")
+
+def command_tools(cmd):
+    """First word of every pipeline/list stage of a shell command, e.g. {'lscpu', 'grep', 'awk'}."""
+    tools = set()
+    for stage in PIPELINE_STAGE.split(cmd):
+        words = [w for w in stage.split() if not ENV_ASSIGNMENT.match(w)]
+        if words:
+            tools.add(words[0].lstrip("("))
+    return tools
+
+def uses_missing_tool(metric, missing_tools):
+    return metric["tool"] in missing_tools or not command_tools(metric["command"]).isdisjoint(missing_tools)
+
+def filter_valid_metrics(metrics, missing_tools=frozenset()):
+    # A command that needs a tool we already know is missing can't succeed; don't probe it
+    metrics = [m for m in metrics if not uses_missing_tool(m, missing_tools)]
+    outputs = run_command_batch(m["command"] for m in metrics)
+    return [m for m in metrics if is_valid_output(m["type"], outputs[m["command"]])]
+
+# -------------------- In-Process Sources --------------------
+
+# Outputs shared by many metrics are read once per collection pass and each
+# metric's value is resolved in Python instead of through its shell pipeline.
+# The "command" field is kept in the config for the other modules.
+_source_cache = {}
+_source_locks = {}
+_source_locks_guard = threading.Lock()
+# Commands sharing a "batch" key run together in one shell when the first is collected
+_batch_commands = {}
+
+def cached_source(key, loader):
+    # Metrics are collected concurrently; the per-key lock makes the first caller load and the rest wait
+    with _source_locks_guard:
+        lock = _source_locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _source_cache:
+            _source_cache[key] = loader()
+    return _source_cache[key]
+
+def load_sensors_json():
+    output = run_command(["sensors", "-j"], error_msg=None)
+    if output is None:
+        return {}
+    try:
+        return json.loads(output)
+    except json.JSONDecodeError:
+        return {}
+
+def resolve_sensor_value(metric):
+    value = cached_source("sensors_json", load_sensors_json)
+    for key in metric["path"]:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return str(value) if isinstance(value, (int, float)) else None
+
+def load_ethtool_stats(iface):
+    output = run_command(["ethtool", "-S", iface], error_msg=None)
     if output is None:
+        return {}
+    stats = {}
+    for line in output.splitlines():
+        if ':' in line:
+            key, value = line.split(':', 1)
+            stats[key.strip()] = value.strip()
+    return stats
+
+def resolve_ethtool_stat(metric):
+    iface = metric["iface"]
+    stats = cached_source(("ethtool_stats", iface), lambda: load_ethtool_stats(iface))
+    return stats.get(metric["stat"])
+
+def resolve_batched_command(metric):
+    batch = metric["batch"]
+    outputs = cached_source(("batch", batch), lambda: run_command_batch(_batch_commands.get(batch, [metric["command"]])))
+    return outputs.get(metric["command"])
+
+def read_proc_interrupts():
+    try:
+        with open("/proc/interrupts", "r") as f:
+            return f.read().splitlines()
+    except OSError:
         return []
-    interfaces = output.splitlines()
-    valid_nics = []
-    for iface in interfaces:
-        if run_command(f"ethtool -i {iface}", error_msg=None) is not None:
-            valid_nics.append(iface)
-    return valid_nics
 
-def detect_sensors():
-    cmd = "sensors -j"
-    output = run_command(cmd, error_msg=None)
+def resolve_interrupts(metric):
+    pattern = re.compile(metric["pattern"])
+    lines = [line for line in cached_source("proc_interrupts", read_proc_interrupts) if pattern.search(line)]
+    return "\n".join(lines).strip() if lines else None
+
+def load_ethernet_devices():
+    """Verbose lspci blocks for Ethernet controllers, split from a single lspci -v run."""
+    output = run_command(["lspci", "-v"], error_msg=None)
+    if output is None:
+        return []
+    blocks = [block.strip() for block in re.split(r"\n\s*\n", output) if block.strip()]
+    return [block for block in blocks if re.search(r"ethernet", block.splitlines()[0], re.I)]
+
+def resolve_lspci_ethernet(metric):
+    devices = cached_source("lspci_ethernet", load_ethernet_devices)
+    mode = metric["mode"]
+    if mode == "model":
+        lines = [block.splitlines()[0] for block in devices]
+    elif mode == "details":
+        lines = devices
+    else:  # sriov
+        lines = [line for block in devices for line in block.splitlines() if re.search(r"sriov", line, re.I)]
+    return "\n".join(lines) if lines else None
+
+def load_iostat():
+    """Parse one iostat -x 1 1 run into {device: [columns]} plus the header column names."""
+    output = run_command(["iostat", "-x", "1", "1"], error_msg=None)
+    if output is None:
+        return [], {}
+    header, rows = [], {}
+    for line in output.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        if fields[0].rstrip(":") == "Device":
+            header = fields
+        elif header:
+            rows[fields[0]] = fields
+    return header, rows
+
+def resolve_iostat_field(metric):
+    header, rows = cached_source("iostat", load_iostat)
+    row = rows.get(metric["disk"])
+    if row is None:
+        return None
+    # Prefer the named column; fall back to the awk column the command uses
+    index = header.index(metric["field"]) if metric["field"] in header else metric["column"] - 1
+    return row[index] if index < len(row) else None
+
+def resolve_file_read(metric):
+    """cat/grep equivalent for /proc and /sys files, read in-process."""
+    paths = sorted(glob.glob(metric["path"]))
+    pattern = re.compile(metric["grep"]) if metric.get("grep") else None
+    lines = []
+    for path in paths:
+        try:
+            with open(path, "r", errors="replace") as f:
+                content = f.read()
+        except OSError:
+            continue
+        if pattern is None:
+            lines.append(content.rstrip("\n"))
+            continue
+        prefix = f"{path}:" if len(paths) > 1 else ""
+        lines.extend(prefix + line for line in content.splitlines() if pattern.search(line))
+    return "\n".join(lines).strip() if lines else None
+
+PING_RTT = re.compile(r"time=([\d.]+)")
+PING_LOSS = re.compile(r"([\d.]+)% packet loss")
+
+def load_ping(host):
+    # ping exits non-zero on packet loss, but the loss figure is still wanted
+    try:
+        proc = subprocess.run(["ping", "-c", "1", "-W", "1", host], capture_output=True, text=True)
+    except OSError:
+        return {}
+    rtt = PING_RTT.search(proc.stdout)
+    loss = PING_LOSS.search(proc.stdout)
+    return {
+        "rtt": rtt.group(1) if rtt else None,
+        "loss": f"{loss.group(1)}%" if loss else None,
+    }
+
+def resolve_ping(metric):
+    host = metric["host"]
+    return cached_source(("ping", host), lambda: load_ping(host)).get(metric["field"])
+
+def resolve_ipmi_sensors(metric):
+    """Read sensors through the SDR dump while it still exists (cleanup may remove it), else enumerate live."""
+    cache = metric.get("sdr_cache")
+    if cache and os.path.isfile(cache):
+        return run_command(["ipmitool", "-S", cache, "sensor"], error_msg=None)
+    return run_command(["ipmitool", "sensor"], error_msg=None)
+
+SOURCE_RESOLVERS = {
+    "sensors_json": resolve_sensor_value,
+    "ethtool_stats": resolve_ethtool_stat,
+    "shell_batch": resolve_batched_command,
+    "proc_interrupts": resolve_interrupts,
+    "lspci_ethernet": resolve_lspci_ethernet,
+    "iostat": resolve_iostat_field,
+    "read_file": resolve_file_read,
+    "ping": resolve_ping,
+    "ipmi_sdr": resolve_ipmi_sensors,
+}
+
+def resolve_metric(metric):
+    resolver = SOURCE_RESOLVERS.get(metric.get("source"))
+    if resolver:
+        return resolver(metric)
+    return run_command(metric.get("argv") or metric["command"], error_msg=None)
+
+def detect_nics():
+    try:
+        interfaces = sorted(name for name in os.listdir("/sys/class/net") if name != "lo")
+    except OSError:
+        print("Warning: No network interfaces detected")
+        return []
+    if not interfaces:
+        return []
+    # Probe every interface at once; wall time is the slowest ethtool, not the sum
+    with ThreadPoolExecutor(max_workers=min(32, len(interfaces))) as pool:
+        results = pool.map(lambda iface: cached_run(("ethtool", "-i", iface)), interfaces)
+    return [iface for iface, output in zip(interfaces, results) if output is not None]
+
+@lru_cache(maxsize=None)
+def sensors_json_cached():
+    """Parsed sensors -j output shared by discovery and sensor metric generation."""
+    output = cached_run(("sensors", "-j"))
     if output is None:
         print("Warning: No sensor data available")
         return {}
@@ -113,20 +377,23 @@ def detect_sensors():
         print("Warning: Failed to parse sensor data")
         return {}
 
+def detect_sensors():
+    return sensors_json_cached()
+
 def detect_gpus():
     gpus = []
-    if run_command("nvidia-smi -L", error_msg=None) is not None:
+    if cached_run(("nvidia-smi", "-L")) is not None:
         gpus.append("nvidia")
-    if run_command("rocm-smi --showtemp --json", error_msg=None) is not None:
+    if cached_run(("rocm-smi", "--showtemp", "--json")) is not None:
         gpus.append("amd")
     return gpus
 
 def detect_disks():
-    cmd = "lsblk -d -o NAME,TYPE | grep disk | awk '{print $1}'"
-    output = run_command(cmd, "No physical disks detected")
+    output = run_command(["lsblk", "-nd", "-o", "NAME,TYPE"], "No physical disks detected")
     if output is None:
         return []
-    return output.splitlines()
+    rows = [line.split() for line in output.splitlines()]
+    return [row[0] for row in rows if len(row) == 2 and row[1] == "disk"]
 
 # -------------------- Discovery --------------------
 
@@ -141,13 +408,14 @@ def discover_components():
 
 # -------------------- Metric Generation Functions --------------------
 
+RELEVANT_STAT = re.compile(r"rx|tx|drop|error|packet|byte", re.I)
+
 def is_relevant_stat(stat):
-    keywords = ['rx', 'tx', 'drop', 'error', 'packet', 'byte']
-    return any(re.search(keyword, stat, re.I) for keyword in keywords)
+    return RELEVANT_STAT.search(stat) is not None
 
 def generate_nic_metrics(iface):
     base_cmd = f"ethtool -S {iface}"
-    base_output = run_command(base_cmd, error_msg=None)
+    base_output = cached_run(("ethtool", "-S", iface))
     if base_output is None:
         return []
     stats = [line.split(':')[0].strip() for line in base_output.splitlines() if ':' in line]
@@ -162,18 +430,17 @@ def generate_nic_metrics(iface):
                 "tool": "ethtool",
                 "command": cmd,
                 "type": "dynamic_single",
-                "subsection": f"{iface} {stat}"
+                "subsection": f"{iface} {stat}",
+                "source": "ethtool_stats",
+                "iface": iface,
+                "stat": stat
             })
     return metrics
 
 def generate_sensor_metrics():
     base_cmd = "sensors -j"
-    base_output = run_command(base_cmd, error_msg=None)
-    if base_output is None:
-        return []
-    try:
-        sensors_data = json.loads(base_output)
-    except json.JSONDecodeError:
+    sensors_data = sensors_json_cached()
+    if not sensors_data:
         return []
     metrics = [
         {"name": "sensors_full", "tool": "sensors", "command": base_cmd, "type": "dynamic_multi", "subsection": "Environmental Parameters"}
@@ -190,13 +457,15 @@ def generate_sensor_metrics():
                             "tool": "sensors",
                             "command": cmd,
                             "type": "dynamic_single",
-                            "subsection": f"{chip} {key} {subkey}"
+                            "subsection": f"{chip} {key} {subkey}",
+                            "source": "sensors_json",
+                            "path": [chip, key, subkey]
                         })
     return metrics
 
 def generate_disk_metrics(disk):
     base_cmd = f"iostat -x 1 1 {disk}"
-    base_output = run_command(base_cmd, error_msg=None)
+    base_output = cached_run(("iostat", "-x", "1", "1", disk))
     if base_output is None or disk not in base_output:
         return []
     metrics = [
@@ -215,19 +484,85 @@ def generate_disk_metrics(disk):
             "tool": "iostat",
             "command": cmd,
             "type": "dynamic_single",
-            "subsection": f"{disk} {description}"
+            "subsection": f"{disk} {description}",
+            "source": "iostat",
+            "disk": disk,
+            "field": field_name,
+            "column": col
         })
     return metrics
 
 def is_ipmi_supported():
-    if shutil.which("ipmitool") is None:
+    if _which("ipmitool") is None:
         return False
-    cmd = "ipmitool -I open chassis status"
-    return run_command(cmd, error_msg=None) is not None
+    return cached_run(("ipmitool", "-I", "open", "chassis", "status")) is not None
+
+# Private to the user running discovery (usually root): a fixed name in a shared /tmp or /var/tmp
+# could be pre-planted or symlinked, and ipmitool -S trusts whatever SDR data it finds there
+IPMI_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "collect_data")
+IPMI_SDR_CACHE = os.path.join(IPMI_CACHE_DIR, "ipmisdr.cache")
+
+def private_cache_dir():
+    """Create IPMI_CACHE_DIR with mode 0700; None when it exists but isn't ours alone."""
+    try:
+        os.makedirs(IPMI_CACHE_DIR, mode=0o700, exist_ok=True)
+        st = os.lstat(IPMI_CACHE_DIR)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        return None
+    return IPMI_CACHE_DIR
+
+def dump_ipmi_sdr_cache():
+    """Dump the SDR repository once so sensor reads can skip re-enumerating it."""
+    if private_cache_dir() is None:
+        return False
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=IPMI_CACHE_DIR, prefix="ipmisdr.")
+    except OSError:
+        return False
+    os.close(fd)
+    try:
+        if run_command(["ipmitool", "sdr", "dump", temp_path], error_msg=None) is None or not os.path.getsize(temp_path):
+            return False
+        os.replace(temp_path, IPMI_SDR_CACHE)
+        return True
+    except OSError:
+        return False
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
 # -------------------- Config Generation --------------------
 
-def generate_config(components):
+CONFIG_MAX_AGE = 600  # Seconds a generated metrics_config.json is reused without rediscovery
+
+def load_fresh_config(max_age=CONFIG_MAX_AGE, interactive=True):
+    """Return the existing metrics_config.json if it is recent enough to skip discovery, else None."""
+    config_path = locate_file("metrics_config.json", interactive=interactive)
+    if not config_path or not os.path.exists(config_path):
+        return None
+    mtime = os.path.getmtime(config_path)
+    if max_age is not None and time.time() - mtime > max_age:
+        return None
+    # Interfaces added or removed after the config was written invalidate it
+    try:
+        if os.path.getmtime("/sys/class/net") > mtime:
+            return None
+    except OSError:
+        pass
+    try:
+        with open(config_path, "r") as f:
+            config = json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not read existing config: {e}")
+        return None
+    if not config.get("sections"):
+        return None
+    print(f"♻️ Reusing metrics_config.json at {config_path} (pass --force-discover to regenerate)")
+    return config
+
+def generate_config(components, interactive=True):
     all_tools = [
         "lscpu", "top", "lspci", "sensors", "dmidecode", "free", "ip", "ethtool",
         "ipmitool", "lsusb", "numactl", "dpkg-query", "rpm", "ps", "systemctl",
@@ -235,19 +570,22 @@ def generate_config(components):
         "dpdk-devbind", "ibv_devinfo"
     ]
     missing_tools = check_required_tools(all_tools)
+    missing = frozenset(missing_tools)
     comments = ["Generated by system_info.py"]
     if missing_tools:
         comments.append(f"Missing tools: {', '.join(missing_tools)}")
     comments.append("NIC documentation (primary page, specifications, manuals) available via Grok Q&A in upgrade_recommender.py")
 
-    # Load existing custom metrics
+    # Load existing custom metrics; the same path is used to save the new config
     custom_metrics = []
-    config_path = locate_file("metrics_config.json")
+    config_path = locate_file("metrics_config.json", prompt_message="Cannot write to default paths for metrics_config.json.", interactive=interactive)
     if config_path and os.path.exists(config_path):
         try:
             with open(config_path, "r") as f:
                 existing_config = json.load(f)
                 custom_metrics = existing_config.get("custom_metrics", [])
+            for metric in custom_metrics:
+                metric.pop("argv", None)  # Derived by older versions; would outlive an edited command
             print(f"Loaded custom_metrics: {custom_metrics}")
         except Exception as e:
             print(f"Warning: Could not read existing config: {e}")
@@ -260,26 +598,26 @@ def generate_config(components):
         "CPU Info": [
             {"name": "cpu_info", "tool": "lscpu", "command": "lscpu", "type": "static", "subsection": "CPU Info"},
             {"name": "cpu_frequency", "tool": "lscpu", "command": "lscpu | grep -i 'cpu.*mhz' | awk '{print $3}'", "type": "dynamic_single", "subsection": "CPU Frequency"},
-            {"name": "cpu_scaling_governor", "tool": "cat", "command": "cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_governor 2>/dev/null", "type": "dynamic_multi", "subsection": "CPU Scaling Governor"},
+            {"name": "cpu_scaling_governor", "tool": "cat", "command": "cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_governor 2>/dev/null", "type": "dynamic_multi", "subsection": "CPU Scaling Governor", "source": "read_file", "path": "/sys/devices/system/cpu/cpu0/cpufreq/scaling_governor"},
             {"name": "cpu_utilization", "tool": "top", "command": "top -bn1 | head -n3", "type": "dynamic_multi", "subsection": "CPU Utilization Snapshot"},
-            {"name": "cpu_mitigations", "tool": "grep", "command": "grep . /sys/devices/system/cpu/vulnerabilities/* 2>/dev/null", "type": "static", "subsection": "CPU Mitigations"},
+            {"name": "cpu_mitigations", "tool": "grep", "command": "grep . /sys/devices/system/cpu/vulnerabilities/* 2>/dev/null", "type": "static", "subsection": "CPU Mitigations", "source": "read_file", "path": "/sys/devices/system/cpu/vulnerabilities/*", "grep": "."},
             {"name": "realtime_kernel", "tool": "uname", "command": "uname -r | grep -qi 'rt' && echo 'Real-time kernel detected' || echo 'Standard kernel'", "type": "static", "subsection": "Real-Time Kernel Check"},
             {"name": "cache_misses", "tool": "perf", "command": "perf stat -e cache-misses sleep 1 2>&1 | awk '/cache-misses/ {print $1}'", "type": "dynamic_single", "subsection": "Cache Misses"}
         ],
         "NIC Model Info": [
-            {"name": "nic_model", "tool": "lspci", "command": "lspci | grep -i ethernet", "type": "static", "subsection": "NIC Model"},
-            {"name": "nic_details", "tool": "lspci", "command": "lspci -v -s $(lspci | grep -i ethernet | awk '{print $1}') 2>/dev/null", "type": "static", "subsection": "NIC Details"},
-            {"name": "nic_sriov", "tool": "lspci", "command": "lspci -v -s $(lspci | grep -i ethernet | awk '{print $1}') | grep -i sriov 2>/dev/null", "type": "static", "subsection": "SR-IOV Support"}
+            {"name": "nic_model", "tool": "lspci", "command": "lspci | grep -i ethernet", "type": "static", "subsection": "NIC Model", "source": "lspci_ethernet", "mode": "model"},
+            {"name": "nic_details", "tool": "lspci", "command": "lspci -v -s $(lspci | grep -i ethernet | awk '{print $1}') 2>/dev/null", "type": "static", "subsection": "NIC Details", "source": "lspci_ethernet", "mode": "details"},
+            {"name": "nic_sriov", "tool": "lspci", "command": "lspci -v -s $(lspci | grep -i ethernet | awk '{print $1}') | grep -i sriov 2>/dev/null", "type": "static", "subsection": "SR-IOV Support", "source": "lspci_ethernet", "mode": "sriov"}
         ],
         "Memory Info": [
             {"name": "memory_hardware", "tool": "dmidecode", "command": "dmidecode -t memory 2>/dev/null", "type": "static", "subsection": "Hardware Memory Info"},
             {"name": "memory_utilization", "tool": "free", "command": "free -h", "type": "dynamic_multi", "subsection": "Memory Utilization"},
-            {"name": "memory_details", "tool": "cat", "command": "cat /proc/meminfo", "type": "dynamic_multi", "subsection": "Memory Details"},
-            {"name": "hugepages", "tool": "grep", "command": "grep HugePages /proc/meminfo", "type": "dynamic_multi", "subsection": "Hugepages"}
+            {"name": "memory_details", "tool": "cat", "command": "cat /proc/meminfo", "type": "dynamic_multi", "subsection": "Memory Details", "source": "read_file", "path": "/proc/meminfo"},
+            {"name": "hugepages", "tool": "grep", "command": "grep HugePages /proc/meminfo", "type": "dynamic_multi", "subsection": "Hugepages", "source": "read_file", "path": "/proc/meminfo", "grep": "HugePages"}
         ],
         "/proc Snapshots": [
-            {"name": "proc_cpuinfo", "tool": "cat", "command": "cat /proc/cpuinfo", "type": "static", "subsection": "/proc/cpuinfo"},
-            {"name": "proc_net_dev", "tool": "cat", "command": "cat /proc/net/dev", "type": "dynamic_multi", "subsection": "/proc/net_dev"}
+            {"name": "proc_cpuinfo", "tool": "cat", "command": "cat /proc/cpuinfo", "type": "static", "subsection": "/proc/cpuinfo", "source": "read_file", "path": "/proc/cpuinfo"},
+            {"name": "proc_net_dev", "tool": "cat", "command": "cat /proc/net/dev", "type": "dynamic_multi", "subsection": "/proc/net_dev", "source": "read_file", "path": "/proc/net/dev"}
         ],
         "NUMA Topology": [
             {"name": "numa_topology", "tool": "numactl", "command": "numactl -H", "type": "static", "subsection": "NUMA Topology"}
@@ -306,8 +644,8 @@ def generate_config(components):
             {"name": "usb_verbose", "tool": "lsusb", "command": "lsusb -v 2>/dev/null", "type": "static", "subsection": "USB Devices (Verbose)"}
         ],
         "Network Interface Configuration": [
-            {"name": "ping_rtt", "tool": "ping", "command": "ping -c 1 google.com | grep 'time=' | awk '{print $7}' | cut -d'=' -f2", "type": "dynamic_single", "subsection": "Ping RTT"},
-            {"name": "ping_loss", "tool": "ping", "command": "ping -c 1 google.com | grep 'packet loss' | awk '{print $6}'", "type": "dynamic_single", "subsection": "Ping Loss"}
+            {"name": "ping_rtt", "tool": "ping", "command": "ping -c 1 google.com | grep 'time=' | awk '{print $7}' | cut -d'=' -f2", "type": "dynamic_single", "subsection": "Ping RTT", "source": "ping", "host": "google.com", "field": "rtt"},
+            {"name": "ping_loss", "tool": "ping", "command": "ping -c 1 google.com | grep 'packet loss' | awk '{print $6}'", "type": "dynamic_single", "subsection": "Ping Loss", "source": "ping", "host": "google.com", "field": "loss"}
         ],
         "NIC Firmware Info": [],
         "Disk Info": [],
@@ -318,23 +656,26 @@ def generate_config(components):
     # Filter predefined metrics
     sections = {}
     for title, metrics in predefined_metrics.items():
-        sections[title] = [m for m in metrics if is_valid_metric(m)]
+        sections[title] = filter_valid_metrics(metrics, missing)
 
     # Add IPMI metrics if supported
     if is_ipmi_supported():
+        ipmi_sensors = {"name": "ipmi_sensors", "tool": "ipmitool", "command": "ipmitool sensor", "type": "dynamic_multi", "subsection": "IPMI Sensor Readings"}
+        if dump_ipmi_sdr_cache():
+            ipmi_sensors.update({"source": "ipmi_sdr", "sdr_cache": IPMI_SDR_CACHE})
         ipmi_metrics = [
-            {"name": "ipmi_sensors", "tool": "ipmitool", "command": "ipmitool sensor", "type": "dynamic_multi", "subsection": "IPMI Sensor Readings"},
+            ipmi_sensors,
             {"name": "ipmi_sel", "tool": "ipmitool", "command": "ipmitool sel list", "type": "dynamic_multi", "subsection": "IPMI SEL Log"},
             {"name": "ipmi_fru", "tool": "ipmitool", "command": "ipmitool fru", "type": "static", "subsection": "IPMI FRU Info"}
         ]
-        sections["IPMI / BMC Data"] = [m for m in ipmi_metrics if is_valid_metric(m)]
+        sections["IPMI / BMC Data"] = filter_valid_metrics(ipmi_metrics, missing)
     else:
         sections["IPMI / BMC Data"] = []
 
     # Add NIC model info with DPDK and RDMA if tools are present
     nic_model_metrics = []
     for iface in components["nics"]:
-        if shutil.which("dpdk-devbind"):
+        if _which("dpdk-devbind"):
             nic_model_metrics.append({
                 "name": f"{iface}_dpdk_status",
                 "tool": "dpdk-devbind",
@@ -342,7 +683,7 @@ def generate_config(components):
                 "type": "static",
                 "subsection": f"{iface} DPDK Status"
             })
-        if shutil.which("ibv_devinfo"):
+        if _which("ibv_devinfo"):
             nic_model_metrics.append({
                 "name": f"{iface}_rdma_info",
                 "tool": "ibv_devinfo",
@@ -361,7 +702,7 @@ def generate_config(components):
             {"name": "cpu_vcore", "tool": "sensors", "command": "sensors | awk '/Vcore:/ {print $2}'", "type": "dynamic_single", "subsection": "CPU Vcore"},
             {"name": "fan1_speed", "tool": "sensors", "command": "sensors | awk '/[Ff]an1:/ {print $2}'", "type": "dynamic_single", "subsection": "Fan1 Speed"}
         ]
-        sections["Environmental Parameters"] = [m for m in fallback_metrics if is_valid_metric(m)]
+        sections["Environmental Parameters"] = filter_valid_metrics(fallback_metrics, missing)
 
     # Add NIC configuration metrics
     nic_config_metrics = []
@@ -375,13 +716,18 @@ def generate_config(components):
             (f"cat /proc/interrupts | grep -E '{iface}|virtio[0-9]'", "Interrupt Distribution"),
         ]:
             cmd = cmd_type
-            nic_config_metrics.append({
+            metric = {
                 "name": f"{iface}_{subsection.lower().replace(' ', '_')}",
                 "tool": "ethtool" if "ethtool" in cmd_type else "cat",
                 "command": cmd,
                 "type": "dynamic_multi",
                 "subsection": f"{iface} {subsection}"
-            })
+            }
+            if metric["tool"] == "ethtool":
+                metric.update({"source": "shell_batch", "batch": f"{iface}_config"})
+            else:
+                metric.update({"source": "proc_interrupts", "pattern": f"{re.escape(iface)}|virtio[0-9]"})
+            nic_config_metrics.append(metric)
         sections["NIC Firmware Info"].append({
             "name": f"{iface}_firmware",
             "tool": "ethtool",
@@ -410,6 +756,17 @@ def generate_config(components):
             )
     sections["GPU Info"] = gpu_metrics
 
+    # Record an argv for commands that don't need a shell so collection can skip /bin/sh.
+    # Custom metrics are the user's own entries and can be edited later, so they always run their command.
+    for title, metrics in sections.items():
+        if title == "Custom Metrics":
+            continue
+        for metric in metrics:
+            if "source" not in metric:
+                argv = plain_argv(metric["command"])
+                if argv:
+                    metric["argv"] = argv
+
     # Generate config
     config = {
         "comments": comments,
@@ -417,15 +774,18 @@ def generate_config(components):
         "sections": [{"title": title, "metrics": metrics} for title, metrics in sections.items()]
     }
     print(f"Saving config with custom_metrics: {config['custom_metrics']}")
-    config_path = locate_file("metrics_config.json", prompt_message="Cannot write to default paths for metrics_config.json.")
     if not config_path:
         print("Error: No valid output path for metrics_config.json.")
         sys.exit(1)
     temp_path = config_path + ".tmp"
     try:
-        with open(temp_path, "w") as f:
-            json.dump(config, f, indent=2)
-        shutil.move(temp_path, config_path)
+        if orjson is not None:
+            payload = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(config, indent=2).encode("utf-8")
+        with open(temp_path, "wb", buffering=1 << 16) as f:
+            f.write(payload)
+        os.replace(temp_path, config_path)
     except Exception as e:
         print(f"Error: Failed to write metrics_config.json: {e}")
         sys.exit(1)
@@ -434,80 +794,133 @@ def generate_config(components):
 
 # -------------------- Collection --------------------
 
-def collect_metrics(config, output_path):
-    tools = set(metric["tool"] for section in config["sections"] for metric in section["metrics"])
-    missing_tools = [tool for tool in tools if shutil.which(tool) is None]
+# Flattened view of one config metric; the collection loops use attribute
+# access on these instead of re-indexing the nested section/metric dicts
+CollectJob = namedtuple("CollectJob", "section subsection command tool available metric")
+
+def collect_metrics(config, output_path, verbose=True):
+    jobs = [
+        CollectJob(s_idx, metric["subsection"], metric["command"], metric["tool"], _which(metric["tool"]) is not None, metric)
+        for s_idx, section in enumerate(config["sections"])
+        for metric in section["metrics"]
+    ]
+    missing_tools = sorted({job.tool for job in jobs if not job.available})
     if missing_tools:
         print(f"Missing tools: {', '.join(missing_tools)}. Some metrics may not be collected.")
 
     try:
-        open(output_path, "w").close()
+        out = open(output_path, "w", buffering=1 << 16)
     except Exception as e:
         print(f"Error: Cannot write to {output_path}: {e}")
         sys.exit(1)
-
-    with open(output_path, "a") as out:
-        out.write(f"System metrics collection started at {time.ctime()}\n")
+    # Collection must see live values, not discovery-time probe output
+    cached_run.cache_clear()
+    sensors_json_cached.cache_clear()
+    _source_cache.clear()
+    _source_locks.clear()
+    _batch_commands.clear()
+    for job in jobs:
+        if job.metric.get("source") == "shell_batch":
+            _batch_commands.setdefault(job.metric["batch"], []).append(job.command)
+
+    started = time.ctime()
+    # Most metrics block on a subprocess (ping, iostat, perf sleep), so run them
+    # concurrently and write the results back in config order afterwards
+    outputs = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+        futures = {pool.submit(resolve_metric, job.metric): i for i, job in enumerate(jobs) if job.available}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Collecting metrics", disable=not verbose):
+            outputs[futures[future]] = future.result()
+
+    titles = [section["title"] for section in config["sections"]]
+    section_jobs = [[] for _ in titles]
+    for i, job in enumerate(jobs):
+        section_jobs[job.section].append(i)
 
     summary = []
-    for section in tqdm(config["sections"], desc="Collecting sections"):
-        with open(output_path, "a") as out:
-            out.write(f"\n=== {section['title']} ===\n")
-        if not section["metrics"]:
-            with open(output_path, "a") as out:
+    with out:
+        out.write(f"System metrics collection started at {started}\n")
+        for title, indices in zip(titles, section_jobs):
+            out.write(f"\n=== {title} ===\n")
+            if not indices:
                 out.write("No applicable metrics found.\n")
-        else:
-            for metric in section["metrics"]:
-                with open(output_path, "a") as out:
-                    out.write(f"\n--- {metric['subsection']} ---\n")
-                cmd = metric["command"]
-                tool = metric["tool"]
-                if shutil.which(tool) is None:
-                    with open(output_path, "a") as out:
-                        out.write(f"Tool '{tool}' not found.\n")
-                    summary.append([section["title"], metric["subsection"], cmd, "Failed (Tool not found)"])
+                continue
+            for i in indices:
+                job = jobs[i]
+                out.write(f"\n--- {job.subsection} ---\n")
+                if not job.available:
+                    out.write(f"Tool '{job.tool}' not found.\n")
+                    summary.append([title, job.subsection, job.command, "Failed (Tool not found)"])
                     continue
-                output = run_command(cmd, error_msg=None)
+                output = outputs[i]
                 if output is not None:
-                    with open(output_path, "a") as out:
-                        out.write(output + "\n")
-                    summary.append([section["title"], metric["subsection"], cmd, "Success"])
+                    out.write(output + "\n")
+                    summary.append([title, job.subsection, job.command, "Success"])
                 else:
-                    with open(output_path, "a") as out:
-                        out.write("N/A\n")
-                    summary.append([section["title"], metric["subsection"], cmd, "Failed (Command failed)"])
+                    out.write("N/A\n")
+                    summary.append([title, job.subsection, job.command, "Failed (Command failed)"])
 
-    print("\n=== Data Collection Summary ===")
+    if not verbose:
+        return
+    lines = ["\n=== Data Collection Summary ==="]
     current_section = None
     for title, subsection, cmd, status in summary:
         if title != current_section:
             if current_section is not None:
-                print()
-            print(f"**{title}**")
+                lines.append("")
+            lines.append(f"**{title}**")
             current_section = title
         icon = "✅" if "Success" in status else "❌"
         reason = status.replace("Failed ", "") if "Failed" in status else ""
-        print(f"{subsection}\n  {icon} {cmd}{(' (' + reason + ')') if reason else ''}")
-    print(f"\n✅ Data collection complete. Output saved to {output_path}")
+        lines.append(f"{subsection}\n  {icon} {cmd}{(' (' + reason + ')') if reason else ''}")
+    lines.append(f"\n✅ Data collection complete. Output saved to {output_path}")
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
 
 # -------------------- Main --------------------
 
+# collect() resets the module's source caches, so runs from one process (the server, the chatbot) take turns
+_collect_lock = threading.Lock()
+
+def collect(output_path=None, reuse_config=False, force_discover=True, interactive=False):
+    """Discover components when needed, collect every metric and return the path written.
+
+    Callers (the server's /collect, the chatbot's refresh) rediscover every time by default;
+    only the command line reuses a metrics_config.json younger than CONFIG_MAX_AGE.
+
+    Only the command line is interactive: it may prompt for paths and prints the progress bar
+    and per-metric summary. Other callers get no prompts and just the warnings.
+    """
+    with _collect_lock:
+        # Tools installed, folders created and hardware probes answered since the last run in this process count now
+        _which.cache_clear()
+        _usable_path.cache_clear()
+        cached_run.cache_clear()
+        output_path = output_path or locate_file(
+            "system_info.txt",
+            prompt_message="Could not locate system_info.txt in default paths.",
+            interactive=interactive
+        )
+        if not output_path:
+            print("Error: No output path specified for system_info.txt.")
+            sys.exit(1)
+
+        config = None
+        if not force_discover:
+            config = load_fresh_config(None if reuse_config else CONFIG_MAX_AGE, interactive=interactive)
+        if config is None:
+            components = discover_components()
+            config = generate_config(components, interactive=interactive)
+        collect_metrics(config, output_path, verbose=interactive)
+    return output_path
+
 def main():
     parser = argparse.ArgumentParser(description="Discover system components and collect metrics.")
     parser.add_argument("--output", help="Path to output file (default: system_info.txt)")
+    parser.add_argument("--reuse-config", action="store_true", help="Reuse an existing metrics_config.json regardless of its age")
+    parser.add_argument("--force-discover", action="store_true", help="Always rediscover components and regenerate metrics_config.json")
     args = parser.parse_args()
-
-    output_path = args.output if args.output else locate_file(
-        "system_info.txt",
-        prompt_message="Could not locate system_info.txt in default paths."
-    )
-    if not output_path:
-        print("Error: No output path specified for system_info.txt.")
-        sys.exit(1)
-
-    components = discover_components()
-    config = generate_config(components)
-    collect_metrics(config, output_path)
+    collect(args.output, reuse_config=args.reuse_config, force_discover=args.force_discover, interactive=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,46 +6,60 @@ import json
 import time
 import signal
 import re
-from datetime import datetime
-from collections import deque
+import shlex
+from array import array
+from collections import deque, namedtuple
+from functools import lru_cache
 from statistics import mean, stdev
 import subprocess
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from colorama import init, Fore, Style
+
+try:
+    import orjson  # Optional: faster settings/log round-trips on every monitoring tick
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads  # Both accept bytes or str
+
+def json_dumps_pretty(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(data, indent=2)
 
 # Server integration
+# Static menu trees; callers only serialize them, so the same objects are handed out each time
+MENU_ACTIVE = {
+    "name": "Main Menu",
+    "items": [
+        {"name": "Continue monitoring", "action": "continue_monitoring"},
+        {"name": "Stop monitoring", "action": "stop_monitoring"},
+        {"name": "Exit", "action": "exit"}
+    ]
+}
+MENU_IDLE = {
+    "name": "Main Menu",
+    "items": [
+        {"name": "Start monitoring", "action": "start_monitoring"},
+        {
+            "name": "Configure settings",
+            "items": [
+                {"name": "General settings", "action": "configure_general"},
+                {"name": "Enable/disable metrics", "action": "configure_metrics"},
+                {"name": "Manage thresholds", "action": "configure_thresholds"},
+                {"name": "Reset configuration", "action": "reset_config"}
+            ]
+        },
+        {"name": "List available metrics", "action": "list_metrics"},
+        {"name": "View logs", "action": "view_logs"},
+        {"name": "Check status", "action": "check_status"},
+        {"name": "Exit", "action": "exit"}
+    ]
+}
+
 def build_menu_tree():
-    settings = load_json(DEFAULT_SETTINGS_PATH, {"general": {}, "metrics": []})
-    monitoring_active = globals().get('monitoring_active', False)
-    menu = {
-        "name": "Main Menu",
-        "items": []
-    }
-    if monitoring_active:
-        menu["items"] = [
-            {"name": "Continue monitoring", "action": "continue_monitoring"},
-            {"name": "Stop monitoring", "action": "stop_monitoring"},
-            {"name": "Exit", "action": "exit"}
-        ]
-    else:
-        menu["items"] = [
-            {"name": "Start monitoring", "action": "start_monitoring"},
-            {
-                "name": "Configure settings",
-                "items": [
-                    {"name": "General settings", "action": "configure_general"},
-                    {"name": "Enable/disable metrics", "action": "configure_metrics"},
-                    {"name": "Manage thresholds", "action": "configure_thresholds"},
-                    {"name": "Reset configuration", "action": "reset_config"}
-                ]
-            },
-            {"name": "List available metrics", "action": "list_metrics"},
-            {"name": "View logs", "action": "view_logs"},
-            {"name": "Check status", "action": "check_status"},
-            {"name": "Exit", "action": "exit"}
-        ]
-    return menu
+    return MENU_ACTIVE if globals().get('monitoring_active', False) else MENU_IDLE
 
 def handle_monitor_action(action):
     global running, monitoring_active, background_monitor_thread, metrics_history
@@ -58,21 +72,21 @@ def handle_monitor_action(action):
         if not [m["name"] for m in settings.get("metrics", []) if m.get("enabled")]:
             return {"success": False, "output": "No metrics enabled."}
         running = True
+        monitor_stop.clear()
         monitoring_active = True
-        with open(DEFAULT_PID_PATH, 'w') as f:
-            f.write(str(os.getpid()))
+        write_pid_file()
         background_monitor_thread = threading.Thread(target=background_monitor_loop, args=(metrics_config, metrics_history))
         background_monitor_thread.start()
         return {"success": True, "output": "Monitoring started."}
 
     elif action == "stop_monitoring":
         running = False
+        monitor_stop.set()
         monitoring_active = False
         if background_monitor_thread and background_monitor_thread.is_alive():
             background_monitor_thread.join()
         background_monitor_thread = None
-        if os.path.exists(DEFAULT_PID_PATH):
-            os.remove(DEFAULT_PID_PATH)
+        remove_pid_file()
         return {"success": True, "output": "Monitoring stopped."}
 
     elif action == "configure_general":
@@ -88,7 +102,7 @@ def handle_monitor_action(action):
         }
 
     elif action.startswith("update_general"):
-        data = json.loads(action.split(":", 1)[1]) if ":" in action else {}
+        data = json_loads(action.split(":", 1)[1]) if ":" in action else {}
         settings["general"].update(data)
         save_json(settings, DEFAULT_SETTINGS_PATH)
         return {"success": True, "output": "General settings updated."}
@@ -105,7 +119,7 @@ def handle_monitor_action(action):
         return {"success": True, "output": {"form": form}}
 
     elif action.startswith("update_metrics"):
-        data = json.loads(action.split(":", 1)[1]) if ":" in action else {}
+        data = json_loads(action.split(":", 1)[1]) if ":" in action else {}
         dynamic_metrics = [
             m["name"] for section in metrics_config.get("sections", [])
             for m in section.get("metrics", []) if m.get("type") == "dynamic_single"
@@ -120,55 +134,213 @@ def handle_monitor_action(action):
     return {"success": False, "output": f"Unknown action: {action}"}
 
 def get_metrics_history():
-    return list(metrics_history)
+    return [tick._asdict() for tick in metrics_history]
 
-# Initialize colorama for colored output
-init()
+# Colors: colorama is only needed to translate ANSI on Windows consoles; elsewhere use the raw
+# escapes directly (and none at all when stdout is not a terminal)
+if sys.platform == "win32":
+    from colorama import init, Fore, Style
+    init()
+    RED, GREEN, RESET = Fore.RED, Fore.GREEN, Style.RESET_ALL
+elif sys.stdout.isatty():
+    RED, GREEN, RESET = "\x1b[31m", "\x1b[32m", "\x1b[0m"
+else:
+    RED = GREEN = RESET = ""
 
 # Constants
 DEFAULT_SETTINGS_PATH = "monitor_settings.json"
-DEFAULT_LOG_PATH = "monitor_log.json"
+DEFAULT_LOG_PATH = "monitor_log.json"  # JSON Lines: one entry per line, appended each tick
 DEFAULT_PID_PATH = "m_monitor_system.pid"
 METRICS_CONFIG_PATH = "metrics_config.json"
 INTERVAL = 5      # Default seconds between updates
 MAX_ROWS = 5      # Default number of rows in table
 INITIAL_DELAY = 1  # Seconds for initial table fill
+TERMINAL_HISTORY_LINES = 500  # Menu/output lines kept to redraw above the monitor table
 API_KEY_PATH = "api_key.txt"
+CLEAR_SCREEN = "\x1b[H\x1b[2J"  # Cursor home + clear; same effect as `clear` without spawning it
+
+_NAN = float("nan")
+
+Tick = namedtuple("Tick", "timestamp metrics violations")
+
+class MetricsRing:
+    """Fixed-size monitoring history stored column-wise: one float64 array per metric (NaN = missing).
+
+    Per-metric mean/variance over the window are kept incrementally (Welford), so mean()/std() are O(1).
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.data = {}
+        self.running = {}  # name -> [n, mean, M2]
+        self.timestamps = [""] * capacity
+        self.violations = [[] for _ in range(capacity)]
+        self.head = 0
+        self.count = 0
+
+    def append(self, timestamp, metrics, violations):
+        i = self.head
+        full = self.count == self.capacity
+        for name, column in self.data.items():
+            if full and column[i] == column[i]:
+                self._remove(name, column[i])
+            column[i] = _NAN
+        for name, value in metrics.items():
+            column = self.data.get(name)
+            if column is None:
+                column = self.data[name] = array('d', [_NAN]) * self.capacity
+                self.running[name] = [0, 0.0, 0.0]
+            column[i] = value
+            self._add(name, column[i])
+        self.timestamps[i] = timestamp
+        self.violations[i] = violations
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def clear(self):
+        self.__init__(self.capacity)
+
+    def _add(self, name, x):
+        acc = self.running[name]
+        acc[0] += 1
+        delta = x - acc[1]
+        acc[1] += delta / acc[0]
+        acc[2] += delta * (x - acc[1])
+
+    def _remove(self, name, x):
+        acc = self.running[name]
+        acc[0] -= 1
+        if acc[0] == 0:
+            acc[1] = acc[2] = 0.0
+            return
+        delta = x - acc[1]
+        acc[1] -= delta / acc[0]
+        acc[2] = max(acc[2] - delta * (x - acc[1]), 0.0)
+
+    def mean(self, name):
+        acc = self.running.get(name)
+        return acc[1] if acc and acc[0] else None
+
+    def std(self, name):
+        """Sample standard deviation (as statistics.stdev); 0.0 for a single value."""
+        acc = self.running.get(name)
+        if not acc or not acc[0]:
+            return None
+        return (acc[2] / (acc[0] - 1)) ** 0.5 if acc[0] > 1 else 0.0
+
+    def _indices(self, last=None):
+        n = self.count if last is None else min(last, self.count)
+        start = self.head - n
+        return [(start + k) % self.capacity for k in range(n)]
+
+    def values(self, name, last=None):
+        """Non-missing values of one metric, oldest first."""
+        column = self.data.get(name)
+        if column is None:
+            return []
+        return [column[i] for i in self._indices(last) if column[i] == column[i]]
+
+    def tail(self, last=None):
+        """Entries as Tick tuples, oldest first."""
+        entries = []
+        for i in self._indices(last):
+            metrics = {name: column[i] for name, column in self.data.items() if column[i] == column[i]}
+            entries.append(Tick(self.timestamps[i], metrics, self.violations[i]))
+        return entries
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.tail())
 
 # Global variables
 running = True
+monitor_stop = threading.Event()  # Set on stop so sleeping monitor/display loops wake immediately
 background_monitor_thread = None
 monitoring_active = False
-metrics_history = deque(maxlen=100)
+metrics_history = MetricsRing(100)
 warned_metrics = set()
+_json_cache = {}  # path -> ((st_mtime_ns, st_size), parsed data)
+_saved_state = {}  # path -> (payload hash, (st_mtime_ns, st_size)) of our last write
+_log_checked = False
 
 # Signal handler
 def signal_handler(sig, frame):
     global running, background_monitor_thread, monitoring_active
     running = False
+    monitor_stop.set()
     monitoring_active = False
     if background_monitor_thread:
         background_monitor_thread.join()
-    if os.path.exists(DEFAULT_PID_PATH):
-        os.remove(DEFAULT_PID_PATH)
+    remove_pid_file()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
 # Helpers
+HAS_PROC = os.path.isdir("/proc/self")
+
+def pid_running(pid):
+    if HAS_PROC:
+        return os.path.exists(f"/proc/{pid}")  # Inode lookup, no signal round-trip
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+# check_existing_instance() is hit on every menu pass; reuse an answer for PID_CACHE_TTL seconds
+PID_CACHE_TTL = 1.0
+_pid_cache = {"pid": None, "ts": 0.0}
+
+def invalidate_pid_cache():
+    _pid_cache["ts"] = 0.0
+
+def write_pid_file():
+    # Readers only ever see the old file or the complete new one, never a truncated PID
+    temp_path = DEFAULT_PID_PATH + ".tmp"
+    with open(temp_path, 'w') as f:
+        f.write(str(os.getpid()))
+    os.replace(temp_path, DEFAULT_PID_PATH)
+    invalidate_pid_cache()
+
+def remove_pid_file():
+    try:
+        os.remove(DEFAULT_PID_PATH)
+    except FileNotFoundError:
+        pass
+    invalidate_pid_cache()
+
 def check_existing_instance():
-    if os.path.exists(DEFAULT_PID_PATH):
-        try:
-            with open(DEFAULT_PID_PATH, 'r') as f:
-                pid = int(f.read().strip())
-            if pid != os.getpid():  # Exclude current process
-                os.kill(pid, 0)  # Check if process is running
-                return pid
-            return pid
-        except (ValueError, OSError):
-            # Invalid PID or process not running, remove stale PID file
-            os.remove(DEFAULT_PID_PATH)
+    now = time.monotonic()
+    if now - _pid_cache["ts"] < PID_CACHE_TTL:
+        return _pid_cache["pid"]
+    pid = read_existing_instance()
+    _pid_cache["pid"], _pid_cache["ts"] = pid, now
+    return pid
+
+def read_existing_instance():
+    try:
+        fd = os.open(DEFAULT_PID_PATH, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        pid = int(os.read(fd, 32))
+    except (ValueError, OSError):
+        pid = None
+    finally:
+        os.close(fd)
+    if pid == os.getpid():  # Exclude current process
+        return pid
+    if pid is not None and pid_running(pid):
+        return pid
+    # Invalid PID or process not running, remove stale PID file
+    try:
+        os.remove(DEFAULT_PID_PATH)
+    except OSError:
+        pass
     return None
 
 def locate_file(filename, default_paths=None):
@@ -206,35 +378,160 @@ def load_json(path, default=None):
     if not path or not os.path.exists(path):
         return default if default is not None else {}
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        # Settings and metrics_config rarely change; skip the read+parse while the file is untouched
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = _json_cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(path, 'rb') as f:
+            data = f.read()
+        data = json_loads(data)
+        _json_cache[path] = (key, data)
+        return data
     except Exception as e:
         print(f"Error loading {path}: {e}")
         return default if default is not None else {}
 
 def save_json(data, path):
+    _json_cache.pop(path, None)
     try:
         temp_path = path + ".tmp"
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        if orjson is not None:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+        else:
+            payload = (json.dumps(data, indent=2) + "\n").encode("utf-8")
+        digest = hash(payload)
+        # Skip the write when nothing changed since our last save and nobody else touched the file
+        saved = _saved_state.get(path)
+        if saved is not None and saved[0] == digest:
+            try:
+                st = os.stat(path)
+                if (st.st_mtime_ns, st.st_size) == saved[1]:
+                    return
+            except OSError:
+                pass
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
         os.replace(temp_path, path)
+        st = os.stat(path)
+        _saved_state[path] = (digest, (st.st_mtime_ns, st.st_size))
     except Exception as e:
         print(f"Error writing {path}: {e}")
 
+class DebouncedWriter:
+    """Coalesce bursts of saves to one JSON file: the latest data is written once things go quiet."""
+
+    def __init__(self, path, delay=0.5):
+        self.path = path
+        self.delay = delay
+        self._data = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self, data):
+        with self._lock:
+            self._data = data
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            data, self._data = self._data, None
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        if data is not None:
+            save_json(data, self.path)
+
+settings_writer = DebouncedWriter(DEFAULT_SETTINGS_PATH)
+
+def _dumps_line(entry):
+    # Compact records: the log is machine-read, so no indentation or padding after separators
+    if orjson is not None:
+        return orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+
+def _parse_log(data):
+    if data.lstrip().startswith(b"["):  # Legacy log written as a single JSON array
+        return json_loads(data)
+    return [json_loads(line) for line in data.splitlines() if line.strip()]
+
+def _tail_lines(f, count, block_size=8192):
+    """Last `count` non-empty lines of a binary file, reading backwards from the end."""
+    pos = f.seek(0, os.SEEK_END)
+    data = b""
+    while pos > 0 and data.count(b"\n") <= count:
+        step = min(block_size, pos)
+        pos -= step
+        f.seek(pos)
+        data = f.read(step) + data
+    return [line for line in data.splitlines() if line.strip()][-count:]
+
+def read_log_entries(limit=None):
+    if not os.path.exists(DEFAULT_LOG_PATH):
+        return []
+    try:
+        with open(DEFAULT_LOG_PATH, 'rb') as f:
+            if limit and f.read(1) != b"[":
+                # JSON Lines: only the requested tail is read and parsed, however large the log is
+                return [json_loads(line) for line in _tail_lines(f, limit)]
+            f.seek(0)
+            entries = _parse_log(f.read())
+    except Exception as e:
+        print(f"Error loading {DEFAULT_LOG_PATH}: {e}")
+        return []
+    return entries[-limit:] if limit else entries
+
+def append_log_entry(entry):
+    global _log_checked
+    try:
+        if not _log_checked:
+            # Convert an old JSON-array log to JSON Lines once so appends stay valid
+            _log_checked = True
+            if os.path.exists(DEFAULT_LOG_PATH):
+                with open(DEFAULT_LOG_PATH, 'rb') as f:
+                    data = f.read()
+                if data.lstrip().startswith(b"["):
+                    temp_path = DEFAULT_LOG_PATH + ".tmp"
+                    with open(temp_path, 'wb') as f:
+                        f.write(b"".join(_dumps_line(e) for e in _parse_log(data)))
+                    os.replace(temp_path, DEFAULT_LOG_PATH)
+        # Single O_APPEND write per entry, so concurrent writers don't interleave lines
+        with open(DEFAULT_LOG_PATH, 'ab') as f:
+            f.write(_dumps_line(entry))
+    except Exception as e:
+        print(f"Error writing {DEFAULT_LOG_PATH}: {e}")
+
+_NEEDS_SHELL = re.compile(r"""[|&;<>()$`\\"'*?\[\]#~{}!\n]""")
+
+@lru_cache(maxsize=None)
+def _split_command(cmd):
+    """argv tuple for a command string that needs no shell features, else None."""
+    if _NEEDS_SHELL.search(cmd):
+        return None
+    argv = shlex.split(cmd)
+    return tuple(argv) if argv and "=" not in argv[0] else None
+
 def run_command(cmd, error_msg="Command failed"):
+    # Plain commands (and argv lists) are exec'd directly; only pipelines etc. go through /bin/sh
+    argv = _split_command(cmd) if isinstance(cmd, str) else cmd
     try:
         proc = subprocess.run(
-            cmd,
+            list(argv) if argv else cmd,
             capture_output=True,
             text=True,
             check=False,
-            shell=True  # Enable shell to support pipelines
+            shell=not argv
         )
         if proc.returncode != 0:
             print(f"Warning: {error_msg} - Return code: {proc.returncode}, Error: {proc.stderr.strip()}")
             return ""
         return proc.stdout.strip()
-    except subprocess.SubprocessError as e:
+    except (subprocess.SubprocessError, OSError) as e:
         print(f"Warning: {error_msg} - {e}")
         return ""
 
@@ -261,74 +558,121 @@ def load_api_key():
     return None
 
 # Metric Parsing
+_RE_PING = re.compile(r"time=([\d\.]+)\s*ms")
+_RE_CPU_TEMP = re.compile(r'Package id 0:\s+\+?([0-9]+)°C')
+_RE_FAN1 = re.compile(r'fan1:\s+(\d+)')
+_RE_NUM = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)')  # Also ".5" and "5.", which float() accepts
+
+def _parse_int(out):
+    out = out.strip()
+    return int(out) if out.isdigit() else None
+
+def _parse_number(out):
+    out = out.strip()
+    return float(out) if _RE_NUM.fullmatch(out) else None
+
+_PARSERS = {
+    "cpu_temp": lambda out: int(m.group(1)) if (m := _RE_CPU_TEMP.search(out)) else None,
+    "fan1_speed": lambda out: int(m.group(1)) if (m := _RE_FAN1.search(out)) else None,
+    "enp0s1_drops": _parse_int,
+    "enp0s1_rx_queue_0_packets": _parse_int,
+    "enp0s1_rx_queue_0_bytes": _parse_int,
+    "enp0s1_rx_queue_0_drops": _parse_int,
+    "enp0s1_rx_queue_0_kicks": _parse_int
+}
+
 def parse_metric_output(name, output):
-    if name == "ping_rtt":
-        if not output:
-            return None
-        match = re.search(r"time=([\d\.]+)\s*ms", output)
-        return float(match.group(1)) if match else None
     if not output:
         return None
-    parsers = {
-        "cpu_temp": lambda out: int(re.search(r'Package id 0:\s+\+?([0-9]+)°C', out).group(1)) if re.search(r'Package id 0:\s+\+?([0-9]+)°C', out) else None,
-        "fan1_speed": lambda out: int(re.search(r'fan1:\s+(\d+)', out).group(1)) if re.search(r'fan1:\s+(\d+)', out) else None,
-        "enp0s1_drops": lambda out: int(out.strip()) if out.strip().isdigit() else None,
-        "enp0s1_rx_queue_0_packets": lambda out: int(out.strip()) if out.strip().isdigit() else None,
-        "enp0s1_rx_queue_0_bytes": lambda out: int(out.strip()) if out.strip().isdigit() else None,
-        "enp0s1_rx_queue_0_drops": lambda out: int(out.strip()) if out.strip().isdigit() else None,
-        "enp0s1_rx_queue_0_kicks": lambda out: int(out.strip()) if out.strip().isdigit() else None
-    }
-    parser = parsers.get(name, lambda out: (float(out.strip()) if out.strip().replace('.', '', 1).replace('-', '', 1).isdigit() else int(out.strip()) if out.strip().isdigit() else None))
-    value = parser(output)
+    if name == "ping_rtt":
+        match = _RE_PING.search(output)
+        return float(match.group(1)) if match else None
+    value = _PARSERS.get(name, _parse_number)(output)
     if value is None and output:
         print(f"Debug: Failed to parse {name}. Raw output: '{output}'")
     return value
 
 # Metric Collection
+_collect_pool = None
+
+def _collect_executor():
+    global _collect_pool
+    if _collect_pool is None:
+        _collect_pool = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4), thread_name_prefix="collect")
+    return _collect_pool
+
+_collect_plan = None  # (settings, metrics_config, enabled metric dicts, (max, min) bounds by name)
+_INF = float("inf")
+
+def plan_collection(settings, metrics_config):
+    """Flatten the enabled dynamic metrics once per settings/config object (load_json hands out a new one on change)."""
+    global _collect_plan
+    plan = _collect_plan
+    if plan is not None and plan[0] is settings and plan[1] is metrics_config:
+        return plan[2], plan[3]
+    enabled = {m["name"] for m in settings.get("metrics", []) if m.get("enabled")}
+    flat = [
+        metric for section in metrics_config.get("sections", [{}])
+        for metric in section.get("metrics", [])
+        if metric.get("type") == "dynamic_single" and metric["name"] in enabled
+    ]
+    # Unset thresholds become +/-inf so each check is two plain comparisons
+    bounds_by_name = {}
+    for m in settings.get("metrics", []):
+        thresholds = m.get("thresholds") or {}
+        upper, lower = thresholds.get("max"), thresholds.get("min")
+        bounds_by_name[m["name"]] = (_INF if upper is None else upper, -_INF if lower is None else lower)
+    _collect_plan = (settings, metrics_config, flat, bounds_by_name)
+    return flat, bounds_by_name
+
 def collect_metrics(settings, metrics_config):
     metrics = {}
     violations = []
-    enabled_metrics = [m["name"] for m in settings.get("metrics", []) if m.get("enabled")]
-    if not enabled_metrics:
+    enabled, bounds_by_name = plan_collection(settings, metrics_config)
+    if not enabled:
         return {}, []
-    for section in metrics_config.get("sections", [{}]):
-        for metric in section.get("metrics", []):
-            if metric.get("type") == "dynamic_single" and metric["name"] in enabled_metrics:
-                name = metric["name"]
-                if name == "ping_rtt":
-                    host = settings["general"].get("ping_hosts", ["google.com"])[0]
-                    cmd = f"ping -c 1 {host}"
-                    output = run_command(cmd, f"Failed to collect {name}")
-                else:
-                    cmd = metric.get("command")
-                    if not cmd:
-                        print(f"Error: No command defined for metric {name}")
-                        continue
-                    output = run_command(cmd, f"Failed to collect {name}")
-                if output:
-                    if name == "ping_rtt" and ("unreachable" in output.lower() or "100% packet loss" in output.lower()):
-                        print(f"Warning: Ping host {host} unreachable.")
-                        value = None
-                    else:
-                        value = parse_metric_output(name, output)
-                    if value is not None:
-                        metrics[name] = value
-                        thresholds = next((m["thresholds"] for m in settings["metrics"] if m["name"] == name), {})
-                        if thresholds.get("max") is not None and value > thresholds["max"]:
-                            violations.append({"metric": name, "value": value, "threshold": f"max={thresholds['max']}"})
-                        if thresholds.get("min") is not None and value < thresholds["min"]:
-                            violations.append({"metric": name, "value": value, "threshold": f"min={thresholds['min']}"})
-                else:
-                    print(f"Warning: No output for metric {name}")
+    host = None
+    jobs = []
+    for metric in enabled:
+        name = metric["name"]
+        if name == "ping_rtt":
+            host = settings["general"].get("ping_hosts", ["google.com"])[0]
+            cmd = ["ping", "-c", "1", host]
+        else:
+            cmd = metric.get("argv") or metric.get("command")
+            if not cmd:
+                print(f"Error: No command defined for metric {name}")
+                continue
+        jobs.append((name, cmd))
+    # The commands are mostly waiting (ping alone can take seconds), so a tick costs the slowest one, not the sum
+    outputs = _collect_executor().map(lambda job: run_command(job[1], f"Failed to collect {job[0]}"), jobs)
+    for (name, _), output in zip(jobs, outputs):
+        if output:
+            if name == "ping_rtt" and ("unreachable" in output.lower() or "100% packet loss" in output.lower()):
+                print(f"Warning: Ping host {host} unreachable.")
+                value = None
+            else:
+                value = parse_metric_output(name, output)
+            if value is not None:
+                metrics[name] = value
+                upper, lower = bounds_by_name.get(name, (_INF, -_INF))
+                if value > upper:
+                    violations.append({"metric": name, "value": value, "threshold": f"max={upper}"})
+                if value < lower:
+                    violations.append({"metric": name, "value": value, "threshold": f"min={lower}"})
+        else:
+            print(f"Warning: No output for metric {name}")
     return metrics, violations
 
 # Display
 def print_table(metrics_history, enabled_metrics, settings, terminal_history):
-    os.system('clear')
-    
-    for line in terminal_history:
-        print(line)
-    
+    # Build the whole frame first and emit it with a single write
+    out = list(terminal_history)
+    render_table(out, metrics_history, enabled_metrics, settings)
+    sys.stdout.write(CLEAR_SCREEN + "\n".join(out) + "\n")
+    sys.stdout.flush()
+
+def render_table(out, metrics_history, enabled_metrics, settings):
     metrics_config = load_json(METRICS_CONFIG_PATH, {"sections": [{"metrics": []}]})
     units = {}
     for section in metrics_config.get("sections", []):
@@ -336,76 +680,67 @@ def print_table(metrics_history, enabled_metrics, settings, terminal_history):
             if metric["name"] in enabled_metrics:
                 units[metric["name"]] = metric.get("unit", "")
     
-    col_widths = [len("Timestamp")]
-    for name in enabled_metrics:
-        header = f"{name}" if not units.get(name) else f"{name} ({units[name]})"
-        values = [str(entry["metrics"].get(name, "N/A")) for entry in metrics_history]
-        formatted_values = []
-        for entry in metrics_history:
-            value = entry["metrics"].get(name)
-            if value is None:
-                formatted_values.append("N/A")
-            else:
-                violation = next((v for v in entry.get("violations", []) if v["metric"] == name), None)
-                if violation:
-                    formatted_values.append(f"{value:.2f} [{violation['threshold']}]")
-                else:
-                    formatted_values.append(f"{value:.2f}")
-        max_len = max(
-            len(header),
-            max([len(v) for v in formatted_values] + [len("N/A")], default=len("N/A"))
-        )
-        col_widths.append(max_len)
-    
     if not enabled_metrics:
-        print("\nMonitor (Press Space to exit)\n")
-        print("No metrics enabled. Configure settings to enable metrics.")
+        out.append("\nMonitor (Press Space to exit)\n")
+        out.append("No metrics enabled. Configure settings to enable metrics.")
         return
     
     if not metrics_history and monitoring_active:
-        print("\nMonitor (Press Space to exit)\n")
-        print("Initializing data collection... Please wait.")
+        out.append("\nMonitor (Press Space to exit)\n")
+        out.append("Initializing data collection... Please wait.")
         return
     
-    print("\nMonitor (Press Space to exit)\n")
+    out.append("\nMonitor (Press Space to exit)\n")
     
     headers = ["Timestamp"] + [
         f"{name}" if not units.get(name) else f"{name} ({units[name]})"
         for name in enabled_metrics
     ]
-    print(" ".join(f"{h:<{w}}" for h, w in zip(headers, col_widths)))
-    print("-" * sum(w + 1 for w in col_widths))
     
+    # Format only the visible rows, once; violations are indexed by metric per row
     max_rows = settings.get("general", {}).get("max_rows", MAX_ROWS)
-    data_rows = list(metrics_history)[-max_rows:]
+    data_rows = metrics_history.tail(max_rows)
+    cells = []
+    for entry in data_rows:
+        violations = {v["metric"]: v for v in entry.violations}
+        row_cells = []
+        for name in enabled_metrics:
+            value = entry.metrics.get(name)
+            if value is None:
+                row_cells.append(("N/A", False))
+            elif name in violations:
+                row_cells.append((f"{value:.2f} [{violations[name]['threshold']}]", True))
+            else:
+                row_cells.append((f"{value:.2f}", False))
+        cells.append(row_cells)
+    col_widths = [len("Timestamp")] + [
+        max([len(headers[j + 1]), len("N/A")] + [len(row_cells[j][0]) for row_cells in cells])
+        for j in range(len(enabled_metrics))
+    ]
+    
+    out.append(" ".join(f"{h:<{w}}" for h, w in zip(headers, col_widths)))
+    out.append("-" * sum(w + 1 for w in col_widths))
+    
     for i in range(max_rows):
-        if i < len(data_rows):
-            entry = data_rows[i]
-            row = [entry["timestamp"]]
-            for name in enabled_metrics:
-                value = entry["metrics"].get(name)
-                if value is None:
-                    row.append("N/A")
-                else:
-                    violation = next((v for v in entry.get("violations", []) if v["metric"] == name), None)
-                    if violation:
-                        row.append(f"{Fore.RED}{value:.2f} [{violation['threshold']}]{Style.RESET_ALL}")
-                    else:
-                        row.append(f"{value:.2f}")
+        if i < len(cells):
+            row = [data_rows[i].timestamp] + [
+                f"{RED}{text}{RESET}" if flagged else text
+                for text, flagged in cells[i]
+            ]
         else:
             row = [""] * (len(enabled_metrics) + 1)
-        print(" ".join(f"{v:<{w}}" for v, w in zip(row, col_widths)))
+        out.append(" ".join(f"{v:<{w}}" for v, w in zip(row, col_widths)))
     
+    thresholds_by_name = {m["name"]: m.get("thresholds", {}) for m in settings.get("metrics", [])}
     stats = {"Mean": {}, "Std": {}, "Max": {}, "Min": {}}
     for name in enabled_metrics:
-        values = [e["metrics"].get(name) for e in metrics_history if e["metrics"].get(name) is not None]
-        if values:
-            stats["Mean"][name] = mean(values)
-            stats["Std"][name] = stdev(values) if len(values) > 1 else 0.0
+        if metrics_history.mean(name) is not None:
+            stats["Mean"][name] = metrics_history.mean(name)
+            stats["Std"][name] = metrics_history.std(name)
         else:
             stats["Mean"][name] = "N/A"
             stats["Std"][name] = "N/A"
-        thresholds = next((m["thresholds"] for m in settings["metrics"] if m["name"] == name), {})
+        thresholds = thresholds_by_name.get(name, {})
         stats["Max"][name] = thresholds.get("max", "-")
         stats["Min"][name] = thresholds.get("min", "-")
     
@@ -414,12 +749,22 @@ def print_table(metrics_history, enabled_metrics, settings, terminal_history):
         for name in enabled_metrics:
             value = stats[stat].get(name)
             row.append(f"{value:.2f}" if isinstance(value, (int, float)) else str(value))
-        print(" ".join(f"{v:<{w}}" for v, w in zip(row, col_widths)))
+        out.append(" ".join(f"{v:<{w}}" for v, w in zip(row, col_widths)))
 
 # Logging
-def log_metrics(metrics, violations, settings, metrics_history):
+_last_timestamp = (0, "")
+
+def current_timestamp():
+    """HH:MM:SS for now, formatted at most once per wall-clock second."""
+    global _last_timestamp
+    now = int(time.time())
+    if now != _last_timestamp[0]:
+        _last_timestamp = (now, time.strftime("%H:%M:%S", time.localtime(now)))
+    return _last_timestamp[1]
+
+def log_metrics(metrics, violations, settings, metrics_history, timestamp=None):
     log_entry = {
-        "timestamp": datetime.now().strftime("%H:%M:%S"),
+        "timestamp": timestamp or current_timestamp(),
         "metrics": metrics,
         "thresholds": {m["name"]: m["thresholds"] for m in settings.get("metrics", [])},
         "violations": violations,
@@ -427,59 +772,74 @@ def log_metrics(metrics, violations, settings, metrics_history):
         "std": {}
     }
     for name in metrics:
-        values = [e["metrics"].get(name) for e in list(metrics_history)[-5:] if e["metrics"].get(name) is not None]
+        values = metrics_history.values(name, last=5)
         if values:
             log_entry["mean"][name] = mean(values)
             log_entry["std"][name] = stdev(values) if len(values) > 1 else 0.0
-    log_data = load_json(DEFAULT_LOG_PATH, [])
-    log_data.append(log_entry)
-    save_json(log_data, DEFAULT_LOG_PATH)
+    append_log_entry(log_entry)
 
 # Monitoring Loops
 def background_monitor_loop(metrics_config, metrics_history):
     global running
+    settings, settings_mtime = None, None
     while running:
-        settings = load_json(DEFAULT_SETTINGS_PATH, {"general": {}, "metrics": []})
+        # Only re-read settings when the file has actually been modified
+        try:
+            mtime = os.stat(DEFAULT_SETTINGS_PATH).st_mtime_ns
+        except OSError:
+            mtime = None
+        if settings is None or mtime != settings_mtime:
+            settings = load_json(DEFAULT_SETTINGS_PATH, {"general": {}, "metrics": []})
+            settings_mtime = mtime
         metrics, violations = collect_metrics(settings, metrics_config)
-        metrics_history.append({
-            "timestamp": datetime.now().strftime("%H:%M:%S"),
-            "metrics": metrics,
-            "violations": violations
-        })
-        log_metrics(metrics, violations, settings, metrics_history)
-        time.sleep(settings.get("general", {}).get("interval", INTERVAL))
+        timestamp = current_timestamp()
+        metrics_history.append(timestamp, metrics, violations)
+        log_metrics(metrics, violations, settings, metrics_history, timestamp)
+        monitor_stop.wait(settings.get("general", {}).get("interval", INTERVAL))
 
 def display_monitor_loop(settings, metrics_config, metrics_history, terminal_history):
     enabled_metrics = [m["name"] for m in settings.get("metrics", []) if m.get("enabled")]
     
+    full_interval = settings.get("general", {}).get("interval", INTERVAL)
+    
     time.sleep(INITIAL_DELAY)
     
-    while True:
-        print_table(metrics_history, enabled_metrics, settings, terminal_history)
-        
-        start_time = time.time()
-        input_check_interval = 0.5
-        full_interval = settings.get("general", {}).get("interval", INTERVAL)
-        elapsed = 0
-        
-        while elapsed < full_interval:
-            remaining = min(input_check_interval, full_interval - elapsed)
-            try:
-                import msvcrt
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+    
+    if msvcrt:
+        while not monitor_stop.is_set():
+            print_table(metrics_history, enabled_metrics, settings, terminal_history)
+            start_time = time.time()
+            elapsed = 0
+            while elapsed < full_interval:
+                remaining = min(0.5, full_interval - elapsed)
                 if msvcrt.kbhit() and msvcrt.getch() == b' ':
                     return
-            except ImportError:
-                import termios, tty, select
-                old_settings = termios.tcgetattr(sys.stdin)
-                tty.setcbreak(sys.stdin.fileno())
-                r, _, _ = select.select([sys.stdin], [], [], remaining)
-                if r and sys.stdin.read(1) == ' ':
-                    termios.tcsetattr(sys.stdin, termios.TCSADRAIN, old_settings)
+                if monitor_stop.wait(remaining):
+                    return
+                elapsed = time.time() - start_time
+        return
+    
+    # POSIX: cbreak once for the whole session and block in select() until a key or the next redraw
+    import termios, tty, select
+    fd = sys.stdin.fileno()
+    old_settings = termios.tcgetattr(fd)
+    tty.setcbreak(fd)
+    try:
+        while not monitor_stop.is_set():
+            print_table(metrics_history, enabled_metrics, settings, terminal_history)
+            deadline = time.monotonic() + full_interval
+            remaining = full_interval
+            while remaining > 0:
+                r, _, _ = select.select([fd], [], [], remaining)
+                if r and os.read(fd, 1) == b' ':
                     return
-                termios.tcsetattr(sys.stdin, termios.TCSADRAIN, old_settings)
-            
-            time.sleep(remaining)
-            elapsed = time.time() - start_time
+                remaining = deadline - time.monotonic()
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
 
 # Configuration Wizard
 def run_config_wizard(metrics_config):
@@ -532,6 +892,7 @@ def regenerate_monitor_settings():
     return {"success": True, "message": "monitor_settings.json regenerated."}
 
 # Grok Integration
+@lru_cache(maxsize=None)  # Hardware doesn't change under a running process; call cache_clear() to refresh
 def get_hardware_context(metric_name):
     # First, try to read from system_info.txt
     system_info_path = locate_file("system_info.txt", default_paths=[
@@ -609,23 +970,32 @@ def fetch_thresholds_from_grok(metric_name, hardware):
     try:
         response = requests.post("https://api.x.ai/v1/chat/completions", headers=headers, json=payload, stream=True)
         response.raise_for_status()
-        full_content = ""
-        for chunk in response.iter_lines():
-            if chunk:
-                chunk_data = chunk.decode("utf-8")
-                if chunk_data.startswith("data: "):
-                    chunk_json = chunk_data[6:]
-                    if chunk_json.strip() == "[DONE]":
-                        break
-                    try:
-                        chunk_obj = json.loads(chunk_json)
-                        if "choices" in chunk_obj and chunk_obj["choices"]:
-                            content = chunk_obj["choices"][0].get("delta", {}).get("content", "")
-                            if content:
-                                full_content += content
-                    except json.JSONDecodeError:
-                        continue
-        threshold_data = json.loads(full_content)
+        # Split SSE lines out of raw 4 KiB blocks ourselves and collect deltas in a list (joined once)
+        parts = []
+        pending = b""
+        done = False
+        for block in response.iter_content(chunk_size=4096):
+            pending += block
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                line = line.strip()
+                if not line.startswith(b"data: "):
+                    continue
+                chunk_json = line[6:]
+                if chunk_json.strip() == b"[DONE]":
+                    done = True
+                    break
+                try:
+                    chunk_obj = json_loads(chunk_json)
+                    if "choices" in chunk_obj and chunk_obj["choices"]:
+                        content = chunk_obj["choices"][0].get("delta", {}).get("content", "")
+                        if content:
+                            parts.append(content)
+                except json.JSONDecodeError:
+                    continue
+            if done:
+                break
+        threshold_data = json_loads("".join(parts).encode("utf-8"))
         if "max" in threshold_data and "min" in threshold_data and "reference" in threshold_data:
             reference = threshold_data["reference"]
             if not (reference.startswith("http://") or reference.startswith("https://")):
@@ -650,21 +1020,27 @@ def fetch_thresholds_from_grok(metric_name, hardware):
 # Menu System
 def threshold_menu(settings, metrics_config, metric_name=None):
     target_metrics = [m for m in settings.get("metrics", []) if m.get("enabled") and (metric_name is None or m["name"] == metric_name)]
+    # The list doesn't change while the menu is open, so its navigation keys are fixed
+    n = len(target_metrics)
+    back_key, main_key = str(n + 2), str(n + 3)
+    nav_choices = {back_key: "parent", main_key: "main_menu"}
     while True:
         print("\nManage Thresholds:")
         print("1. View thresholds")
         for i, metric in enumerate(target_metrics, 2):
             print(f"{i}. Edit threshold for {metric['name']}")
-        print(f"{len(target_metrics) + 2}. Back")
-        print(f"{len(target_metrics) + 3}. Back to Main Menu")
+        print(f"{back_key}. Back")
+        print(f"{main_key}. Back to Main Menu")
         choice = input("Choice: ").strip()
         
-        if choice == "1":
+        if choice in nav_choices:
+            return nav_choices[choice]  # Signal to return to parent menu or jump to main menu
+        elif choice == "1":
             print("\nCurrent thresholds:")
             for metric in settings.get("metrics", []):
                 if metric in target_metrics:
                     print(f"{metric['name']}: {metric['thresholds']}")
-        elif choice.isdigit() and 2 <= int(choice) < len(target_metrics) + 2:
+        elif choice.isdigit() and 2 <= int(choice) < n + 2:
             metric = target_metrics[int(choice) - 2]
             while True:
                 print(f"\nEdit threshold for {metric['name']}:")
@@ -682,7 +1058,7 @@ def threshold_menu(settings, metrics_config, metric_name=None):
                     for m in settings["metrics"]:
                         if m["name"] == metric["name"]:
                             m["thresholds"] = thresholds
-                    save_json(settings, DEFAULT_SETTINGS_PATH)
+                    settings_writer.schedule(settings)
                     print(f"Threshold for {metric['name']} updated.")
                 elif sub_choice == "2":
                     try:
@@ -699,7 +1075,7 @@ def threshold_menu(settings, metrics_config, metric_name=None):
                                 for m in settings["metrics"]:
                                     if m["name"] == metric["name"]:
                                         m["thresholds"] = thresholds
-                                save_json(settings, DEFAULT_SETTINGS_PATH)
+                                settings_writer.schedule(settings)
                                 print(f"Threshold for {metric['name']} updated.")
                         else:
                             print("Error: Grok could not provide thresholds. Please edit manually.")
@@ -711,15 +1087,11 @@ def threshold_menu(settings, metrics_config, metric_name=None):
                     return "main_menu"  # Signal to jump to main menu
                 else:
                     print("Invalid choice.")
-        elif choice == str(len(target_metrics) + 2):
-            return "parent"  # Signal to return to parent menu
-        elif choice == str(len(target_metrics) + 3):
-            return "main_menu"  # Signal to jump to main menu
         else:
             print("Invalid choice.")
     return "parent"  # Default return to parent menu
 
-def configure_menu(settings, metrics_config):
+def configure_menu(settings, metrics_config, dynamic_metrics):
     while True:
         print("\nConfigure Settings:")
         print("1. General settings\n2. Enable/disable metrics\n3. Manage thresholds\n4. Reset configuration")
@@ -730,191 +1102,176 @@ def configure_menu(settings, metrics_config):
             settings["general"]["interval"] = float(input("Monitoring interval (seconds, default: 5): ") or 5)
             settings["general"]["max_rows"] = int(input("Max table rows (default: 5): ") or 5)
             settings["general"]["ping_hosts"] = input("Ping hosts (comma-separated, default: google.com): ").split(",") or ["google.com"]
-            save_json(settings, DEFAULT_SETTINGS_PATH)
+            settings_writer.schedule(settings)
             print("General settings updated.")
         elif choice == "2":
-            dynamic_metrics = [m["name"] for section in metrics_config.get("sections", []) for m in section.get("metrics", []) if m.get("type") == "dynamic_single"]
+            # Same dict objects as in settings["metrics"], so toggling through the index updates the list
+            settings_by_name = {m["name"]: m for m in settings["metrics"]}
+            n = len(dynamic_metrics)
+            back_key, main_key = str(n + 1), str(n + 2)
+            prompt = f"Select metric to toggle (1-{main_key}): "
             while True:
                 print("\nEnable/Disable Metrics:")
                 for i, metric in enumerate(dynamic_metrics, 1):
-                    enabled = any(m["name"] == metric and m["enabled"] for m in settings["metrics"])
+                    enabled = settings_by_name.get(metric, {}).get("enabled", False)
                     print(f"{i}. {metric} [{'x' if enabled else ' '}]")
-                print(f"{len(dynamic_metrics) + 1}. Back")
-                print(f"{len(dynamic_metrics) + 2}. Back to Main Menu")
-                choice = input("Select metric to toggle (1-{}): ".format(len(dynamic_metrics) + 2)).strip()
+                print(f"{back_key}. Back")
+                print(f"{main_key}. Back to Main Menu")
+                choice = input(prompt).strip()
         
-                if choice.isdigit() and 1 <= int(choice) <= len(dynamic_metrics):
+                if choice.isdigit() and 1 <= int(choice) <= n:
                     metric = dynamic_metrics[int(choice) - 1]
-                    for m in settings["metrics"]:
-                        if m["name"] == metric:
-                            m["enabled"] = not m["enabled"]
-                            print(f"{metric} {'enabled' if m['enabled'] else 'disabled'}.")
-                    save_json(settings, DEFAULT_SETTINGS_PATH)
-                elif choice == str(len(dynamic_metrics) + 1):
+                    m = settings_by_name.get(metric)
+                    if m is not None:
+                        m["enabled"] = not m["enabled"]
+                        print(f"{metric} {'enabled' if m['enabled'] else 'disabled'}.")
+                    settings_writer.schedule(settings)
+                elif choice == back_key:
                     print("Metrics updated.")
                     break
-                elif choice == str(len(dynamic_metrics) + 2):
+                elif choice == main_key:
+                    settings_writer.flush()
                     return "main_menu"
                 else:
                     print("Invalid choice.")
         elif choice == "3":
             result = threshold_menu(settings, metrics_config)
             if result == "main_menu":
+                settings_writer.flush()
                 return "main_menu"
         elif choice == "4":
             if input("Reset configuration? (y/n): ").strip().lower() == 'y':
+                settings_writer.flush()  # Don't let a pending edit overwrite the fresh config
                 settings = run_config_wizard(metrics_config)
                 print("Configuration reset.")
         elif choice == "5":
+            settings_writer.flush()
             return "parent"
         else:
             print("Invalid choice.")
     return "parent"
 
-def main_menu(settings, metrics_config):
-    global running, background_monitor_thread, monitoring_active, metrics_history
-    terminal_history = []
-    
-    def add_to_history(text):
-        if isinstance(text, list):
-            terminal_history.extend(text)
-        else:
-            terminal_history.append(text)
+# Main menu: static text and choice -> handler tables, built once
+MAIN_MENU_ACTIVE = (
+    "\nMonitor System:",
+    "1. Continue monitoring",
+    "2. Stop monitoring",
+    "3. Exit"
+)
+MAIN_MENU_IDLE = (
+    "\nMonitor System:",
+    "1. Start monitoring",
+    "2. Configure settings",
+    "3. List available metrics",
+    "4. View logs",
+    "5. Check status",
+    "6. Exit"
+)
+
+MenuContext = namedtuple("MenuContext", "settings metrics_config dynamic_metrics terminal_history")
+
+def emit(ctx, text):
+    lines = text if isinstance(text, list) else [text]
+    for line in lines:
+        print(line)
+    ctx.terminal_history.extend(lines)
+
+def stop_monitoring():
+    global running, monitoring_active, background_monitor_thread
+    running = False
+    monitor_stop.set()
+    monitoring_active = False
+    if background_monitor_thread and background_monitor_thread.is_alive():
+        background_monitor_thread.join()
+    background_monitor_thread = None
+    remove_pid_file()
+
+def show_monitor(ctx):
+    emit(ctx, "Monitoring display started. Press Space to return to menu.")
+    # The menu blocks until the display returns anyway, so run it on this thread rather than start+join another
+    display_monitor_loop(ctx.settings, ctx.metrics_config, metrics_history, ctx.terminal_history)
+
+def menu_start(ctx):
+    global running, monitoring_active, background_monitor_thread
+    existing_pid = check_existing_instance()
+    if existing_pid:
+        emit(ctx, f"Another instance is running (PID: {existing_pid}). Please stop it first.")
+        return
+    if not any(m.get("enabled") for m in ctx.settings.get("metrics", [])):
+        emit(ctx, "No metrics enabled. Configure settings to enable metrics.")
+        return
+    settings_writer.flush()  # The monitor thread reads settings from disk
+    running = True
+    monitor_stop.clear()
+    monitoring_active = True
+    write_pid_file()  # Any stale file was cleared by check_existing_instance above
+    background_monitor_thread = threading.Thread(target=background_monitor_loop, args=(ctx.metrics_config, metrics_history))
+    background_monitor_thread.start()
+    show_monitor(ctx)
+
+def menu_stop(ctx):
+    stop_monitoring()
+    emit(ctx, f"\n{RED}🔴 Monitoring stopped{RESET}")
+
+def menu_exit(ctx):
+    stop_monitoring()
+    emit(ctx, "Exiting...")
+    return True
+
+def menu_configure(ctx):
+    configure_menu(ctx.settings, ctx.metrics_config, ctx.dynamic_metrics)
+
+def menu_list_metrics(ctx):
+    msg = ["\nAvailable metrics:"]
+    settings_by_name = {m["name"]: m for m in ctx.settings["metrics"]}
+    for metric in ctx.dynamic_metrics:
+        enabled = settings_by_name.get(metric, {}).get("enabled", False)
+        msg.append(f"[{'x' if enabled else ' '}] {metric}")
+    emit(ctx, msg)
+
+def menu_view_logs(ctx):
+    msg = ["\nLast 10 log entries:"]
+    for entry in read_log_entries(10):
+        msg.append(json_dumps_pretty(entry))
+    emit(ctx, msg)
+
+def menu_check_status(ctx):
+    if monitoring_active and check_existing_instance():
+        emit(ctx, f"\n{GREEN}✅ Monitoring active (PID: {os.getpid()}){RESET}")
+    else:
+        emit(ctx, f"\n{RED}🔴 Monitoring not active{RESET}")
+
+def menu_invalid(ctx):
+    emit(ctx, "Invalid choice.")
+
+MAIN_MENU_ACTIVE_HANDLERS = {"1": show_monitor, "2": menu_stop, "3": menu_exit}
+MAIN_MENU_IDLE_HANDLERS = {
+    "1": menu_start,
+    "2": menu_configure,
+    "3": menu_list_metrics,
+    "4": menu_view_logs,
+    "5": menu_check_status,
+    "6": menu_exit
+}
+
+def main_menu(settings, metrics_config, dynamic_metrics):
+    ctx = MenuContext(settings, metrics_config, dynamic_metrics, deque(maxlen=TERMINAL_HISTORY_LINES))
     
     while True:
         if monitoring_active:
-            menu_text = [
-                "\nMonitor System:",
-                "1. Continue monitoring",
-                "2. Stop monitoring",
-                "3. Exit",
-                "Choice: "
-            ]
+            menu_text, handlers = MAIN_MENU_ACTIVE, MAIN_MENU_ACTIVE_HANDLERS
         else:
-            menu_text = [
-                "\nMonitor System:",
-                "1. Start monitoring",
-                "2. Configure settings",
-                "3. List available metrics",
-                "4. View logs",
-                "5. Check status",
-                "6. Exit",
-                "Choice: "
-            ]
+            menu_text, handlers = MAIN_MENU_IDLE, MAIN_MENU_IDLE_HANDLERS
         
-        for line in menu_text[:-1]:
+        for line in menu_text:
             print(line)
-        add_to_history(menu_text[:-1])
+        ctx.terminal_history.extend(menu_text)
         
         choice = input("Choice: ").strip()
-        add_to_history(f"Choice: {choice}")
+        ctx.terminal_history.append(f"Choice: {choice}")
         
-        if monitoring_active:
-            if choice == "1":
-                msg = "Monitoring display started. Press Space to return to menu."
-                print(msg)
-                add_to_history(msg)
-                display_monitor_thread = threading.Thread(target=display_monitor_loop, args=(settings, metrics_config, metrics_history, terminal_history))
-                display_monitor_thread.start()
-                display_monitor_thread.join()
-            elif choice == "2":
-                running = False
-                monitoring_active = False
-                if background_monitor_thread and background_monitor_thread.is_alive():
-                    background_monitor_thread.join()
-                background_monitor_thread = None
-                if os.path.exists(DEFAULT_PID_PATH):
-                    os.remove(DEFAULT_PID_PATH)
-                msg = f"\n{Fore.RED}🔴 Monitoring stopped{Style.RESET_ALL}"
-                print(msg)
-                add_to_history(msg)
-            elif choice == "3":
-                running = False
-                monitoring_active = False
-                if background_monitor_thread and background_monitor_thread.is_alive():
-                    background_monitor_thread.join()
-                background_monitor_thread = None
-                if os.path.exists(DEFAULT_PID_PATH):
-                    os.remove(DEFAULT_PID_PATH)
-                msg = "Exiting..."
-                print(msg)
-                add_to_history(msg)
-                break
-            else:
-                msg = "Invalid choice."
-                print(msg)
-                add_to_history(msg)
-        else:
-            if choice == "1":
-                existing_pid = check_existing_instance()
-                if existing_pid:
-                    msg = f"Another instance is running (PID: {existing_pid}). Please stop it first."
-                    print(msg)
-                    add_to_history(msg)
-                    continue
-                enabled_metrics = [m["name"] for m in settings.get("metrics", []) if m.get("enabled")]
-                if not enabled_metrics:
-                    msg = "No metrics enabled. Configure settings to enable metrics."
-                    print(msg)
-                    add_to_history(msg)
-                    continue
-                running = True
-                monitoring_active = True
-                if not os.path.exists(DEFAULT_PID_PATH):
-                    with open(DEFAULT_PID_PATH, 'w') as f:
-                        f.write(str(os.getpid()))
-                background_monitor_thread = threading.Thread(target=background_monitor_loop, args=(metrics_config, metrics_history))
-                background_monitor_thread.start()
-                msg = "Monitoring display started. Press Space to return to menu."
-                print(msg)
-                add_to_history(msg)
-                display_monitor_thread = threading.Thread(target=display_monitor_loop, args=(settings, metrics_config, metrics_history, terminal_history))
-                display_monitor_thread.start()
-                display_monitor_thread.join()
-            elif choice == "2":
-                result = configure_menu(settings, metrics_config)
-                if result == "main_menu":
-                    continue
-            elif choice == "3":
-                dynamic_metrics = [m["name"] for section in metrics_config.get("sections", []) for m in section.get("metrics", []) if m.get("type") == "dynamic_single"]
-                msg = ["\nAvailable metrics:"]
-                for metric in dynamic_metrics:
-                    enabled = any(m["name"] == metric and m["enabled"] for m in settings["metrics"])
-                    msg.append(f"[{'x' if enabled else ' '}] {metric}")
-                for line in msg:
-                    print(line)
-                add_to_history(msg)
-            elif choice == "4":
-                logs = load_json(DEFAULT_LOG_PATH, [])
-                msg = ["\nLast 10 log entries:"]
-                for entry in logs[-10:]:
-                    msg.append(json.dumps(entry, indent=2))
-                for line in msg:
-                    print(line)
-                add_to_history(msg)
-            elif choice == "5":
-                if monitoring_active and check_existing_instance():
-                    msg = f"\n{Fore.GREEN}✅ Monitoring active (PID: {os.getpid()}){Style.RESET_ALL}"
-                else:
-                    msg = f"\n{Fore.RED}🔴 Monitoring not active{Style.RESET_ALL}"
-                print(msg)
-                add_to_history(msg)
-            elif choice == "6":
-                running = False
-                monitoring_active = False
-                if background_monitor_thread and background_monitor_thread.is_alive():
-                    background_monitor_thread.join()
-                background_monitor_thread = None
-                if os.path.exists(DEFAULT_PID_PATH):
-                    os.remove(DEFAULT_PID_PATH)
-                msg = "Exiting..."
-                print(msg)
-                add_to_history(msg)
-                break
-            else:
-                msg = "Invalid choice."
-                print(msg)
-                add_to_history(msg)
+        if handlers.get(choice, menu_invalid)(ctx):
+            break
 
 # Main Function
 def main():
@@ -928,40 +1285,46 @@ def main():
     metrics_config_path = locate_file(METRICS_CONFIG_PATH)
     metrics_config = load_json(metrics_config_path, {"sections": [{"metrics": []}]})
     
+    # metrics_config is fixed for the session, so its dynamic metric names are computed once
+    dynamic_metrics = tuple(
+        m["name"] for section in metrics_config.get("sections", [])
+        for m in section.get("metrics", []) if m.get("type") == "dynamic_single"
+    )
+    dynamic_metrics_set = frozenset(dynamic_metrics)
+    
     settings_path = locate_file(DEFAULT_SETTINGS_PATH)
     settings = load_json(settings_path)
     if not settings or not settings.get("metrics"):
         print("Settings not found or invalid. Please initialize monitor_settings.json via the web interface or configure settings manually.")
         settings = {"general": {"interval": 5, "max_rows": 5, "ping_hosts": ["google.com"]}, "metrics": []}  # Provide default to avoid errors
     else:
-        dynamic_metrics = [
-            m["name"] for section in metrics_config.get("sections", [])
-            for m in section.get("metrics", []) if m.get("type") == "dynamic_single"
-        ]
         settings_metrics = settings.get("metrics", [])
         missing_metrics = [
             metric["name"] for metric in settings_metrics
-            if metric["name"] not in dynamic_metrics            
+            if metric["name"] not in dynamic_metrics_set
         ]
         if missing_metrics:
             print(f"Warning: The following metrics are not found in metrics_config.json: {', '.join(missing_metrics)}. Update thresholds in Configure Settings or regenerate settings via the web interface.")
             settings["metrics"] = [
                 metric for metric in settings_metrics
-                if metric["name"] in dynamic_metrics
+                if metric["name"] in dynamic_metrics_set
             ]
             print(f"Removed invalid metrics from {DEFAULT_SETTINGS_PATH}.")
             save_json(settings, DEFAULT_SETTINGS_PATH)
     warned_metrics = set()
     
     try:
-        main_menu(settings, metrics_config)
+        main_menu(settings, metrics_config, dynamic_metrics)
     finally:
+        settings_writer.flush()
         running = False
+        monitor_stop.set()
         monitoring_active = False
         if background_monitor_thread and background_monitor_thread.is_alive():
             background_monitor_thread.join()
-        if os.path.exists(DEFAULT_PID_PATH) and not check_existing_instance():
-            os.remove(DEFAULT_PID_PATH)
+        invalidate_pid_cache()
+        if not check_existing_instance():
+            remove_pid_file()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,51 +3,126 @@
 import os
 import sys
 import json
+import re
 import time
+import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
 
+try:
+    import orjson  # Optional: faster parsing of Grok replies and cache files
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+CACHE_DIR = os.path.expanduser("~/.cache/monitor_grok")
+CACHE_TTL = 30 * 24 * 3600  # Seconds a cached threshold answer stays valid
+PROMPT_VERSION = "2"  # Bump when the prompt changes so old answers are not reused
+GROK_URL = "https://api.x.ai/v1/chat/completions"
+
+# Static instructions go first, identical on every call, so the provider's prompt cache can reuse
+# them; only the short user message naming the component changes between requests.
+SYSTEM_PROMPT = (
+    "You are a hardware optimization expert.\n\n"
+    "When asked for a component's safe operational thresholds, return a valid JSON object with the following structure:\n"
+    "- thresholds: an object containing key-value pairs where each key is a threshold type (e.g., 'max_temperature', 'min_fan_speed', 'expected_voltage', etc.) and each value is the corresponding threshold value.\n"
+    "- reference: a string that must be a real online URL starting with 'http' pointing to the source of the threshold information.\n\n"
+    "Important: The 'reference' field must be a verifiable link to a real source (e.g., datasheet, maintenance guide, or official documentation). Do not invent general text or use placeholders. Only return the JSON object.\n\n"
+    "Examples:\n"
+    "For a CPU: { 'thresholds': { 'max_temperature': 95, 'min_fan_speed': 1000, 'expected_voltage': 1.2, 'voltage_tolerance': 0.05 }, 'reference': 'https://example.com/cpu-datasheet' }\n"
+    "For a GPU: { 'thresholds': { 'max_temperature': 85, 'max_power_consumption': 250 }, 'reference': 'https://example.com/gpu-specs' }"
+)
+
+JSON_OBJECT = re.compile(r"\{.*\}", re.S)  # Outermost {...}, ignoring ```json fences or trailing prose
+
+# One pooled session for all components and retries, so TLS connections to api.x.ai are reused
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+def cache_path(model_name):
+    key = hashlib.sha256((model_name + PROMPT_VERSION).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def load_cached(model_name):
+    path = cache_path(model_name)
+    try:
+        mtime = os.path.getmtime(path)
+        if time.time() - mtime > CACHE_TTL:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Entries written before the fetch date was stored were fetched when the file was written
+    data.setdefault('last_updated', date.fromtimestamp(mtime).isoformat())
+    return data
+
+def save_cached(model_name, data):
+    """Cache a fresh answer, stamped with the day it was fetched."""
+    data['last_updated'] = date.today().isoformat()
+    path = cache_path(model_name)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Warning: could not cache thresholds for '{model_name}': {e}")
+
 def fetch_thresholds_from_grok(model_name, api_key):
-    url = "https://api.x.ai/v1/chat/completions"
+    cached = load_cached(model_name)
+    if cached is not None:
+        return cached
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
-    prompt = (
-        f"You are a hardware optimization expert.\n\n"
-        f"Provide safe operational thresholds for the model '{model_name}'.\n\n"
-        "Return a valid JSON object with the following structure:\n"
-        "- thresholds: an object containing key-value pairs where each key is a threshold type (e.g., 'max_temperature', 'min_fan_speed', 'expected_voltage', etc.) and each value is the corresponding threshold value.\n"
-        "- reference: a string that must be a real online URL starting with 'http' pointing to the source of the threshold information.\n\n"
-        "Important: The 'reference' field must be a verifiable link to a real source (e.g., datasheet, maintenance guide, or official documentation). Do not invent general text or use placeholders. Only return the JSON object.\n\n"
-        "Examples:\n"
-        "For a CPU: {{ 'thresholds': {{ 'max_temperature': 95, 'min_fan_speed': 1000, 'expected_voltage': 1.2, 'voltage_tolerance': 0.05 }}, 'reference': 'https://example.com/cpu-datasheet' }}\n"
-        "For a GPU: {{ 'thresholds': {{ 'max_temperature': 85, 'max_power_consumption': 250 }}, 'reference': 'https://example.com/gpu-specs' }}"
-    )
-
     payload = {
         "model": "grok-3-latest",
         "messages": [
-            {"role": "system", "content": "You are a performance optimization expert for Linux systems."},
-            {"role": "user", "content": prompt}
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Provide safe operational thresholds for the model '{model_name}'."}
         ],
+        "response_format": {"type": "json_object"},
         "temperature": 0
     }
 
     for attempt in range(1, 4):
         try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=120)
+            resp = SESSION.post(GROK_URL, headers=headers, json=payload, timeout=120)
             resp.raise_for_status()
             content = resp.json().get("choices", [])[0].get("message", {}).get("content", "")
-            parsed = json.loads(content)
+            match = JSON_OBJECT.search(content)
+            parsed = json_loads(match.group(0) if match else content)
+            if not isinstance(parsed, dict) or not isinstance(parsed.get("thresholds"), dict):
+                raise ValueError("Missing 'thresholds' object in Grok response.")
             ref = parsed.get("reference", "")
-            if not ref.startswith("http"):
+            if not isinstance(ref, str) or not ref.startswith("http"):
                 raise ValueError("Missing or invalid 'reference' URL in Grok response.")
+            save_cached(model_name, parsed)
             return parsed
-        except Exception as e:
+        except requests.RequestException:
             if attempt == 3:
-                raise e
-            time.sleep(5)
+                raise
+            time.sleep(5)  # Back off only for network/HTTP failures
+        except Exception:
+            if attempt == 3:
+                raise
+            # Malformed answer: ask again straight away, waiting doesn't help here
+
+def iter_components(path):
+    """Yield each distinct non-empty line of the hardware list as it is read."""
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            s = line.strip()
+            if s and s not in seen:  # Each model is queried once
+                seen.add(s)
+                yield s
 
 def main():
     # Locate API key file
@@ -79,23 +154,40 @@ def main():
     # Get hardware list file path from user
     hardware_list_path = "system_info.txt"
 
-    # Read hardware list
-    with open(hardware_list_path, 'r', encoding='utf-8') as f:
-        components = [line.strip() for line in f if line.strip()]
+    # Each lookup is an independent network round-trip, so run them side by side while the
+    # hardware list is still being read; at most max_workers * 2 requests wait in the queue
+    max_workers = 8
+    components = []
+    results = {}
+    futures = {}
+
+    def collect(done):
+        for future in done:
+            component = futures.pop(future)
+            try:
+                results[component] = future.result()
+            except Exception as e:
+                print(f"Failed ({component}): {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for component in iter_components(hardware_list_path):
+            if len(futures) >= max_workers * 2:
+                collect([next(as_completed(futures))])
+            components.append(component)
+            print(f"Fetching thresholds for '{component}'...")
+            futures[executor.submit(fetch_thresholds_from_grok, component, api_key)] = component
+        collect(list(as_completed(futures)))
+
     if not components:
         print("Hardware list is empty. Exiting.")
         sys.exit(1)
 
     all_thresholds = {}
     failed_models = []
-    for component in components:
-        print(f"Fetching thresholds for '{component}'...")
-        try:
-            thresholds = fetch_thresholds_from_grok(component, api_key)
-            thresholds['last_updated'] = date.today().isoformat()
-            all_thresholds[component] = thresholds
-        except Exception as e:
-            print(f"Failed: {e}")
+    for component in components:  # Report in file order, not completion order
+        if component in results:
+            all_thresholds[component] = results[component]  # last_updated is the day it was fetched
+        else:
             failed_models.append(component)
 
     if not all_thresholds:
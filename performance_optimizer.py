@@ -1,14 +1,28 @@
 #!/usr/bin/env python3
 
 import os
+import io
 import json
+import shlex
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import sys
 import time
 import subprocess
-from tqdm import tqdm
+import tempfile
+import threading
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from tabulate import tabulate
 import re
+import select
+import signal
+
+try:
+    import orjson  # Optional: faster serialization of the metrics embedded in prompts
+except ImportError:
+    orjson = None
 
 # -------------------- Constants --------------------
 OUTPUT_FILE = "performance_report.txt"
@@ -16,6 +30,8 @@ TUNE_SCRIPT = "tune_system.sh"
 CONFIG_FILE = "metrics_config.json"
 API_KEY_FILE = "api_key.txt"
 SYSTEM_INFO_FILE = "system_info.txt"
+GROK_URL = "https://api.x.ai/v1/chat/completions"
+API_TIMEOUT = (5, 120)  # Connect / read seconds, so a stalled API call can't hang the run
 
 # HFT-relevant sections from collect_data.py
 HFT_SECTIONS = [
@@ -32,10 +48,43 @@ HFT_SECTIONS = [
 ]
 # Non-HFT sections to exclude from balanced profile
 NON_HFT_SECTIONS = ["USB Devices", "Installed Packages", "PCI Devices (Verbose)"]
+DYNAMIC_TYPES = frozenset({"dynamic_single", "dynamic_multi"})
+SYSTEM_DATA_TTL = 30  # Seconds a collection is reused when the same sections are analyzed again
+system_data_cache = {}  # tuple(sorted(sections)) -> (monotonic time collected, system data)
+COMMAND_TIMEOUT = 30  # Seconds before a single metric command is abandoned
+MAX_COLLECT_WORKERS = 32  # Metric commands mostly wait on the kernel/tools, so run many at once
+NEEDS_SHELL = re.compile(r"""[|&;<>()$`\\"'*?\[\]#~{}!\n]""")  # Pipes, redirects, expansions, quoting...
+# `cat` of a single /proc or /sys file: read it directly instead of spawning a process per sample
+METRIC_PATH = re.compile(r"/(?:proc|sys)/[\w./-]+")  # Kernel files a metric command reads
+PLAIN_FILE_READ = re.compile(r"""^cat\s+(/(?:proc|sys)/[^\s|&;<>()$`\\"'*?\[\]{}~]+)$""")
+END_MARKER = "__METRIC_END__"
+SAMPLE_END = re.compile(END_MARKER.encode() + rb" (\d+)\n")  # Closes one sample in a shell reader's output
+APP_PLACEHOLDER = "/path/to/hft_app"  # Stand-in Grok uses for the user's trading binary
+TIMEOUT_EXIT_STATUS = 124  # What timeout(1) exits with when it had to stop the command
+TUNE_MARKER = "__TUNE_STEP__"  # Tags each tuning command's start and exit status in the batch output
+VIRTIO = re.compile(r"virtio", re.IGNORECASE)
+VIRTUALIZED_KEY = "__is_virtualized"  # Set on collected system data; never sent to the API
+SECTION_BOUNDARY = re.compile(r'\n(?=== |\n- \*\*)')  # Newline that starts the next report section
+SSE_DONE = "[DONE]"
+PROGRESS_INTERVAL = 0.1  # Seconds between streamed progress updates (at most ~10 per second)
+TARGETS_ARRAY = re.compile(r'"targets"\s*:\s*\[')  # Where streamed targets start arriving
+TARGET_DECODER = json.JSONDecoder()
+
+# One keep-alive session for every xAI call, so analysis, targets and fallbacks share a TLS connection
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=frozenset({"POST"}))
+))
 
 # -------------------- Helpers --------------------
-def locate_file(filename, default_paths=None, prompt_message=None):
-    """Locate a file in default paths or prompt user for its location."""
+DIR_LISTING_TTL = 5.0  # main() looks up three files back to back; list each folder once for all of them
+directory_listings = {}  # parent dir -> (monotonic time listed, frozenset of entry names)
+located_files = {}  # (filename, default_paths) -> path found earlier, or None once the user skipped it
+
+def search_default_paths(filename, default_paths=None):
+    """Return the first default location of filename that exists, or None."""
     script_dir = os.path.dirname(os.path.abspath(__file__))
     if default_paths is None:
         default_paths = [
@@ -45,9 +94,45 @@ def locate_file(filename, default_paths=None, prompt_message=None):
             os.path.expanduser(os.path.join("~", filename)),
             os.path.expanduser(os.path.join("~", "LinuxVM", filename)),
         ]
+    # One directory listing per candidate folder answers all lookups in it, instead of a stat per path
     for path in default_paths:
-        if os.path.exists(path):
+        if os.path.basename(path) in list_directory(os.path.dirname(path) or "."):
             return path
+    return None
+
+def list_directory(parent):
+    """Names in parent (empty if unreadable), listed at most once per DIR_LISTING_TTL seconds."""
+    now = time.monotonic()
+    cached = directory_listings.get(parent)
+    if cached and now - cached[0] < DIR_LISTING_TTL:
+        return cached[1]
+    try:
+        with os.scandir(parent) as entries:
+            names = frozenset(entry.name for entry in entries)
+    except OSError:
+        names = frozenset()
+    directory_listings[parent] = (now, names)
+    return names
+
+def locate_file(filename, default_paths=None, prompt_message=None):
+    """Locate a file in default paths or prompt user for its location."""
+    key = (filename, tuple(default_paths) if default_paths is not None else None)
+    if key in located_files:
+        path = located_files[key]
+        if path is not None and os.path.exists(path):
+            return path  # One stat instead of walking every default location again
+        if path is None:
+            # The user was already asked once; only pick the file up if it has appeared since
+            path = located_files[key] = search_default_paths(filename, default_paths)
+            return path
+    path = located_files[key] = prompt_for_file(filename, default_paths, prompt_message)
+    return path
+
+def prompt_for_file(filename, default_paths=None, prompt_message=None):
+    """Search the default paths, then ask the user for the file's location."""
+    path = search_default_paths(filename, default_paths)
+    if path:
+        return path
     if prompt_message:
         print(prompt_message)
     else:
@@ -60,76 +145,319 @@ def locate_file(filename, default_paths=None, prompt_message=None):
             return user_path
         print(f"File '{user_path}' not found. Try again (or press Enter to skip):")
 
+def write_executable(path, text):
+    """Atomically replace path with text as an executable (0o755) script."""
+    temp_path = path + ".tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+    with os.fdopen(fd, "wb") as f:
+        f.write(text.encode("utf-8"))
+    os.replace(temp_path, path)
+
+def contains_virtio(data):
+    """Whether any metric name or output mentions virtio (i.e. we are running in a VM)."""
+    return any(
+        VIRTIO.search(name) or (isinstance(output, str) and VIRTIO.search(output))
+        for name, output in data.items()
+    )
+
+def is_virtualized(data):
+    """Virtualization flag recorded by collect_system_data, or a scan for data collected elsewhere."""
+    flag = data.get(VIRTUALIZED_KEY)
+    return flag if flag is not None else contains_virtio(data)
+
+def prompt_metrics(data):
+    # "__" keys are our own annotations (e.g. the virtualization flag), not metrics for Grok
+    return {k: v for k, v in data.items() if not k.startswith("__")}
+
+def metrics_json(data):
+    """Serialize metrics for a prompt; non-ASCII tool output stays as-is instead of \\uXXXX escapes."""
+    if orjson is not None:
+        return orjson.dumps(prompt_metrics(data), option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(prompt_metrics(data), indent=2, ensure_ascii=False)
+
+def write_metrics_json(out, data, data_json=None):
+    """Write the prompt JSON for data into out, reusing data_json when the caller already has it."""
+    if data_json is not None:
+        out.write(data_json)
+    elif orjson is not None:
+        out.write(metrics_json(data))
+    else:
+        json.dump(prompt_metrics(data), out, indent=2, ensure_ascii=False)
+
+def is_sampling_command(cmd):
+    """True for commands that report over several seconds rather than change anything."""
+    return "free -m -s" in cmd or "vmstat" in cmd
+
+def needs_validation(recommendations, dynamic_metrics):
+    """True when some recommended command names a validated metric or touches a file it reads."""
+    commands = " ".join(cmd for rec in recommendations for cmd in rec["commands"]).lower()
+    if not commands:
+        return False
+    return any(
+        m["name"].lower() in commands or any(path.lower() in commands for path in METRIC_PATH.findall(m["command"]))
+        for m in dynamic_metrics
+    )
+
+def run_in_background(fn, *args, **kwargs):
+    """Start fn on a daemon thread and return a Future; a call nobody waits for never delays exit."""
+    future = Future()
+
+    def runner():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=runner, daemon=True).start()
+    return future
+
 def check_config_age(config_path):
     """Warn if metrics_config.json is older than 24 hours."""
     mtime = os.path.getmtime(config_path)
     if time.time() - mtime > 86400:
         print("⚠️ Warning: metrics_config.json is older than 24 hours. Consider running collect_data.py.")
 
+@lru_cache(maxsize=None)
+def command_argv(command):
+    """argv tuple for a command that needs no shell features, else None (tokenized once per command)."""
+    if NEEDS_SHELL.search(command):
+        return None
+    argv = shlex.split(command)
+    return tuple(argv) if argv and "=" not in argv[0] else None
+
+def run_metric_command(command):
+    """Run one metric command and return its stripped output or an error string."""
+    argv = command_argv(command)
+    try:
+        if argv:
+            try:
+                # Exec plain commands directly instead of through an extra /bin/sh
+                return subprocess.check_output(argv, text=True, stderr=subprocess.STDOUT, timeout=COMMAND_TIMEOUT).strip()
+            except FileNotFoundError:
+                pass  # Shell builtin or missing tool: let the shell run it or report it
+        return subprocess.check_output(command, shell=True, text=True, stderr=subprocess.STDOUT, timeout=COMMAND_TIMEOUT).strip()
+    except subprocess.CalledProcessError as e:
+        return f"Error: {e.output.strip()}"
+    except subprocess.TimeoutExpired:
+        return f"Error: timed out after {COMMAND_TIMEOUT}s"
+
 def collect_system_data(config, sections, progress_callback=None):
     """Collect system metrics for specified sections with progress updates."""
-    system_data = {}
     if progress_callback:
         progress_callback({"step": "Collecting system metrics...", "percent": 10, "error": None})
     else:
         print("Collecting system metrics...")
-    for idx, section in enumerate(config["sections"]):
-        if section["title"] not in sections:
-            continue
-        step = f"Gathering {section['title']} data..."
-        progress = 10 + (idx + 1) * (30 // len(config["sections"]))
-        if progress_callback:
-            progress_callback({"step": step, "percent": min(progress, 40), "error": None})
-        for metric in section["metrics"]:
-            try:
-                output = subprocess.check_output(metric["command"], shell=True, text=True, stderr=subprocess.STDOUT).strip()
-                system_data[metric["name"]] = output
-            except subprocess.CalledProcessError as e:
-                system_data[metric["name"]] = f"Error: {e.output.strip()}"
+    tasks = [
+        (section["title"], metric["name"], metric["command"])
+        for section in config["sections"] if section["title"] in sections
+        for metric in section["metrics"]
+    ]
+    # Commands are independent and I/O-bound, so run them all at once rather than one after another
+    results = {}
+    if tasks:
+        with ThreadPoolExecutor(max_workers=min(MAX_COLLECT_WORKERS, len(tasks))) as executor:
+            futures = {executor.submit(run_metric_command, cmd): (title, name) for title, name, cmd in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                title, name = futures[future]
+                results[name] = future.result()
+                if progress_callback:
+                    progress = 10 + 30 * done // len(tasks)
+                    progress_callback({"step": f"Gathering {title} data...", "percent": min(progress, 40), "error": None})
+    # Keep config order so the prompt built from this dict is stable between runs
+    system_data = {name: results[name] for _, name, _ in tasks}
     if not system_data:
         error = "No system data collected"
         if progress_callback:
             progress_callback({"step": error, "percent": 10, "error": error})
         raise Exception(error)
+    system_data[VIRTUALIZED_KEY] = contains_virtio(system_data)  # Decided once; callers just look it up
+    return system_data
+
+class FileMetricReader:
+    """Sample a /proc or /sys file through one open handle, re-reading it from the start each time."""
+
+    fd = None  # Regular files are always "ready"; they are read on each tick instead of polled
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+
+    def read(self):
+        try:
+            self.file.seek(0)
+            return self.file.read().decode("utf-8", "replace").strip()
+        except OSError as e:
+            return f"Error: {e}"
+
+    def close(self):
+        self.file.close()
+
+class ShellMetricReader:
+    """Keep one shell per metric that re-runs the command whenever a line arrives on its stdin."""
+
+    def __init__(self, command):
+        script = f'while read -r _; do {{ {command}\n}} </dev/null 2>&1; echo "{END_MARKER} $?"; done'
+        # Own process group, so close() can stop a command that is still running along with its shell
+        self.proc = subprocess.Popen(["/bin/sh", "-c", script], stdin=subprocess.PIPE, stdout=subprocess.PIPE, start_new_session=True)
+        self.fd = self.proc.stdout.fileno()  # Polled for readiness by collect_validation_metrics
+        self.buffer = b""
+        self.busy = False  # A sample was requested and hasn't finished yet
+        self.exited = False
+
+    def request(self):
+        """Start the next sample, unless the previous one is still running."""
+        if self.busy or self.exited:
+            return
+        try:
+            self.proc.stdin.write(b"\n")
+            self.proc.stdin.flush()
+            self.busy = True
+        except OSError:
+            self.exited = True
+
+    def feed(self):
+        """Consume output that is ready on fd; return the finished sample, or None while it is still running."""
+        chunk = os.read(self.fd, 65536)
+        if not chunk:
+            self.busy, self.exited = False, True
+            return f"Error: {self.buffer.decode('utf-8', 'replace').strip() or 'metric reader exited'}"
+        self.buffer += chunk
+        match = SAMPLE_END.search(self.buffer)
+        if not match:
+            return None
+        output = self.buffer[:match.start()].decode("utf-8", "replace").strip()
+        self.buffer = self.buffer[match.end():]
+        self.busy = False
+        return output if match.group(1) == b"0" else f"Error: {output}"
+
+    def close(self):
+        try:
+            self.proc.stdin.close()  # Ends the loop once the current command is done
+        except OSError:
+            pass
+        if self.busy:  # Still inside a command that overran the collection window
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc.stdout.close()
+
+def open_metric_reader(command):
+    """Pick the cheapest way to sample a command repeatedly."""
+    match = PLAIN_FILE_READ.match(command.strip())
+    if match:
+        try:
+            return FileMetricReader(match.group(1))
+        except OSError:
+            pass  # Let the shell report the failure the way `cat` would
+    return ShellMetricReader(command)
+
+def collect_system_data_cached(config, sections):
+    """collect_system_data, reusing the result for the same sections within SYSTEM_DATA_TTL seconds."""
+    key = tuple(sorted(sections))
+    collected_at, cached = system_data_cache.get(key, (0.0, None))
+    if cached is not None and time.monotonic() - collected_at < SYSTEM_DATA_TTL:
+        print("Reusing metrics collected moments ago (choose 'Refresh metrics' to re-collect).")
+        return cached
+    system_data = collect_system_data(config, sections)
+    system_data_cache[key] = (time.monotonic(), system_data)
     return system_data
 
 def collect_validation_metrics(metrics, duration=5, progress_callback=None, percent_start=0, percent_end=100):
     """Collect dynamic metrics for specified duration with progress updates."""
-    results = {}
+    results = dict.fromkeys(metric["name"] for metric in metrics)  # Keeps metric order for the report
     step = f"Validating pre-tuning metrics..."
     if progress_callback:
         progress_callback({"step": step, "percent": percent_start, "error": None})
     else:
         print(f"Collecting metrics for {duration} seconds...")
-    with tqdm(total=duration, desc="Collecting", unit="s") as pbar:
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            for metric in metrics:
-                try:
-                    output = subprocess.check_output(metric["command"], shell=True, text=True, stderr=subprocess.STDOUT).strip()
-                    results[metric["name"]] = output
-                except subprocess.CalledProcessError as e:
-                    results[metric["name"]] = f"Error: {e.output.strip()}"
-            time.sleep(1)
+    # Spawn once per metric instead of once per metric per second
+    readers = [(metric["name"], open_metric_reader(metric["command"])) for metric in metrics]
+    file_readers = [(name, reader) for name, reader in readers if reader.fd is None]
+    shell_readers = {reader.fd: (name, reader) for name, reader in readers if reader.fd is not None}
+    poller = select.poll()
+    for fd in shell_readers:
+        poller.register(fd, select.POLLIN)
+    # Plain one-line counter for interactive CLI runs; callers with a callback get updates instead
+    show_progress = progress_callback is None and sys.stderr.isatty()
+    try:
+        start_time = time.monotonic()
+        next_tick = start_time
+        ticks = 0
+        while time.monotonic() - start_time < duration:
+            for _, reader in shell_readers.values():  # Start every command first so they run side by side
+                reader.request()
+            for name, reader in file_readers:
+                results[name] = reader.read()
+            ticks += 1
+            # Report right after sampling, so terminal/UI writes land in the idle part of the second
             if progress_callback:
-                elapsed = time.time() - start_time
-                progress = percent_start + int((elapsed / duration) * (percent_end - percent_start))
+                progress = percent_start + int((ticks / duration) * (percent_end - percent_start))
                 progress_callback({"step": step, "percent": min(progress, percent_end), "error": None})
-            pbar.update(1)
+            elif show_progress:
+                sys.stderr.write(f"\rCollecting [{min(ticks, duration)}/{duration}s]")
+                sys.stderr.flush()
+            next_tick += 1.0  # Fixed one-second boundaries, so sampling time doesn't accumulate as drift
+            # Until the next tick, take each command's sample the moment it is written; idle otherwise.
+            # A slow command simply reports late instead of holding up the others.
+            while (remaining := next_tick - time.monotonic()) > 0:
+                for fd, _ in poller.poll(remaining * 1000):
+                    name, reader = shell_readers[fd]
+                    sample = reader.feed()
+                    if sample is not None:
+                        results[name] = sample
+                    if reader.exited:
+                        poller.unregister(fd)
+        if show_progress:
+            sys.stderr.write("\n")
+    finally:
+        for _, reader in readers:
+            reader.close()
+    for name, sample in results.items():
+        if sample is None:
+            results[name] = f"Error: no sample within {duration}s"
     return results
 
+def sections_by_title(config):
+    """Title -> section index; main() builds it once at load, other callers get a fresh one."""
+    index = config.get("_by_title")
+    return index if index is not None else {s["title"]: s for s in config["sections"]}
+
+def sections_by_metric(config):
+    """Metric name or subsection -> title of the first section that has it, in config order."""
+    index = {}
+    for s in config["sections"]:
+        for m in s["metrics"]:
+            index.setdefault(m["name"], s["title"])
+            index.setdefault(m["subsection"], s["title"])
+    return index
+
+def recommendation_section(title, by_metric):
+    """Section a recommendation belongs to: the first metric or subsection its title mentions."""
+    section = by_metric.get(title.split(":", 1)[0].strip())  # Titles usually lead with the metric name
+    if section is None:
+        section = next((t for key, t in by_metric.items() if key in title), "General Optimizations")
+    return section
+
 def get_profile_sections(config, profile):
-    """Retrieve sections for the selected profile or category."""
+    """Retrieve the section titles (plain strings) for the selected profile or category."""
     available_sections = [s["title"] for s in config["sections"] if s["metrics"]]
     if not available_sections:
         print("❌ Error: No sections with metrics in metrics_config.json. Run collect_data.py first.")
         sys.exit(1)
     if profile == "balanced":
+        by_title = sections_by_title(config)
         return [
             s for s in available_sections
             if s not in NON_HFT_SECTIONS
-            and any(m["type"] in ["dynamic_single", "dynamic_multi"]
-                    for m in next(sec["metrics"] for sec in config["sections"] if sec["title"] == s))
+            and any(m["type"] in DYNAMIC_TYPES for m in by_title[s]["metrics"])
         ]
     sections = [
         s for s in HFT_SECTIONS if s in available_sections and s in (
@@ -145,19 +473,16 @@ def get_profile_sections(config, profile):
 
 def get_dynamic_metrics(config, sections):
     """Retrieve dynamic_single and dynamic_multi metrics for validation."""
+    wanted = set(sections)
     return [
-        m for s in config["sections"] if s["title"] in sections
-        for m in s["metrics"] if m["type"] in ["dynamic_single", "dynamic_multi"]
+        m for s in config["sections"] if s["title"] in wanted
+        for m in s["metrics"] if m["type"] in DYNAMIC_TYPES
     ]
 
 # -------------------- API Call Functions --------------------
-def analyze_system(api_key, data, system_info, profile, sections, progress_callback=None):
+def analyze_system(api_key, data, system_info, profile, sections, progress_callback=None, data_json=None, config=None):
     """Call xAI API to analyze system metrics with streaming Markdown output."""
-    url = "https://api.x.ai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    headers = {"Authorization": f"Bearer {api_key}"}
     scope = f"{'profile' if profile else 'category'}-specific ({', '.join(sections)})"
     focus = {
         "latency": "IRQ affinity, NUMA binding, CPU utilization",
@@ -169,31 +494,37 @@ def analyze_system(api_key, data, system_info, profile, sections, progress_callb
 
     # Collect system data if not provided
     if not data:
-        config_path = locate_file("metrics_config.json")
-        if not config_path:
-            error = "metrics_config.json is required"
-            if progress_callback:
-                progress_callback({"step": error, "percent": 10, "error": error})
-            raise Exception(error)
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        if config is None:  # Callers that already parsed the config pass it in to skip the reload
+            config_path = locate_file("metrics_config.json")
+            if not config_path:
+                error = "metrics_config.json is required"
+                if progress_callback:
+                    progress_callback({"step": error, "percent": 10, "error": error})
+                raise Exception(error)
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
         data = collect_system_data(config, sections, progress_callback)
+        data_json = None  # Anything passed in described the empty dict
 
     # Warn about virtualization limitations
-    if "virtio" in json.dumps(data).lower():
+    if is_virtualized(data):
         step = "⚠️ Virtualized environment detected."
         if progress_callback:
             progress_callback({"step": step, "percent": 40, "error": None})
         else:
             print(step)
 
-    prompt = (
+    # Built in one buffer with the metrics JSON streamed straight into it, no separate JSON string
+    prompt = io.StringIO()
+    prompt.write(
         "You are a performance optimization expert for Linux systems, specializing in low-latency environments like high-frequency trading (HFT).\n\n"
         f"**System Context**: {system_context}\n\n"
         "Analyze the following system metrics from `metrics_config.json`:\n\n"
         "```json\n"
-        f"{json.dumps(data, indent=2)}\n"
-        "```\n\n"
+    )
+    write_metrics_json(prompt, data, data_json)
+    prompt.write(
+        "\n```\n\n"
         f"**Analysis Instructions**:\n"
         f"- Scope: {scope}. Analyze only the provided metrics and avoid assumptions about missing data (e.g., CPU info if not included).\n"
         f"- Focus on {focus} for HFT optimization.\n"
@@ -234,7 +565,7 @@ def analyze_system(api_key, data, system_info, profile, sections, progress_callb
         "model": "grok-3-latest",
         "messages": [
             {"role": "system", "content": "You are a performance optimization expert for Linux systems."},
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": prompt.getvalue()}
         ],
         "stream": True
     }
@@ -243,58 +574,65 @@ def analyze_system(api_key, data, system_info, profile, sections, progress_callb
     else:
         print("Analyzing...")
     try:
-        response = requests.post(url, headers=headers, json=payload, stream=True)
+        response = SESSION.post(GROK_URL, headers=headers, json=payload, stream=True, timeout=API_TIMEOUT)
         response.raise_for_status()
-        partial_content = ""
+        reply = io.StringIO()  # Parsed once after [DONE], never re-parsed per chunk
+        brace_depth = 0
         current_section = []
         section_buffer = ""
         section_count = 0
         expected_sections = 4  # System Overview, NUMA, Bottlenecks, Recommendations
-        for chunk in response.iter_lines():
-            if chunk:
-                chunk_data = chunk.decode("utf-8")
-                if chunk_data.startswith("data: "):
-                    chunk_json = chunk_data[6:]
-                    if chunk_json.strip() == "[DONE]":
-                        break
-                    try:
-                        chunk_obj = json.loads(chunk_json)
-                        if "choices" in chunk_obj and chunk_obj["choices"]:
-                            content = chunk_obj["choices"][0].get("delta", {}).get("content", "")
-                            if content:
-                                partial_content += content
-                                section_buffer += content
-                                # Check for section boundaries
-                                if "\n===" in section_buffer or "\n- **" in section_buffer or section_buffer.strip().endswith("```"):
-                                    # Extract complete sections
-                                    sections = re.split(r'\n(?=== |\n- \*\*)', section_buffer)
-                                    for i, section in enumerate(sections[:-1]):
-                                        if section.strip():
-                                            current_section.append(section)
-                                            section_text = "".join(current_section)
-                                            try:
-                                                json.loads(partial_content)  # Ensure valid JSON so far
-                                                section_count += 1
-                                                percent = 50 + (25 * section_count / expected_sections)
-                                                if progress_callback:
-                                                    progress_callback({
-                                                        "step": f"Generating report: {section.strip().split('\n')[0]}",
-                                                        "percent": min(percent, 75),
-                                                        "error": None,
-                                                        "partial_report": section_text
-                                                    })
-                                                else:
-                                                    print(section_text)
-                                                current_section = []
-                                            except json.JSONDecodeError:
-                                                continue
-                                    section_buffer = sections[-1]
-                    except json.JSONDecodeError:
-                        continue
-        if partial_content:
-            parsed = json.loads(partial_content)
-            # Emit any remaining section
-            if section_buffer.strip():
+        last_emit = 0.0
+        response.encoding = "utf-8"  # SSE replies may omit the charset; don't let requests guess latin-1
+        for line in response.iter_lines(decode_unicode=True, chunk_size=8192):
+            if line.startswith("data:"):  # Also accept producers that omit the space
+                chunk_json = line[5:].strip()
+                if chunk_json == SSE_DONE:
+                    break
+                try:
+                    chunk_obj = json.loads(chunk_json)
+                    if "choices" in chunk_obj and chunk_obj["choices"]:
+                        content = chunk_obj["choices"][0].get("delta", {}).get("content", "")
+                        if content:
+                            reply.write(content)
+                            brace_depth += content.count("{") - content.count("}")
+                            section_buffer += content
+                            # Peel complete sections off the front; only the unfinished tail stays buffered
+                            while True:
+                                boundary = SECTION_BOUNDARY.search(section_buffer)
+                                if not boundary:
+                                    break
+                                section = section_buffer[:boundary.start()]
+                                section_buffer = section_buffer[boundary.end():]
+                                if section.strip():
+                                    current_section.append(section)
+                                    if brace_depth <= 0:
+                                        continue  # Not inside the reply's JSON object yet
+                                    now = time.monotonic()
+                                    if now - last_emit < PROGRESS_INTERVAL:
+                                        continue  # Coalesce into the next update instead of flooding the UI
+                                    last_emit = now
+                                    section_text = "".join(current_section)
+                                    section_count += 1
+                                    percent = 50 + (25 * section_count / expected_sections)
+                                    if progress_callback:
+                                        progress_callback({
+                                            "step": f"Generating report: {section.strip().split('\n')[0]}",
+                                            "percent": min(percent, 75),
+                                            "error": None,
+                                            "partial_report": section_text
+                                        })
+                                    else:
+                                        print(section_text)
+                                    current_section = []
+                except json.JSONDecodeError:
+                    continue
+        reply = reply.getvalue()
+        if reply:
+            parsed = json.loads(reply)
+            # Emit any remaining section, including text held back by the rate limit
+            remaining = "".join(current_section) + section_buffer
+            if remaining.strip():
                 section_count += 1
                 percent = 50 + (25 * section_count / expected_sections)
                 if progress_callback:
@@ -302,7 +640,7 @@ def analyze_system(api_key, data, system_info, profile, sections, progress_callb
                         "step": "Generating report: Finalizing...",
                         "percent": min(percent, 75),
                         "error": None,
-                        "partial_report": section_buffer
+                        "partial_report": remaining
                     })
             return parsed["analysis"], parsed["recommendations"]
         else:
@@ -310,7 +648,7 @@ def analyze_system(api_key, data, system_info, profile, sections, progress_callb
     except requests.RequestException as e:
         payload["stream"] = False
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = SESSION.post(GROK_URL, headers=headers, json=payload, timeout=API_TIMEOUT)
             response.raise_for_status()
             parsed = response.json()
             content = parsed["choices"][0]["message"]["content"]
@@ -327,22 +665,37 @@ def analyze_system(api_key, data, system_info, profile, sections, progress_callb
     except (KeyError, json.JSONDecodeError) as e:
         raise Exception(f"Invalid streaming API response format: {e}")
 
-def get_grok_targets(api_key, data, system_info, profile, sections, progress_callback=None):
+def decode_closed_objects(pending):
+    """Decode every complete object at the front of a streamed JSON array; return them and the rest."""
+    objects = []
+    while True:
+        pending = pending.lstrip(" \t\r\n,")
+        if not pending.startswith("{"):
+            return objects, pending
+        try:
+            obj, end = TARGET_DECODER.raw_decode(pending)
+        except json.JSONDecodeError:
+            return objects, pending  # Still streaming in
+        if isinstance(obj, dict):
+            objects.append(obj)
+        pending = pending[end:]
+
+def get_grok_targets(api_key, data, system_info, profile, sections, progress_callback=None, data_json=None):
     """Get performance targets from xAI API with incremental table output."""
-    url = "https://api.x.ai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    headers = {"Authorization": f"Bearer {api_key}"}
     scope = f"{'profile' if profile else 'category'}-specific ({', '.join(sections)})"
     system_context = system_info if system_info else "No system context available."
-    prompt = (
+    # Built in one buffer with the metrics JSON streamed straight into it, no separate JSON string
+    prompt = io.StringIO()
+    prompt.write(
         "You are a performance optimization expert for Linux systems, specializing in HFT.\n\n"
         f"**System Context**: {system_context}\n\n"
         "Given system metrics:\n\n"
         "```json\n"
-        f"{json.dumps(data, indent=2)}\n"
-        "```\n\n"
+    )
+    write_metrics_json(prompt, data, data_json)
+    prompt.write(
+        "\n```\n\n"
         f"Scope: {scope}\n"
         "Suggest performance targets for dynamic metrics (e.g., enp0s1_rx_queue_0_drops < 10).\n"
         "Return JSON: {\"targets\": [{\"metric\": \"\", \"target\": 0, \"unit\": \"\"}]}\n"
@@ -351,7 +704,7 @@ def get_grok_targets(api_key, data, system_info, profile, sections, progress_cal
         "model": "grok-3-latest",
         "messages": [
             {"role": "system", "content": "You are a performance optimization expert for Linux systems."},
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": prompt.getvalue()}
         ],
         "stream": True
     }
@@ -360,41 +713,48 @@ def get_grok_targets(api_key, data, system_info, profile, sections, progress_cal
     else:
         print("Fetching targets...")
     try:
-        response = requests.post(url, headers=headers, json=payload, stream=True)
+        response = SESSION.post(GROK_URL, headers=headers, json=payload, stream=True, timeout=API_TIMEOUT)
         response.raise_for_status()
-        partial_content = ""
-        current_section = []
-        for chunk in response.iter_lines():
-            if chunk:
-                chunk_data = chunk.decode("utf-8")
-                if chunk_data.startswith("data: "):
-                    chunk_json = chunk_data[6:]
-                    if chunk_json.strip() == "[DONE]":
-                        break
-                    try:
-                        chunk_obj = json.loads(chunk_json)
-                        if "choices" in chunk_obj and chunk_obj["choices"]:
-                            content = chunk_obj["choices"][0].get("delta", {}).get("content", "")
-                            if content:
-                                partial_content += content
-                                current_section.append(content)
-                                section_text = "".join(current_section)
-                                if "\n  }" in section_text or section_text.strip().endswith("]"):
-                                    try:
-                                        targets = json.loads(partial_content)["targets"]
-                                        if not progress_callback:
-                                            print(tabulate(
-                                                [[t["metric"], t["target"], t["unit"]] for t in targets],
-                                                headers=["Metric", "Target", "Unit"],
-                                                tablefmt="grid"
-                                            ))
-                                        current_section = []
-                                    except json.JSONDecodeError:
-                                        continue
-                    except json.JSONDecodeError:
-                        continue
-        if partial_content:
-            parsed = json.loads(partial_content)
+        reply = io.StringIO()
+        # Text after the "targets" array opened that hasn't been decoded into a target yet
+        pending = ""
+        in_targets = False
+        targets_seen = 0
+        last_emit = 0.0
+        response.encoding = "utf-8"  # SSE replies may omit the charset; don't let requests guess latin-1
+        for line in response.iter_lines(decode_unicode=True, chunk_size=8192):
+            if line.startswith("data:"):  # Also accept producers that omit the space
+                chunk_json = line[5:].strip()
+                if chunk_json == SSE_DONE:
+                    break
+                try:
+                    chunk_obj = json.loads(chunk_json)
+                    if "choices" in chunk_obj and chunk_obj["choices"]:
+                        content = chunk_obj["choices"][0].get("delta", {}).get("content", "")
+                        if content:
+                            reply.write(content)
+                            pending += content
+                            if not in_targets:
+                                match = TARGETS_ARRAY.search(pending)
+                                if not match:
+                                    continue
+                                in_targets, pending = True, pending[match.end():]
+                            new_targets, pending = decode_closed_objects(pending)
+                            if new_targets:
+                                rows = [[t.get("metric"), t.get("target"), t.get("unit")] for t in new_targets]
+                                if progress_callback:
+                                    now = time.monotonic()
+                                    if now - last_emit >= PROGRESS_INTERVAL:  # "Targets received." below always goes out
+                                        progress_callback({"step": f"Received target for {rows[-1][0]}", "percent": 85, "error": None})
+                                        last_emit = now
+                                else:
+                                    print(tabulate(rows, headers=["Metric", "Target", "Unit"] if not targets_seen else (), tablefmt="grid"))
+                                targets_seen += len(new_targets)
+                except json.JSONDecodeError:
+                    continue
+        reply = reply.getvalue()
+        if reply:
+            parsed = json.loads(reply)
             if progress_callback:
                 progress_callback({"step": "Targets received.", "percent": 90, "error": None})
             return parsed["targets"]
@@ -403,7 +763,7 @@ def get_grok_targets(api_key, data, system_info, profile, sections, progress_cal
     except requests.RequestException as e:
         payload["stream"] = False
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = SESSION.post(GROK_URL, headers=headers, json=payload, timeout=API_TIMEOUT)
             response.raise_for_status()
             parsed = response.json()
             content = parsed["choices"][0]["message"]["content"]
@@ -442,35 +802,98 @@ def apply_tuning(recommendations, inputs, dynamic_metrics, pre_metrics, progress
             else:
                 print(f"⚠️ Warning: {error}")
 
+    # Every command goes into one script instead of a shell per command. Each line keeps its own
+    # sudo prefix, so only the command itself is elevated, as when they ran one by one; redirections
+    # and later pipeline stages run as the invoking user
+    batch = []
+    script = []
+    app_path = inputs.get("appPath")
+    substitute_app = bool(app_path and app_path != APP_PLACEHOLDER)  # Usually not set: skip the per-command copy
     for idx, rec in enumerate(recommendations):
-        step = f"Applying {rec['title']}..."
-        if progress_callback:
-            progress_callback({"step": step, "percent": 70, "error": None})
-        else:
-            print(step)
         for cmd in rec["commands"]:
-            cmd = cmd.replace("/path/to/hft_app", inputs.get("appPath", "/path/to/hft_app"))
+            if substitute_app:
+                cmd = cmd.replace(APP_PLACEHOLDER, app_path)
             if "smp_affinity" in cmd:
                 irq_num = cmd.split("/")[3].split("/")[0]
                 if not os.path.exists(f"/proc/irq/{irq_num}/smp_affinity"):
                     continue
-            try:
-                proc = subprocess.run(f"sudo {cmd}", shell=True, capture_output=True, text=True, timeout=30)
-                if proc.returncode != 0:
-                    raise subprocess.CalledProcessError(proc.returncode, cmd, proc.stderr)
-                tuning_applied = True
-                success_step = f"Applied: {rec['title']}"
-                if progress_callback:
-                    progress_callback({"step": success_step, "percent": 70, "error": None})
-                else:
-                    print(f"✅ {success_step}")
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-                error = f"Failed to apply {rec['title']}: {e}"
-                if progress_callback:
-                    progress_callback({"step": error, "percent": 70, "error": error})
+            script.append(
+                f'echo "{TUNE_MARKER} {len(batch)}"\n'
+                # --foreground keeps the terminal, so sudo can still prompt and reuse its ticket
+                f'{{ timeout --foreground {COMMAND_TIMEOUT} sudo {cmd}\n}} </dev/null 2>&1\n'
+                f'rc=$?\necho "{TUNE_MARKER} {len(batch)} $rc"\n'
+                '[ "$rc" -eq 0 ] || exit "$rc"\n'  # Stop at the first failure, as before
+            )
+            batch.append((idx, cmd))
+
+    if batch:
+        def notify(step, error=None, console=None):
+            if progress_callback:
+                progress_callback({"step": step, "percent": 70, "error": error})
+            else:
+                print(console or (f"⚠️ Warning: {step}" if error else step))
+
+        with tempfile.NamedTemporaryFile("w", suffix=".sh", delete=False, encoding="utf-8") as f:
+            f.write("".join(script))
+        timeout = COMMAND_TIMEOUT * len(batch)
+        # Same session and terminal as the caller: sudo inside the script may need to ask for a password
+        proc = subprocess.Popen(['bash', f.name], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        expired = threading.Event()
+
+        def expire():  # Backstop only; each command is already limited to COMMAND_TIMEOUT by the script
+            expired.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+        # Report each recommendation from the script's markers as they arrive
+        announced = set()
+        current = None  # Batch position of a command that started but hasn't reported its status
+        lines = []
+        error = None
+        try:
+            for line in proc.stdout:
+                line = line.rstrip("\n")
+                if not line.startswith(TUNE_MARKER):
+                    lines.append(line)
+                    continue
+                fields = line.split()
+                position = int(fields[1])
+                idx, cmd = batch[position]
+                rec = recommendations[idx]
+                if len(fields) == 2:  # Command starting
+                    current, lines = position, []
+                    if idx not in announced:
+                        announced.add(idx)
+                        notify(f"Applying {rec['title']}...")
+                elif fields[2] == "0":
+                    current = None
+                    tuning_applied = True
+                    notify(f"Applied: {rec['title']}", console=f"✅ Applied: {rec['title']}")
                 else:
-                    print(f"⚠️ Warning: {error}")
-                return False, []
+                    rc = int(fields[2])
+                    if rc == TIMEOUT_EXIT_STATUS:
+                        failed = subprocess.TimeoutExpired(cmd, COMMAND_TIMEOUT)
+                    else:
+                        failed = subprocess.CalledProcessError(rc, cmd, "\n".join(lines))
+                    error = f"Failed to apply {rec['title']}: {failed}"
+                    break
+            proc.wait()
+        finally:
+            timer.cancel()
+            proc.stdout.close()
+            os.remove(f.name)
+        if error is None and (current is not None or expired.is_set() or proc.returncode != 0):
+            if current is not None:  # The script stopped inside a command: timed out or the shell bailed out
+                idx, cmd = batch[current]
+                failed = subprocess.TimeoutExpired(cmd, timeout) if expired.is_set() else subprocess.CalledProcessError(proc.returncode, cmd, "\n".join(lines))
+                error = f"Failed to apply {recommendations[idx]['title']}: {failed}"
+            else:  # bash itself failed or timed out before any command ran
+                output = "\n".join(lines).strip()
+                error = f"Failed to apply tuning: {output or 'the tuning commands did not run'}"
+        if error is not None:
+            notify(error, error)
+            return False, []
 
     if dynamic_metrics and tuning_applied:
         step = "Collecting post-tuning metrics..."
@@ -514,6 +937,7 @@ def main():
     check_config_age(config_path)
     with open(config_path, "r", encoding="utf-8") as f:
         config = json.load(f)
+    config["_by_title"] = sections_by_title(config)  # Built once; every menu pass reuses it
 
     system_info_path = locate_file(
         "system_info.txt",
@@ -538,7 +962,8 @@ def main():
         print("3. Balanced Profile (Focusing on all available dynamic metrics)")
         print("4. Select Category (e.g., Network Interface Configuration, CPU Info, Custom Metrics)")
         print("5. Exit")
-        choice = input("Enter your choice (1-5): ").strip()
+        print("6. Refresh metrics (discard collected data cached in the last 30 seconds)")
+        choice = input("Enter your choice (1-6): ").strip()
 
         if choice == "4":
             categories = [s["title"] for s in config["sections"] if s["metrics"]] + ["All"]
@@ -570,6 +995,10 @@ def main():
         elif choice == "5":
             print("Exiting.")
             return
+        elif choice == "6":
+            system_data_cache.clear()
+            print("Cached metrics cleared; the next run collects fresh data.")
+            continue
         else:
             profile_map = {"1": "latency", "2": "throughput", "3": "balanced"}
             if choice not in profile_map:
@@ -578,22 +1007,35 @@ def main():
             profile = profile_map[choice]
             sections = get_profile_sections(config, profile)
 
-        system_data = collect_system_data(config, sections)
-        if "virtio" in json.dumps(system_data).lower():
+        system_data = collect_system_data_cached(config, sections)
+        system_data_json = metrics_json(system_data)  # Shared by the analysis and targets prompts
+        if is_virtualized(system_data):
             print("⚠️ Virtualized environment detected. Some HFT optimizations may be limited.")
 
+        dynamic_metrics = get_dynamic_metrics(config, sections)
+        # Targets only need the collected metrics, so let Grok work on them while the analysis streams.
+        # The quiet callback keeps the background call from printing into the analysis output.
+        targets_future = None
+        if dynamic_metrics:
+            targets_future = run_in_background(
+                get_grok_targets, XAI_API_KEY, system_data, system_info, profile, sections,
+                progress_callback=lambda update: None, data_json=system_data_json
+            )
+
         print("Sending data to xAI API for analysis...")
-        analysis, recommendations = analyze_system(XAI_API_KEY, system_data, system_info, profile, sections)
+        analysis, recommendations = analyze_system(XAI_API_KEY, system_data, system_info, profile, sections, data_json=system_data_json, config=config)
         print("\n=== Performance Report ===\n")
         print(analysis)
-        dynamic_metrics = get_dynamic_metrics(config, sections)
+        # Tables shown on screen and saved in the report are rendered once and reused for both
+        dynamic_table = None
         if dynamic_metrics:
-            print("\n=== Dynamic Metrics for Validation ===\n")
-            print(tabulate(
+            dynamic_table = tabulate(
                 [[m["name"], m["command"]] for m in dynamic_metrics],
                 headers=["Metric", "Command"],
                 tablefmt="grid"
-            ))
+            )
+            print("\n=== Dynamic Metrics for Validation ===\n")
+            print(dynamic_table)
         print("=== End of Report ===\n")
 
         if not dynamic_metrics:
@@ -603,76 +1045,111 @@ def main():
             print("Skipping tuning and validation.")
             continue
 
-        with open(tune_script, "w", encoding="utf-8") as f:
-            f.write("#!/bin/bash\n\n")
-            f.write("# Performance tuning script for HFT system optimization\n")
-            f.write('echo "=== System Tuning ==="\n')
-            f.write(f'echo "Performance report available in {output_file}"\n')
-            f.write(f'echo "Found {len(recommendations)} optimization recommendations."\n')
-            f.write('echo "🔧 Executing optimizations for high-frequency trading (interactive prompts)..."\n\n')
-            for rec in recommendations:
-                f.write(f'echo "=== {rec["title"]} ==="\n')
-                f.write(f'echo "{rec["description"]}"\n')
-                if "numactl" in " ".join(rec["commands"]).lower() and "/path/to/hft_app" in " ".join(rec["commands"]):
-                    f.write('echo "Please provide the path to your HFT application (e.g., /usr/bin/trading_app):"\n')
-                    f.write('read -p "Application path: " APP_PATH\n')
-                    f.write('if [ -z "$APP_PATH" ] || [ ! -x "$APP_PATH" ]; then\n')
-                    f.write('    echo "⚠️ Invalid or missing application path, skipping."\n')
-                    f.write('    continue\n')
-                    f.write('fi\n')
-                elif "kill" in " ".join(rec["commands"]).lower():
-                    f.write('echo "⚠️ This recommendation terminates processes. Ensure critical processes are not affected."\n')
-                elif "thermal" in rec["title"].lower() or "temperature" in rec["title"].lower():
-                    f.write('echo "⚠️ This recommendation addresses hardware health (physical systems only)."\n')
-                f.write('read -p "Apply this recommendation? (y/N): " ans\n')
-                f.write('if [[ $ans =~ ^[Yy]$ ]]; then\n')
-                for cmd in rec["commands"]:
-                    if "free -m -s" in cmd or "vmstat" in cmd:
-                        f.write(f'    timeout 10s {cmd}\n')
-                    elif "smp_affinity" in cmd:
-                        irq_num = cmd.split("/")[3].split("/")[0]
-                        f.write(f'if [ -f "/proc/irq/{irq_num}/smp_affinity" ]; then\n')
-                        f.write(f'    sudo {cmd}\n')
-                        f.write(f'else\n')
-                        f.write(f'    echo "IRQ {irq_num} not found, skipping."\n')
-                        f.write(f'fi\n')
+        # Baseline samples take a fixed 5 seconds; skip them when no recommendation can move a
+        # validated metric, and otherwise take them while the script is being generated
+        validation_metrics = dynamic_metrics if needs_validation(recommendations, dynamic_metrics) else []
+        pre_metrics_future = None
+        if validation_metrics:
+            pre_metrics_future = run_in_background(collect_validation_metrics, validation_metrics, duration=5)
+
+        # Build the whole script in memory and write it in one go, so an interrupted run never leaves half a script
+        script_lines = []
+        write = script_lines.append
+        write("#!/bin/bash\n\n")
+        write("# Performance tuning script for HFT system optimization\n")
+        write('echo "=== System Tuning ==="\n')
+        write(f'echo "Performance report available in {output_file}"\n')
+        write(f'echo "Found {len(recommendations)} optimization recommendations."\n')
+        write('echo "🔧 Executing optimizations for high-frequency trading (interactive prompts)..."\n\n')
+        # Sampling commands (free -m -s, vmstat) take seconds each. Those that come before the first
+        # state-changing command would see the untouched system anyway, so run each distinct one once,
+        # all side by side, before the prompts, and show the captured output where they appear.
+        # Any later sampler runs live, so it reports the state after the tuning applied above it.
+        samplers = {}  # Command -> output file number
+        presampled = {}  # (recommendation index, command index) -> output file number
+        for r_idx, rec in enumerate(recommendations):
+            changing = next((c_idx for c_idx, cmd in enumerate(rec["commands"]) if not is_sampling_command(cmd)), None)
+            for c_idx, cmd in enumerate(rec["commands"][:changing]):
+                presampled[r_idx, c_idx] = samplers.setdefault(cmd, len(samplers))
+            if changing is not None:
+                break
+        if samplers:
+            write('SAMPLE_DIR=$(mktemp -d)\n')
+            write('trap \'rm -rf "$SAMPLE_DIR"\' EXIT\n')
+            write(f'echo "Sampling system state ({len(samplers)} command(s), up to 10s)..."\n')
+            for cmd, i in samplers.items():
+                write(f'timeout 10s {cmd} > "$SAMPLE_DIR/{i}.out" 2>&1 &\n')
+            write('wait\n\n')
+        for r_idx, rec in enumerate(recommendations):
+            write(f'echo "=== {rec["title"]} ==="\n')
+            write(f'echo "{rec["description"]}"\n')
+            commands = " ".join(rec["commands"])  # Joined once for all the checks below
+            commands_lower = commands.lower()
+            if "numactl" in commands_lower and APP_PLACEHOLDER in commands:
+                write('echo "Please provide the path to your HFT application (e.g., /usr/bin/trading_app):"\n')
+                write('read -p "Application path: " APP_PATH\n')
+                write('if [ -z "$APP_PATH" ] || [ ! -x "$APP_PATH" ]; then\n')
+                write('    echo "⚠️ Invalid or missing application path, skipping."\n')
+                write('    continue\n')
+                write('fi\n')
+            elif "kill" in commands_lower:
+                write('echo "⚠️ This recommendation terminates processes. Ensure critical processes are not affected."\n')
+            elif "thermal" in rec["title"].lower() or "temperature" in rec["title"].lower():
+                write('echo "⚠️ This recommendation addresses hardware health (physical systems only)."\n')
+            write('read -p "Apply this recommendation? (y/N): " ans\n')
+            write('if [[ $ans =~ ^[Yy]$ ]]; then\n')
+            for c_idx, cmd in enumerate(rec["commands"]):
+                if (r_idx, c_idx) in presampled:
+                    write(f'    echo {shlex.quote(cmd + " (sampled before any tuning was applied):")}\n')
+                    write(f'    cat "$SAMPLE_DIR/{presampled[r_idx, c_idx]}.out"\n')
+                elif is_sampling_command(cmd):
+                    write(f'    timeout 10s {cmd}\n')
+                elif "smp_affinity" in cmd:
+                    irq_num = cmd.split("/")[3].split("/")[0]
+                    write(f'if [ -f "/proc/irq/{irq_num}/smp_affinity" ]; then\n')
+                    write(f'    sudo {cmd}\n')
+                    write(f'else\n')
+                    write(f'    echo "IRQ {irq_num} not found, skipping."\n')
+                    write(f'fi\n')
+                else:
+                    if APP_PLACEHOLDER in cmd:
+                        write(f'    {cmd.replace(APP_PLACEHOLDER, "$APP_PATH")}\n')
                     else:
-                        if "/path/to/hft_app" in cmd:
-                            f.write(f'    {cmd.replace("/path/to/hft_app", "$APP_PATH")}\n')
-                        else:
-                            f.write(f'    sudo {cmd}\n')
-                f.write(f'    echo "✅ Applied: {rec["title"]}"\n')
-                f.write('else\n')
-                f.write(f'    echo "⏭️ Skipped: {rec["title"]}"\n')
-                f.write('fi\n\n')
-            f.write('echo "🎉 Tuning complete. Reboot if necessary."\n')
-        os.chmod(tune_script, 0o755)
+                        write(f'    sudo {cmd}\n')
+            write(f'    echo "✅ Applied: {rec["title"]}"\n')
+            write('else\n')
+            write(f'    echo "⏭️ Skipped: {rec["title"]}"\n')
+            write('fi\n\n')
+        write('echo "🎉 Tuning complete. Reboot if necessary."\n')
+        write_executable(tune_script, "".join(script_lines))
         print(f"⚙️ Generated tuning script: {tune_script}")
 
-        pre_metrics = {}
-        if dynamic_metrics:
-            pre_metrics = collect_validation_metrics(dynamic_metrics, duration=5)
-        tuning_applied, validation = apply_tuning(recommendations, {}, dynamic_metrics, pre_metrics, tune_script_path=tune_script)
-        if tuning_applied and dynamic_metrics:
+        pre_metrics = pre_metrics_future.result() if pre_metrics_future else {}
+        tuning_applied, validation = apply_tuning(recommendations, {}, validation_metrics, pre_metrics, tune_script_path=tune_script)
+        validation_table = None
+        if tuning_applied and validation_metrics:
+            validation_table = tabulate(
+                [[v["metric"], v["pre"], v["post"]] for v in validation],
+                headers=["Metric", "Pre", "Post"],
+                tablefmt="grid"
+            )
             print("\n=== Validation Results ===\n")
-            table = [[v["metric"], v["pre"], v["post"]] for v in validation]
-            print(tabulate(table, headers=["Metric", "Pre", "Post"], tablefmt="grid"))
+            print(validation_table)
             if not tuning_applied:
                 print("Note: No tuning applied, pre/post metrics expected to be similar.")
             print("=== End of Validation Results ===\n")
+        elif tuning_applied and dynamic_metrics:
+            print("Validation skipped: no recommendation changes a validated metric.")
         else:
             print("Validation skipped: Tuning script failed or interrupted.")
 
+        by_title = sections_by_title(config)  # Static metrics and the section summary look sections up here
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(analysis + "\n")
             grouped_recs = {}
+            by_metric = sections_by_metric(config)
             for rec in recommendations:
-                section = next(
-                    (s["title"] for s in config["sections"] for m in s["metrics"]
-                     if m["name"] in rec["title"] or m["subsection"] in rec["title"]),
-                    "General Optimizations"
-                )
-                grouped_recs.setdefault(section, []).append(rec)
+                grouped_recs.setdefault(recommendation_section(rec["title"], by_metric), []).append(rec)
             for section, recs in grouped_recs.items():
                 f.write(f"\n=== {section} ===\n")
                 f.write(tabulate(
@@ -682,8 +1159,8 @@ def main():
                 ))
             f.write("\n=== Static Metrics Analyzed ===\n")
             static_metrics = [
-                m for s in config["sections"] if s["title"] in sections
-                for m in s["metrics"] if m["type"] == "static"
+                m for title in sections if title in by_title
+                for m in by_title[title]["metrics"] if m["type"] == "static"
             ]
             if static_metrics:
                 f.write(tabulate(
@@ -694,37 +1171,34 @@ def main():
             else:
                 f.write("No static metrics analyzed.\n")
             f.write("\n=== Dynamic Metrics for Validation ===\n")
-            if dynamic_metrics:
-                f.write(tabulate(
-                    [[m["name"], m["command"]] for m in dynamic_metrics],
-                    headers=["Metric", "Command"],
-                    tablefmt="grid"
-                ))
+            if dynamic_table:
+                f.write(dynamic_table)
             else:
                 f.write("No dynamic metrics available for validation.\n")
             f.write("\n=== Validation Targets ===\n")
-            if dynamic_metrics:
-                targets = get_grok_targets(XAI_API_KEY, system_data, system_info, profile, sections)
+            if targets_future:
+                targets = targets_future.result()
                 if targets:
-                    f.write(tabulate(
+                    targets_table = tabulate(
                         [[t["metric"], t["target"], t["unit"]] for t in targets],
                         headers=["Metric", "Target", "Unit"],
                         tablefmt="grid"
-                    ))
+                    )
+                    print(targets_table)
+                    f.write(targets_table)
                 else:
                     f.write("No validation targets provided.\n")
             f.write("\n=== Validation Results ===\n")
-            if tuning_applied and dynamic_metrics:
-                table = [[v["metric"], v["pre"], v["post"]] for v in validation]
-                f.write(tabulate(table, headers=["Metric", "Pre", "Post"], tablefmt="grid"))
+            if validation_table:
+                f.write(validation_table)
                 if not tuning_applied:
                     f.write("\nNote: No tuning applied, pre/post metrics expected to be similar.\n")
             else:
                 f.write("No validation results (no dynamic metrics or tuning not applied).\n")
             f.write("\n=== Section Summary ===\n")
             for section in sections:
-                metrics = [m for m in next(s["metrics"] for s in config["sections"] if s["title"] == section)]
-                has_dynamic = any(m["type"] in ["dynamic_single", "dynamic_multi"] for m in metrics)
+                metrics = by_title[section]["metrics"]
+                has_dynamic = any(m["type"] in DYNAMIC_TYPES for m in metrics)
                 f.write(f"{section}: {'Validated' if has_dynamic else 'Analyzed only (no dynamic metrics)'}\n")
         print(f"📄 Saved analysis to {output_file}")
 
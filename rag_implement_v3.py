@@ -1,31 +1,226 @@
 import os
+import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
+import hashlib
 import collect_data
 import upgrade_recommender_2
 import m_monitor_system_analyzer
+import answer_cache
 import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
-from langchain_community.vectorstores import Chroma
 from langchain.prompts import ChatPromptTemplate
 from langchain_xai import ChatXAI
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
+import torch
 from sentence_transformers import SentenceTransformer
 from langchain.embeddings.base import Embeddings
-from typing import List
+from typing import Dict, List
+import numpy as np
+from transformers import AutoTokenizer
+
+try:
+    import onnxruntime  # Optional: INT8 inference for the embedding model on CPU
+except ImportError:
+    onnxruntime = None
+
+# Quantized ONNX exports, used instead of the PyTorch model on CPU when present. To create one:
+#   optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 minilm_onnx/
+#   python -c "from onnxruntime.quantization import quantize_dynamic, QuantType; \
+#     quantize_dynamic('minilm_onnx/model.onnx', 'minilm_onnx/model_int8.onnx', weight_type=QuantType.QInt8)"
+ONNX_MODEL_DIRS = {'all-MiniLM-L6-v2': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'minilm_onnx')}
+ONNX_MODEL_FILE = 'model_int8.onnx'
+
+class OnnxSentenceEncoder:
+    """Mean-pooled sentence embeddings from an ONNX export; encode() mirrors SentenceTransformer's."""
+
+    def __init__(self, model_dir: str, max_length: int = 256):
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE), providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = max_length
+
+    def encode(self, texts, batch_size=64, normalize_embeddings=True, **kwargs):
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                   max_length=self.max_length, return_tensors='np')
+            tokens = self.session.run(None, {k: v for k, v in batch.items() if k in self.input_names})[0]
+            mask = batch['attention_mask'][..., np.newaxis].astype(tokens.dtype)
+            pooled = (tokens * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if normalize_embeddings:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            batches.append(pooled)
+        return np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+
+def load_model(model_name: str):
+    """Return (model, backend name): the INT8 ONNX export on CPU when available, else PyTorch."""
+    if torch.cuda.is_available():
+        return SentenceTransformer(model_name, device='cuda'), 'torch-cuda'
+    model_dir = ONNX_MODEL_DIRS.get(model_name)
+    if onnxruntime is not None and model_dir and os.path.exists(os.path.join(model_dir, ONNX_MODEL_FILE)):
+        return OnnxSentenceEncoder(model_dir), 'onnx-int8'
+    return SentenceTransformer(model_name, device='cpu'), 'torch'
 
 # Custom Embeddings class for SentenceTransformer
 class SentenceTransformerEmbeddings(Embeddings):
+    _model_cache: Dict[str, tuple] = {}  # One loaded model per name for the whole process
+
     def __init__(self, model_name: str):
-        self.model = SentenceTransformer(model_name)
+        if model_name not in self._model_cache:
+            self._model_cache[model_name] = load_model(model_name)
+        self.model, self.backend = self._model_cache[model_name]
     
+    # Unit-length vectors make cosine similarity a plain dot product in the vector store
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        return self.model.encode(texts).tolist()
+        return self.model.encode(texts, batch_size=64, convert_to_numpy=True,
+                                 normalize_embeddings=True, show_progress_bar=False).tolist()
     
     def embed_query(self, text: str) -> List[float]:
-        return self.model.encode([text])[0].tolist()
+        return self.model.encode([text], batch_size=64, convert_to_numpy=True,
+                                 normalize_embeddings=True, show_progress_bar=False)[0].tolist()
+
+NUMA_NODE_DIR = "/sys/devices/system/node"
+
+def parse_cpulist(text):
+    """Expand a sysfs CPU list such as '0-3,8-11' into a set of CPU numbers."""
+    cpus = set()
+    for part in text.strip().split(","):
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.update(range(int(start), int(end) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+def pin_to_numa_node(node=0):
+    """Keep this process and torch's threads on one NUMA node, so the embedding model's weights
+    stay in local memory. Only acts on multi-node machines; anything else is left untouched.
+
+    The mask applies to the whole process and is inherited by every child it starts, so this is
+    meant for a process that only serves embeddings, not for the server."""
+    try:
+        nodes = [n for n in os.listdir(NUMA_NODE_DIR) if re.fullmatch(r"node\d+", n)]
+        if len(nodes) < 2:
+            return
+        with open(os.path.join(NUMA_NODE_DIR, f"node{node}", "cpulist"), "r") as f:
+            cpus = parse_cpulist(f.read()) & os.sched_getaffinity(0)
+        if not cpus:
+            return
+        os.sched_setaffinity(0, cpus)
+        torch.set_num_threads(len(cpus))
+    except (OSError, ValueError, AttributeError):
+        pass  # No sysfs NUMA info (containers, non-Linux): run unpinned
+
+# Opt-in: set EMBEDDING_NUMA_NODE=<n> when running the embedding work as its own process
+if os.environ.get("EMBEDDING_NUMA_NODE", "").isdigit():
+    pin_to_numa_node(int(os.environ["EMBEDDING_NUMA_NODE"]))
+
+# Loaded once per process; building it means loading the model weights
+embedding = SentenceTransformerEmbeddings('all-MiniLM-L6-v2')
+
+# Embedded chunks are kept on disk under the hash of the text they came from, so an
+# unchanged source is never re-embedded. The text changes with every collection, so only
+# the newest store of each source (system_info, monitor) is kept, on disk and in memory.
+VECTORSTORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".vector_cache")
+EMBEDDING_VERSION = "5"  # Bump when the embeddings or chunking change so old stores are not reused
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.json"  # Written last, so its presence marks a complete store
+
+# Small child chunks give sharp embeddings to search on; the larger parent chunk they came
+# from is what the LLM sees, so a hit carries enough surrounding context to answer from.
+# Sizes are in tokens; the tiktoken encoder loads once here, and disallowed_special=() skips
+# the special-token scan over every piece measured while splitting.
+PARENT_SPLITTER = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+    chunk_size=300, chunk_overlap=0, disallowed_special=())
+CHILD_SPLITTER = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+    chunk_size=40, chunk_overlap=8, disallowed_special=())
+RETRIEVE_K = 3
+indexes = {}  # source -> (content key, ChunkIndex)
+index_lock = threading.Lock()  # One writer per store; replacing a store deletes the previous one
+
+class ChunkIndex:
+    """Child-chunk vectors held in memory, searched exhaustively and answered with parent chunks.
+
+    The corpus is a few hundred vectors at most, so one matrix product is exact and cheaper
+    than opening a vector database or walking an approximate index.
+    """
+
+    def __init__(self, vectors, child_parents, parents):
+        self.vectors = vectors  # (children, dim), unit length
+        self.child_parents = child_parents  # Parent id of each vector row
+        self.parents = parents  # Parent id -> parent chunk text
+
+    def search_by_vector(self, query_vector, k=RETRIEVE_K):
+        """Parent chunks of the k closest child chunks, best match first."""
+        if not len(self.child_parents):
+            return []
+        sims = self.vectors @ np.asarray(query_vector, dtype=np.float32)
+        top = np.argsort(-sims)[:k]
+        parent_ids = dict.fromkeys(self.child_parents[i] for i in top)
+        return [Document(page_content=self.parents[parent_id]) for parent_id in parent_ids]
+
+    def search(self, question, k=RETRIEVE_K):
+        return self.search_by_vector(embedding.embed_query(question), k)
+
+def write_replace(path, write):
+    """Write a file through a temporary name, so readers never see it half written."""
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        write(f)
+    os.replace(temp_path, path)
+
+def remove_stale_stores(source, keep):
+    """Delete the source's older stores, and stores left from the unprefixed layout."""
+    try:
+        names = os.listdir(VECTORSTORE_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name != keep and (name.startswith(source + "-") or re.fullmatch(r"[0-9a-f]{64}", name)):
+            shutil.rmtree(os.path.join(VECTORSTORE_DIR, name), ignore_errors=True)
+
+def get_index(content, source):
+    """Return a ChunkIndex for the given text, embedding it only when it has changed."""
+    # Quantized and full-precision vectors differ slightly, so each backend keeps its own stores
+    key = hashlib.sha256((EMBEDDING_VERSION + embedding.backend + content).encode("utf-8")).hexdigest()
+    with index_lock:
+        cached = indexes.get(source)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        index = load_or_build_index(content, f"{source}-{key}")
+        indexes[source] = (key, index)
+        remove_stale_stores(source, keep=f"{source}-{key}")
+    return index
+
+def load_or_build_index(content, store_name):
+    persist_dir = os.path.join(VECTORSTORE_DIR, store_name)
+    chunks_path = os.path.join(persist_dir, CHUNKS_FILE)
+    vectors_path = os.path.join(persist_dir, VECTORS_FILE)
+    if os.path.exists(chunks_path):
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        vectors = np.load(vectors_path)
+    else:
+        parents = {str(i): text for i, text in enumerate(PARENT_SPLITTER.split_text(content))}
+        children = [(parent_id, chunk) for parent_id, text in parents.items() for chunk in CHILD_SPLITTER.split_text(text)]
+        chunks = {"parents": parents, "child_parents": [parent_id for parent_id, _ in children]}
+        vectors = np.asarray(embedding.embed_documents([chunk for _, chunk in children]), dtype=np.float32)
+        os.makedirs(persist_dir, exist_ok=True)
+        write_replace(vectors_path, lambda f: np.save(f, vectors))
+        write_replace(chunks_path, lambda f: f.write(json.dumps(chunks).encode("utf-8")))
+    return ChunkIndex(vectors, chunks["child_parents"], chunks["parents"])
+
+# Repeated or reworded questions are answered without retrieval or another LLM call
+answers = answer_cache.AnswerCache(embedding.embed_query)
 
 # Environment variables and API key loading remain unchanged
 try:
@@ -41,18 +236,47 @@ except FileNotFoundError:
     print("Error: api_key.txt not found. Create a file named api_key.txt and add your xAI API key.")
     exit(1)
 
+# The RAG prompt and the LLM client are built once; each question only supplies its retriever
+TEMPLATE = """Answer the question based only on the following context:
+    {context}
+    
+    Question: {question}
+    """
+PROMPT_TEMPLATE = ChatPromptTemplate.from_template(TEMPLATE)
+LLM = ChatXAI(model_name="grok-3-latest", temperature=0)
+
+def build_chain(retriever):
+    """RAG chain answering from whatever the retriever returns for the question."""
+    return (
+        {"context": retriever, "question": RunnablePassthrough()}
+        | PROMPT_TEMPLATE
+        | LLM
+        | StrOutputParser()
+    )
+
 # Other functions (ask_grok_cat, extract_category, etc.) remain unchanged
 
-def ask_grok_cat(prompt):
-    """Use Grok to categorize the user query."""
-    switch = """ Look at the above query and assign it to one of the category numbers below:
+GROK_URL = "https://api.x.ai/v1/chat/completions"
+API_TIMEOUT = (3, 15)  # Connect, read; categorization replies are a few tokens
+
+# Keep-alive session so each categorization call reuses the TLS connection to api.x.ai
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504], allowed_methods=frozenset({"POST"}))
+))
+
+# The category list lives in the system message so the whole prefix is identical on every call
+# and the provider's prompt cache can reuse it; only the user's query changes between requests
+CATEGORY_SYSTEM_PROMPT = """You are a helpful assistant for managing and analyzing Linux servers.
+
+Look at the user's query and assign it to one of the category numbers below:
     1 - Asking about system information such as hardware details and capacity
     2 - Asking to monitor the system or asking for thresholds for a component or the entire system
     3 - Asking for a recommendation about components or upgrades similar to those installed and where to buy them"""
-    
-    full_prompt = prompt + "\n\n" + switch
 
-    url = "https://api.x.ai/v1/chat/completions"
+def ask_grok_cat(prompt):
+    """Use Grok to categorize the user query."""
     headers = {
         "Authorization": f"Bearer {XAI_API_KEY}",
         "Content-Type": "application/json"
@@ -60,26 +284,37 @@ def ask_grok_cat(prompt):
     payload = {
         "model": "grok-3-latest",
         "messages": [
-            {"role": "system", "content": "You are a helpful assistant for managing and analyzing Linux servers."},
-            {"role": "user", "content": full_prompt}
+            {"role": "system", "content": CATEGORY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
         ],
         "stream": False,
         "temperature": 0
     }
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = SESSION.post(GROK_URL, headers=headers, json=payload, timeout=API_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         return data["choices"][0]["message"]["content"]
     except requests.RequestException as e:
         return f"Error contacting Grok API: {e}"
 
+CATEGORY_NUMBER = re.compile(r'\d+')
+
 def extract_category(response):
     """Extract the category number from Grok's response."""
-    match = re.search(r'\d+', response)
+    # The answer leads with the number; only look further when the first line has none
+    match = CATEGORY_NUMBER.search(response.partition('\n')[0]) or CATEGORY_NUMBER.search(response)
     return int(match.group()) if match else None
 
-def ask_cat1(prompt):
+def content_retriever(content, source, query_vector=None):
+    """Retriever over content; with query_vector the search is done now instead of re-embedding the question."""
+    index = get_index(content, source)
+    if query_vector is None:
+        return lambda question: index.search(question)
+    docs = index.search_by_vector(query_vector)
+    return lambda _: docs
+
+def ask_cat1(prompt, query_vector=None):
     #system_info.txt
 
     """Handle category 1: System information queries using RAG."""
@@ -88,7 +323,7 @@ def ask_cat1(prompt):
     # Load hardware data from text files
     try:
         print("Checking file")
-        with open("system_info.txt", "r", encoding="utf-8", errors="ignore") as file:
+        with open(SYSTEM_INFO_PATH, "r", encoding="utf-8", errors="ignore") as file:
             content = file.read()
             inventory_data = content
     except FileNotFoundError:
@@ -97,41 +332,11 @@ def ask_cat1(prompt):
         return f"Error reading inventory files: {e}"
 
     
-    raw_data = inventory_data
-    
-    documents = [Document(page_content=content, metadata={"source": raw_data})]
-    
-    # Split documents
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=300, chunk_overlap=50)
-    splits = text_splitter.split_documents(documents)
-    
-    # Create vector store and retriever with custom embeddings
-    embedding = SentenceTransformerEmbeddings('all-MiniLM-L6-v2')
-    vectorstore = Chroma.from_documents(documents=splits, embedding=embedding)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 1})
-    
-    # Define prompt template
-    template = """Answer the question based only on the following context:
-    {context}
-    
-    Question: {question}
-    """
-    prompt_template = ChatPromptTemplate.from_template(template)
-    
-    # Initialize LLM
-    llm = ChatXAI(model_name="grok-3-latest", temperature=0)
-    
-    # Set up RAG chain
-    rag_chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | prompt_template
-        | llm
-        | StrOutputParser()
-    )
+    # Reuses the stored embeddings while system_info.txt is unchanged
+    retriever = content_retriever(inventory_data, "system_info", query_vector)
     
     # Answer the query
-    return rag_chain.invoke(prompt)
+    return build_chain(retriever).invoke(prompt)
 
 # Other category functions (ask_cat2, ask_cat3, ask_cat4) remain unchanged
 
@@ -147,64 +352,63 @@ def ask_cat2(prompt):
 
     raw_data = m_monitor_system_analyzer.main()
     
-    documents = [Document(page_content=raw_data, metadata={"source": raw_data})]
-    
-    # Split documents
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=300, chunk_overlap=50)
-    splits = text_splitter.split_documents(documents)
-    
-    # Create vector store and retriever with custom embeddings
-    embedding = SentenceTransformerEmbeddings('all-MiniLM-L6-v2')
-    vectorstore = Chroma.from_documents(documents=splits, embedding=embedding)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 1})
-    
-    # Define prompt template
-    template = """Answer the question based only on the following context:
-    {context}
-    
-    Question: {question}
-    """
-    prompt_template = ChatPromptTemplate.from_template(template)
-    
-    # Initialize LLM
-    llm = ChatXAI(model_name="grok-3-latest", temperature=0)
-    
-    # Set up RAG chain
-    rag_chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | prompt_template
-        | llm
-        | StrOutputParser()
-    )
+    retriever = content_retriever(raw_data, "monitor")
     
     # Answer the query
-    return rag_chain.invoke(prompt)
+    return build_chain(retriever).invoke(prompt)
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as file:
+        return file.read()
 
+SYSTEM_INFO_PATH = "system_info.txt"
+SYSTEM_INFO_TTL = 60  # Seconds a collected system_info.txt is fresh enough to answer from
+
+def refresh_system_info():
+    """Run collect_data unless system_info.txt was written within SYSTEM_INFO_TTL seconds."""
+    try:
+        if time.time() - os.path.getmtime(SYSTEM_INFO_PATH) <= SYSTEM_INFO_TTL:
+            return
+    except OSError:
+        pass  # Missing: collect it
+    collect_data.collect()
 
 def ask_cat3(prompt):
     """Handle category 4: Component similarity (placeholder)."""
     #Run uprade_recommender
     #Run 1
     #Run a general budget of 10,000
-    collect_data.main()
+    refresh_system_info()
     
     return upgrade_recommender_2.main(chat_bot=True)
 
 def ask_category(prompt):
+    """Answer from the cache when the question was asked recently, otherwise route it."""
+    answer, vector = answers.get(prompt)
+    if answer is not None:
+        return answer
+    answer = route_category(prompt, vector)
+    if isinstance(answer, str) and not answer.startswith(("Error", "Sorry")):  # Failures are retried next time
+        answers.put(prompt, answer, vector)
+    return answer
+
+def route_category(prompt, query_vector=None):
     """Main function to route query to appropriate RAG system."""
     cat_response = ask_grok_cat(prompt)
     cat = extract_category(cat_response)
     
     if cat == 1:
-        collect_data.main()
-        timeout = 10  # Maximum wait time in seconds
-        start_time = time.time()
-        while not os.path.exists("system_info.txt"):
-            if time.time() - start_time > timeout:
-                return f"Error: Timed out waiting for file to be created."
-
-        return ask_cat1(prompt) + "<br> <b>Complete system information can be found at system_info.txt of this repository</b>"
+        # Embed the question while system_info.txt is being refreshed; retrieval needs both
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            collecting = executor.submit(refresh_system_info)
+            if query_vector is None:
+                query_vector = executor.submit(embedding.embed_query, prompt).result()
+            collecting.result()  # collect_data writes the file before returning
+        if not os.path.exists(SYSTEM_INFO_PATH):
+            return "Error: system_info.txt was not created."
+
+        return ask_cat1(prompt, query_vector) + "<br> <b>Complete system information can be found at system_info.txt of this repository</b>"
     elif cat == 2:
         return ask_cat2(prompt)
     elif cat == 3:
@@ -216,6 +420,12 @@ def ask_category(prompt):
 def main(prompt):
     return ask_category(prompt)
 
+def warmup():
+    """Pay the one-off costs before the first question: first inference and the current system_info.txt index."""
+    embedding.embed_query("warmup")
+    if os.path.exists(SYSTEM_INFO_PATH):
+        get_index(read_text(SYSTEM_INFO_PATH), "system_info")
+
 #if __name__ == "__main__":
     #query = "Can you fine tune or improve the performance of the systems?"
     #answer = ask_category(query)
@@ -1,4 +1,5 @@
 from flask import Flask, jsonify, request, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from m_monitor_system import fetch_thresholds_from_grok, get_hardware_context
 from flask_socketio import SocketIO
 import os
@@ -6,18 +7,49 @@ import json
 import threading
 import time
 from datetime import datetime
+from collections import deque
 import subprocess
 import requests
 import hashlib
-from m_monitor_system import collect_metrics
+import uuid
+import queue
+import re
+import shlex
+from functools import lru_cache
+import copy
+from m_monitor_system import collect_metrics, append_log_entry, read_log_entries
 from performance_optimizer import locate_file as perf_locate_file, check_config_age, get_profile_sections, get_dynamic_metrics, analyze_system as perf_analyze_system, get_grok_targets, collect_validation_metrics, apply_tuning
 from upgrade_recommender import locate_file as upgrade_locate_file, parse_system_info, generate_summary, analyze_system as upgrade_analyze_system, post_report_qa, CATEGORIES, save_outputs
 import sys
 import markdown
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 import rag_implement_v3
+import collect_data
 import shutil
 
+try:
+    import orjson  # Optional: faster parsing of settings, config and log files
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads  # Both accept bytes or str
+
+DIR_LISTING_TTL = 5.0  # Seconds a folder listing answers locate_file calls that don't ask for real_time
+_dir_listings = {}  # parent dir -> (monotonic time listed, frozenset of entry names)
+
+def list_directory(parent, fresh=False):
+    """Names in parent (empty if missing or unreadable), re-listed when fresh or older than the TTL."""
+    now = time.monotonic()
+    cached = _dir_listings.get(parent)
+    if not fresh and cached and now - cached[0] < DIR_LISTING_TTL:
+        return cached[1]
+    try:
+        with os.scandir(parent) as entries:
+            names = frozenset(entry.name for entry in entries)
+    except OSError:
+        names = frozenset()
+    _dir_listings[parent] = (now, names)
+    return names
 
 def locate_file(filename, real_time=False):
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -28,15 +60,12 @@ def locate_file(filename, real_time=False):
         os.path.expanduser(os.path.join("~", filename)),
         os.path.expanduser(os.path.join("~", "LinuxVM", filename)),
     ]
+    # One listing per candidate folder answers every filename looked up in it within the TTL;
+    # real_time callers always get a fresh listing
     for path in possible_paths:
-        try:
-            if real_time:
-                os.stat(path)  # Force a fresh filesystem check
-            if os.path.exists(path):
-                print(f"locate_file: Found {filename} at {path} (real_time={real_time})")
-                return path
-        except (OSError, FileNotFoundError):
-            continue
+        if os.path.basename(path) in list_directory(os.path.dirname(path), fresh=real_time):
+            print(f"locate_file: Found {filename} at {path} (real_time={real_time})")
+            return path
     print(f"locate_file: Could not find {filename} in any path (real_time={real_time})")
     return None
 
@@ -44,55 +73,75 @@ def is_valid_metric(metric):
     output = run_command(metric["command"])
     if output is None:
         return False
+    output = output.strip()
     if metric["type"] == "dynamic_single":
         try:
-            float(output.strip())
+            float(output)
             return True
         except ValueError:
             return False
-    return bool(output.strip())
+    return bool(output)
+
 
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify() and request.json through orjson; values orjson can't encode fall back to the default."""
+
+    def dumps(self, obj, **kwargs):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__, static_folder='.')
+if orjson is not None:
+    app.json = OrjsonProvider(app)  # Every jsonify() call site encodes through orjson unchanged
+# Behind Apache mod_xsendfile (or nginx mapping X-Sendfile to X-Accel-Redirect), downloads are sent by the
+# proxy with an empty body from Flask; without such a proxy clients would get empty files, so it is opt-in
+app.use_x_sendfile = os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
 socketio = SocketIO(app, cors_allowed_origins="*")  # Allow all origins for development
 
 # Constants
 DEFAULT_SETTINGS_PATH = "monitor_settings.json"
-DEFAULT_LOG_PATH = "monitor_log.json"
+DEFAULT_LOG_PATH = "monitor_log.json"  # JSON Lines, shared with m_monitor_system's log helpers
 METRICS_CONFIG_PATH = "metrics_config.json"
 TUNE_LOG_PATH = "tune_log.txt"
 
 # Global state
 monitoring_active = False
 background_monitor_thread = None
-metrics_history = []
+metrics_history = deque(maxlen=10)  # Only the latest entries are ever sent to clients
+_json_cache = {}  # path -> ((st_mtime_ns, st_size), parsed data)
+collect_jobs = {}  # job id -> {"status": "running" | "done" | "error", "data" or "error"}, oldest first
+collect_lock = threading.Lock()
+MAX_COLLECT_JOBS = 10
 
 @app.route('/api/available_metrics', methods=['GET', 'POST'])
 def available_metrics():
-    metrics_config = load_json(METRICS_CONFIG_PATH, {"sections": [{"metrics": []}]})
-    settings = load_json(DEFAULT_SETTINGS_PATH, {"general": {"interval": 5, "max_rows": 5, "ping_hosts": ["google.com"]}, "metrics": []})
+    settings = load_json(DEFAULT_SETTINGS_PATH, {"general": {"interval": 5, "max_rows": 5, "ping_hosts": ["google.com"]}, "metrics": []}, mutable=request.method == 'POST')
     
     if request.method == 'GET':
         try:
-            dynamic_single_metrics = [
-                m["name"] for section in metrics_config.get("sections", [])
-                for m in section.get("metrics", []) if m.get("type") == "dynamic_single" and "name" in m
-            ]
+            dynamic_single_metrics = dynamic_single_names()
             enabled_metrics = {m["name"] for m in settings.get("metrics", []) if m.get("enabled", False) and "name" in m}
+            # One pass over the settings instead of a scan per metric; each metric gets its own thresholds
+            thresholds_by_name = {
+                m["name"]: m.get("thresholds", {"alert": True, "max": None, "min": None})
+                for m in settings.get("metrics", []) if "name" in m
+            }
             available = []
-            for section in metrics_config.get("sections", []):
-                for m in section.get("metrics", []):
-                    if m.get("type") == "dynamic_single" and "name" in m:
-                        thresholds = next((m["thresholds"] for m in settings["metrics"] if m.get("name") == m["name"]), {"alert": True, "max": None, "min": None})
-                        available.append({
-                            "name": m["name"],
-                            "subsection": m.get("subsection", ""),
-                            "enabled": m["name"] in enabled_metrics,
-                            "thresholds": thresholds
-                        })
-            settings_metrics = [m["name"] for m in settings.get("metrics", []) if "name" in m]
-            diff = len(dynamic_single_metrics) != len(set(settings_metrics))
-            settings_exists = os.path.exists(DEFAULT_SETTINGS_PATH) and bool(load_json(DEFAULT_SETTINGS_PATH).get("metrics"))
+            for m in dynamic_single_config():
+                thresholds = thresholds_by_name.get(m["name"], {"alert": True, "max": None, "min": None})
+                available.append({
+                    "name": m["name"],
+                    "subsection": m.get("subsection", ""),
+                    "enabled": m["name"] in enabled_metrics,
+                    "thresholds": thresholds
+                })
+            diff = len(dynamic_single_metrics) != len(thresholds_by_name)
+            settings_exists = bool(settings.get("metrics"))  # A missing or unreadable file loads as the default, which has none
             return jsonify({
                 "success": True,
                 "metrics": available,
@@ -107,10 +156,7 @@ def available_metrics():
     elif request.method == 'POST':
         data = request.json
         if data.get("generate") and not settings.get("metrics"):
-            dynamic_single_metrics = [
-                m["name"] for section in metrics_config.get("sections", [])
-                for m in section.get("metrics", []) if m.get("type") == "dynamic_single" and "name" in m
-            ]
+            dynamic_single_metrics = dynamic_single_names()
             settings["metrics"] = [
                 {"name": m, "enabled": m == "ping_rtt", "thresholds": {"alert": True, "max": 100.0 if m == "ping_rtt" else None, "min": 0.0 if m == "ping_rtt" else None}}
                 for m in dynamic_single_metrics
@@ -120,21 +166,7 @@ def available_metrics():
             return jsonify({"success": True, "message": "Settings generated"})
         
         if data.get("regenerate"):
-            dynamic_single_metrics = [
-                m["name"] for section in metrics_config.get("sections", [])
-                for m in section.get("metrics", []) if m.get("type") == "dynamic_single" and "name" in m
-            ]
-            current_metrics = {m["name"]: m for m in settings.get("metrics", []) if "name" in m}
-            settings["metrics"] = []
-            for metric_name in dynamic_single_metrics:
-                current = current_metrics.get(metric_name, {})
-                enabled = current.get("enabled", metric_name == "ping_rtt")
-                thresholds = current.get("thresholds", {"alert": True, "max": 100.0 if metric_name == "ping_rtt" else None, "min": 0.0 if metric_name == "ping_rtt" else None})
-                settings["metrics"].append({
-                    "name": metric_name,
-                    "enabled": enabled,
-                    "thresholds": thresholds
-                })
+            settings["metrics"] = merged_metric_settings(settings, dynamic_single_names())
             save_json(settings, DEFAULT_SETTINGS_PATH)
             socketio.emit('settings_updated')
             return jsonify({"success": True, "message": "Settings regenerated"})
@@ -142,47 +174,46 @@ def available_metrics():
         metric_name = data.get("name")
         action = data.get("action")
         if metric_name and action in ["enable", "disable"]:
-            metric_found = False
-            for metric in settings.get("metrics", []):
-                if metric.get("name") == metric_name:
-                    metric["enabled"] = (action == "enable")
-                    if not metric.get("thresholds"):
-                        metric["thresholds"] = {"alert": True, "max": None, "min": None}
-                    metric_found = True
-                    break
-            if not metric_found:
-                settings["metrics"].append({
+            metric = metric_settings_by_name(settings).get(metric_name)
+            if metric is None:
+                settings.setdefault("metrics", []).append({
                     "name": metric_name,
                     "enabled": (action == "enable"),
                     "thresholds": {"alert": True, "max": None, "min": None}
                 })
+            else:
+                metric["enabled"] = (action == "enable")
+                if not metric.get("thresholds"):
+                    metric["thresholds"] = {"alert": True, "max": None, "min": None}
             save_json(settings, DEFAULT_SETTINGS_PATH)
             socketio.emit('settings_updated')
             return jsonify({"success": True, "message": f"{metric_name} {'enabled' if action == 'enable' else 'disabled'}"})
         return jsonify({"success": False, "message": "Invalid request"}), 400
 
+def metric_settings_by_name(settings):
+    """Index the settings' metric records by name; the records are shared, so edits land in settings."""
+    return {m["name"]: m for m in settings.get("metrics", []) if "name" in m}
+
+def merged_metric_settings(settings, names):
+    """One record per metric name, keeping existing enabled flags and thresholds; new metrics get the defaults."""
+    current_metrics = metric_settings_by_name(settings)
+    merged = []
+    for metric_name in names:
+        current = current_metrics.get(metric_name, {})
+        merged.append({
+            "name": metric_name,
+            "enabled": current.get("enabled", metric_name == "ping_rtt"),
+            "thresholds": current.get("thresholds", {"alert": True, "max": 100.0 if metric_name == "ping_rtt" else None, "min": 0.0 if metric_name == "ping_rtt" else None})
+        })
+    return merged
+
 @app.route('/api/regenerate_monitor_settings', methods=['GET'])
 def regenerate_monitor_settings():
     try:
-        metrics_config = load_json(METRICS_CONFIG_PATH, {"sections": [{"metrics": []}]})
-        settings = load_json(DEFAULT_SETTINGS_PATH, {"general": {"interval": 5, "max_rows": 5, "ping_hosts": ["google.com"]}, "metrics": []})
+        settings = load_json(DEFAULT_SETTINGS_PATH, {"general": {"interval": 5, "max_rows": 5, "ping_hosts": ["google.com"]}, "metrics": []}, mutable=True)
         
-        dynamic_single_metrics = [
-            m["name"] for section in metrics_config.get("sections", [])
-            for m in section.get("metrics", []) if m.get("type") == "dynamic_single" and "name" in m
-        ]
-        current_metrics = {m["name"]: m for m in settings.get("metrics", []) if "name" in m}
         general_settings = settings.get("general", {"interval": 5, "max_rows": 5, "ping_hosts": ["google.com"]})
-        settings["metrics"] = []
-        for metric_name in dynamic_single_metrics:
-            current = current_metrics.get(metric_name, {})
-            enabled = current.get("enabled", metric_name == "ping_rtt")
-            thresholds = current.get("thresholds", {"alert": True, "max": 100.0 if metric_name == "ping_rtt" else None, "min": 0.0 if metric_name == "ping_rtt" else None})
-            settings["metrics"].append({
-                "name": metric_name,
-                "enabled": enabled,
-                "thresholds": thresholds
-            })
+        settings["metrics"] = merged_metric_settings(settings, dynamic_single_names())
         settings["general"] = general_settings
         save_json(settings, DEFAULT_SETTINGS_PATH)
         socketio.emit('settings_updated')
@@ -199,12 +230,7 @@ def grok_thresholds():
         if not metric_name:
             return jsonify({"success": False, "error": "Metric name is required"}), 400
         
-        metrics_config = load_json(METRICS_CONFIG_PATH, {"sections": [{"metrics": []}]})
-        dynamic_metrics = [
-            m["name"] for section in metrics_config.get("sections", [])
-            for m in section.get("metrics", []) if m.get("type") == "dynamic_single"
-        ]
-        if metric_name not in dynamic_metrics:
+        if metric_name not in dynamic_single_names():
             return jsonify({"success": False, "error": f"Invalid metric: {metric_name}"}), 400
         
         hardware = get_hardware_context(metric_name)
@@ -224,28 +250,85 @@ def grok_thresholds():
             error_msg = "API key invalid. Check api_key.txt or contact the administrator."
         return jsonify({"success": False, "error": error_msg}), 500
 
-def load_json(path, default=None):
-    if not os.path.exists(path):
+def config_version():
+    """(mtime, size) of metrics_config.json, or None when it is missing."""
+    try:
+        st = os.stat(METRICS_CONFIG_PATH)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+@lru_cache(maxsize=4)
+def _dynamic_single_config(version):
+    # Keyed on the file version so an edited config is picked up; the body reloads it
+    metrics_config = load_json(METRICS_CONFIG_PATH, {"sections": [{"metrics": []}]})
+    return tuple(
+        m for section in metrics_config.get("sections", [])
+        for m in section.get("metrics", []) if m.get("type") == "dynamic_single" and "name" in m
+    )
+
+def dynamic_single_config():
+    """dynamic_single metrics of metrics_config.json in config order (shared; don't modify)."""
+    return _dynamic_single_config(config_version())
+
+@lru_cache(maxsize=4)
+def _dynamic_single_names(version):
+    return tuple(m["name"] for m in _dynamic_single_config(version))
+
+def dynamic_single_names():
+    return _dynamic_single_names(config_version())
+
+def load_json(path, default=None, mutable=False):
+    """Parsed JSON from path, re-read only when the file changed since the last call.
+
+    The cached object is shared between requests; pass mutable=True to get a private copy to edit.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
         return default if default is not None else {}
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = _json_cache.get(path)
+        if cached is not None and cached[0] == key:
+            data = cached[1]
+        else:
+            with open(path, 'rb') as f:
+                data = json_loads(f.read())
+            _json_cache[path] = (key, data)
+        return copy.deepcopy(data) if mutable else data
     except Exception as e:
         print(f"Error loading {path}: {e}")
         return default if default is not None else {}
 
 def save_json(data, path):
+    _json_cache.pop(path, None)
     try:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        if orjson is not None:
+            with open(path, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
     except Exception as e:
         raise Exception(f"Error writing {path}: {e}")
 
+_CMD_ENV = {**os.environ, "PATH": "/bin:/usr/bin:/usr/local/bin"}  # Built once, shared by every command
+_NEEDS_SHELL = re.compile(r"""[|&;<>()$`\\"'*?\[\]#~{}!\n]""")
+
+@lru_cache(maxsize=None)
+def _split_command(cmd):
+    """argv tuple for a command string that needs no shell features, else None."""
+    if _NEEDS_SHELL.search(cmd):
+        return None
+    argv = shlex.split(cmd)
+    return tuple(argv) if argv and "=" not in argv[0] else None
+
 def run_command(cmd):
     try:
-        env = os.environ.copy()
-        env["PATH"] = "/bin:/usr/bin:/usr/local/bin"
-        proc = subprocess.run(cmd, capture_output=True, text=True, shell=True, check=False, env=env)
+        # Plain commands are exec'd directly; only pipelines, redirects etc. pay for a /bin/sh
+        argv = _split_command(cmd)
+        proc = subprocess.run(list(argv) if argv else cmd, capture_output=True, text=True, shell=not argv, check=False, env=_CMD_ENV)
         if proc.returncode != 0:
             print(f"Warning: Command failed - Return code: {proc.returncode}, Error: {proc.stderr.strip()}")
             return ""
@@ -257,11 +340,61 @@ def run_command(cmd):
         print(f"Warning: Command failed - {e}")
         return ""
 
+PROGRESS_MIN_INTERVAL = 0.1  # Seconds between forwarded validation sampling updates
+progress_queue = queue.Queue()
+last_progress = {}  # event -> last queued payload
+progress_emitter_task = None
+progress_emitter_lock = threading.Lock()
+
+def drain_progress_queue():
+    """Send every queued progress event, in order, then end; the next queued event starts a new task."""
+    global progress_emitter_task
+    while True:
+        try:
+            event, payload = progress_queue.get_nowait()
+        except queue.Empty:
+            with progress_emitter_lock:
+                if progress_queue.empty():  # Checked under the lock queue_progress puts under
+                    progress_emitter_task = None
+                    return
+            continue
+        socketio.emit(event, payload)
+
+def queue_progress(event, payload):
+    """Queue one progress event for the emitter task, skipping a repeat of the event's previous payload.
+
+    Errors are always sent, so a request that fails the same way twice still reports it."""
+    global progress_emitter_task
+    with progress_emitter_lock:
+        if not payload.get("error") and last_progress.get(event) == payload:
+            return
+        last_progress[event] = payload
+        progress_queue.put((event, payload))
+        if progress_emitter_task is None:
+            progress_emitter_task = socketio.start_background_task(drain_progress_queue)
+
+def queued_emitter(event):
+    """progress_callback that hands payloads to the emitter task instead of emitting from the caller's thread."""
+    return lambda payload: queue_progress(event, payload)
+
+def coalesced(callback, interval=PROGRESS_MIN_INTERVAL):
+    """Forward at most one payload per interval; errors always go through."""
+    last_sent = [float("-inf")]
+    def forward(payload):
+        now = time.monotonic()
+        if payload.get("error") or now - last_sent[0] >= interval:
+            last_sent[0] = now
+            callback(payload)
+    return forward
+
+def _progress(step, percent, error=None):
+    """Report a performance run/tune step on the same queue as the optimizer's own callbacks, so they stay in order."""
+    queue_progress('progress_update', {"step": step, "percent": percent, "error": error})
+
 def background_monitor_loop():
     global monitoring_active, metrics_history
     settings = load_json(DEFAULT_SETTINGS_PATH, {"general": {"interval": 5}, "metrics": []})
     metrics_config = load_json(METRICS_CONFIG_PATH, {"sections": [{"metrics": []}]})
-    log_data = load_json(DEFAULT_LOG_PATH, [])
     while monitoring_active:
         metrics, violations = collect_metrics(settings, metrics_config)
         if metrics:
@@ -271,33 +404,74 @@ def background_monitor_loop():
                 "violations": violations
             }
             metrics_history.append(entry)
-            log_data.append(entry)
-            save_json(log_data, DEFAULT_LOG_PATH)
+            append_log_entry(entry)  # One appended line per tick instead of rewriting the whole log
             print(f"Emitting metrics_update: {entry}")
-            socketio.emit('metrics_update', metrics_history[-10:])
+            socketio.emit('metrics_update', list(metrics_history))
         else:
             print("No metrics collected in this cycle")
-        time.sleep(settings["general"].get("interval", 5))
+        socketio.sleep(settings["general"].get("interval", 5))  # Yields to the event loop under eventlet/gevent
 
 @app.route('/')
 def index():
     return send_from_directory('.', 'index.html')
 
-@app.route('/collect', methods=['GET'])
+def run_collect():
+    # In-process: no interpreter start-up or re-import of collect_data's dependencies per request
+    try:
+        output_path = collect_data.collect()
+    except SystemExit as e:  # collect_data exits on unrecoverable errors, which must not end a server thread
+        raise RuntimeError(f"collect_data failed (exit status {e.code})") from e
+    with open(output_path, 'r') as f:
+        return f.read()
+
+def run_collect_job(job_id):
+    job = collect_jobs[job_id]
+    try:
+        job.update(status="done", data=run_collect())
+    except Exception as e:
+        job.update(status="error", error=str(e))
+    socketio.emit('collect_done', {"job_id": job_id, **job})
+
+@app.route('/collect', methods=['GET', 'POST'])
 def collect():
+    if request.method == 'POST':
+        # Run collect_data in the background so the worker is free; clients poll the status
+        # endpoint or wait for 'collect_done'. A run already in progress is shared, not restarted.
+        with collect_lock:
+            running = next((job_id for job_id, job in collect_jobs.items() if job["status"] == "running"), None)
+            if running:
+                return jsonify(success=True, job_id=running)
+            job_id = uuid.uuid4().hex
+            collect_jobs[job_id] = {"status": "running"}
+            while len(collect_jobs) > MAX_COLLECT_JOBS:
+                del collect_jobs[next(iter(collect_jobs))]
+        threading.Thread(target=run_collect_job, args=(job_id,), daemon=True).start()
+        return jsonify(success=True, job_id=job_id), 202
     try:
-        result = subprocess.run(['python3', 'collect_data.py'], capture_output=True, text=True, check=True)
-        with open('system_info.txt', 'r') as f:
-            data = f.read()
-        return jsonify(success=True, data=data)
+        return jsonify(success=True, data=run_collect())
     except Exception as e:
         return jsonify(success=False, error=str(e)), 500
 
+@app.route('/collect/status/<job_id>', methods=['GET'])
+def collect_status(job_id):
+    job = collect_jobs.get(job_id)
+    if job is None:
+        return jsonify(success=False, error="Unknown collection job"), 404
+    return jsonify(success=True, job_id=job_id, **job)
+
+_markdown = threading.local()  # Markdown instances keep per-document state, so each worker thread gets its own
+
+def markdown_converter():
+    converter = getattr(_markdown, "converter", None)
+    if converter is None:
+        converter = _markdown.converter = markdown.Markdown()
+    return converter
+
 @app.route('/grok', methods=['POST'])
 def grok():
     prompt = request.json.get('prompt', '')
     try:
-        answer = markdown.markdown(rag_implement_v3.main(prompt))
+        answer = markdown_converter().reset().convert(rag_implement_v3.main(prompt))
         return jsonify(success=True, response=answer)
     except Exception as e:
         return jsonify(success=False, error=str(e)), 500
@@ -306,7 +480,7 @@ def grok():
 def settings():
     if request.method == 'GET':
         settings = load_json(DEFAULT_SETTINGS_PATH, None)
-        settings_exists = os.path.exists(DEFAULT_SETTINGS_PATH) and bool(load_json(DEFAULT_SETTINGS_PATH, {}).get("metrics", []))
+        settings_exists = settings is not None and bool(settings.get("metrics"))
         if settings is None:
             return jsonify({
                 "success": True,
@@ -360,33 +534,43 @@ def monitor():
     action = request.json.get('action')
     if action == 'start_monitoring' and not monitoring_active:
         monitoring_active = True
-        background_monitor_thread = threading.Thread(target=background_monitor_loop)
-        background_monitor_thread.start()
+        background_monitor_thread = socketio.start_background_task(background_monitor_loop)
         return jsonify({"success": True, "message": "Monitoring started"})
     elif action == 'stop_monitoring' and monitoring_active:
         monitoring_active = False
         if background_monitor_thread:
-            background_monitor_thread.join()
+            # Threads and greenlets have join(); eventlet green threads only have wait()
+            wait = getattr(background_monitor_thread, 'join', None) or background_monitor_thread.wait
+            wait()
         background_monitor_thread = None
         return jsonify({"success": True, "message": "Monitoring stopped"})
     return jsonify({"success": False, "message": "Invalid action or state"})
 
 @app.route('/api/logs', methods=['GET'])
 def logs():
-    logs = load_json(DEFAULT_LOG_PATH, [])
-    return jsonify({"success": True, "logs": logs[-10:]})
+    logs = read_log_entries(10)  # Reads only the tail of the log
+    return jsonify({"success": True, "logs": logs})
 
 @app.route('/api/view_monitor_log', methods=['GET'])
 def view_monitor_log():
     try:
-        if not os.path.exists(DEFAULT_LOG_PATH):
+        try:
+            st = os.stat(DEFAULT_LOG_PATH)
+        except FileNotFoundError:
             return jsonify({"success": False, "error": "monitor_log.json not found"}), 404
+        # The log only changes by being written, so mtime and size identify a version of it;
+        # a client that already has this version gets a bodyless 304, and Range requests resume
+        etag = hashlib.blake2b(f"{st.st_mtime_ns}-{st.st_size}".encode(), digest_size=8).hexdigest()
+        if etag in request.if_none_match:
+            return '', 304, {'ETag': f'"{etag}"'}
         return send_from_directory(
             os.path.dirname(DEFAULT_LOG_PATH),
             os.path.basename(DEFAULT_LOG_PATH),
             as_attachment=True,
             download_name='monitor_log.json',
-            mimetype='application/json'
+            mimetype='application/x-ndjson',
+            conditional=True,
+            etag=etag
         )
     except Exception as e:
         print(f"Error serving monitor_log.json: {e}")
@@ -431,6 +615,12 @@ def performance_categories():
         print(f"Error fetching categories: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def requested_sections(config, profile, category):
+    """Section titles for a performance request: the profile's sections, one category, or every section for "All"."""
+    if profile:
+        return get_profile_sections(config, profile)
+    return [category] if category != "All" else [s["title"] for s in config["sections"]]
+
 @app.route('/api/performance/dynamic-metrics', methods=['GET'])
 def performance_dynamic_metrics():
     try:
@@ -439,7 +629,7 @@ def performance_dynamic_metrics():
         if not (profile or category):
             return jsonify({"success": False, "error": "Profile or category required"}), 400
         config = load_json(METRICS_CONFIG_PATH, {"sections": []})
-        sections = get_profile_sections(config, profile) if profile else [category] if category != "All" else [s["title"] for s in config["sections"]]
+        sections = requested_sections(config, profile, category)
         metrics = get_dynamic_metrics(config, sections)
         return jsonify({"success": True, "metrics": [m["name"] for m in metrics]})
     except Exception as e:
@@ -453,26 +643,25 @@ def performance_run():
         profile = data.get('profile', '')
         category = data.get('category', '')
         if not (profile or category):
-            socketio.emit('progress_update', {"step": "Profile or category required", "percent": 0, "error": "Profile or category required"})
+            _progress("Profile or category required", 0, "Profile or category required")
             return jsonify({"success": False, "error": "Profile or category required"}), 400
 
         api_key_path = locate_file("api_key.txt")
         if not api_key_path:
-            socketio.emit('progress_update', {"step": "api_key.txt not found", "percent": 0, "error": "api_key.txt not found"})
+            _progress("api_key.txt not found", 0, "api_key.txt not found")
             return jsonify({"success": False, "error": "api_key.txt not found"}), 400
         with open(api_key_path, "r", encoding="utf-8-sig") as f:
             api_key = f.read().strip()
         if not api_key:
-            socketio.emit('progress_update', {"step": "API key is empty", "percent": 0, "error": "API key is empty"})
+            _progress("API key is empty", 0, "API key is empty")
             return jsonify({"success": False, "error": "API key is empty"}), 400
 
         config_path = locate_file("metrics_config.json")
         if not config_path:
-            socketio.emit('progress_update', {"step": "metrics_config.json not found", "percent": 0, "error": "metrics_config.json not found"})
+            _progress("metrics_config.json not found", 0, "metrics_config.json not found")
             return jsonify({"success": False, "error": "metrics_config.json not found"}), 400
         check_config_age(config_path)
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = load_json(config_path)
 
         system_info_path = locate_file("system_info.txt")
         system_info = None
@@ -480,8 +669,7 @@ def performance_run():
             with open(system_info_path, "r", encoding="utf-8", errors="ignore") as f:
                 system_info = f.read().strip()
 
-        sections = get_profile_sections(config, profile) if profile else [category] if category != "All" else [s["title"] for s in config["sections"]]
-        sections = [s["title"] if isinstance(s, dict) and "title" in s else str(s) for s in sections]
+        sections = requested_sections(config, profile, category)
         dynamic_metrics = get_dynamic_metrics(config, sections)
 
         # Step 1 & 2: Collect and Analyze
@@ -490,13 +678,13 @@ def performance_run():
             try:
                 analysis, recommendations = perf_analyze_system(
                     api_key, {}, system_info, profile or None, sections,
-                    progress_callback=lambda x: socketio.emit('progress_update', x)
+                    progress_callback=queued_emitter('progress_update')
                 )
                 break
             except Exception as e:
                 if attempt == retries - 1:
                     error = f"Analysis failed after {retries} attempts: {e}"
-                    socketio.emit('progress_update', {"step": "Analysis failed", "percent": 50, "error": error})
+                    _progress("Analysis failed", 50, error)
                     return jsonify({"success": False, "error": error}), 500
                 time.sleep(1)
 
@@ -507,22 +695,22 @@ def performance_run():
         if dynamic_metrics:
             pre_metrics = collect_validation_metrics(
                 dynamic_metrics, duration=5,
-                progress_callback=lambda x: socketio.emit('progress_update', x),
+                progress_callback=coalesced(queued_emitter('progress_update')),
                 percent_start=75, percent_end=85
             )
             if pre_metrics:
                 validation = [{"metric": k, "pre": v, "post": "N/A"} for k, v in pre_metrics.items()]
             else:
-                socketio.emit('progress_update', {"step": "No pre-tuning metrics collected", "percent": 80, "error": "No pre-tuning metrics collected"})
+                _progress("No pre-tuning metrics collected", 80, "No pre-tuning metrics collected")
                 print("Warning: No pre-tuning metrics collected")
 
             targets = get_grok_targets(
                 api_key, {}, system_info, profile or None, sections,
-                progress_callback=lambda x: socketio.emit('progress_update', x)
+                progress_callback=queued_emitter('progress_update')
             )
             validation = [{"metric": k, "pre": pre_metrics.get(k, "N/A"), "post": "N/A"} for k in pre_metrics]
 
-        socketio.emit('progress_update', {"step": "Analysis complete", "percent": 100, "error": None})
+        _progress("Analysis complete", 100)
         with open(TUNE_LOG_PATH, "a", encoding="utf-8") as f:
             f.write(f"{datetime.now()}: Ran analysis for {profile or category} ({', '.join(sections)})\n")
 
@@ -537,10 +725,14 @@ def performance_run():
         })
     except Exception as e:
         error = f"Analysis failed: {e}"
-        socketio.emit('progress_update', {"step": "Analysis failed", "percent": 25, "error": error})
+        _progress("Analysis failed", 25, error)
         print(f"Error running analysis: {e}")
         return jsonify({"success": False, "error": error}), 500
 
+# Substring matches on purpose: 'rm' also catches rmmod, 'kill' also catches pkill and killall
+BLOCKED_COMMAND = re.compile(r'kill|rm|reboot', re.IGNORECASE)
+BLOCKED_TITLE = re.compile(r'thermal', re.IGNORECASE)
+
 @app.route('/api/performance/tune', methods=['POST', 'GET'])
 def performance_tune():
     try:
@@ -548,12 +740,12 @@ def performance_tune():
         if request.method == 'GET':
             action = request.args.get('action')
             if action != 'download':
-                socketio.emit('progress_update', {"step": "Invalid action", "percent": 0, "error": "Invalid action"})
+                _progress("Invalid action", 0, "Invalid action")
                 return jsonify({"success": False, "error": "Invalid action"}), 400
 
             tune_script = locate_file("tune_system.sh", real_time=False)
             if not tune_script:
-                socketio.emit('progress_update', {"step": "tune_system.sh not found", "percent": 0, "error": "tune_system.sh not found"})
+                _progress("tune_system.sh not found", 0, "tune_system.sh not found")
                 return jsonify({"success": False, "error": "tune_system.sh not found"}), 404
 
             with open(TUNE_LOG_PATH, "a", encoding="utf-8") as f:
@@ -570,7 +762,7 @@ def performance_tune():
         data = request.json
         action = data.get('action')
         if action not in ['apply', 'download']:
-            socketio.emit('progress_update', {"step": "Invalid action", "percent": 0, "error": "Invalid action"})
+            _progress("Invalid action", 0, "Invalid action")
             return jsonify({"success": False, "error": "Invalid action"}), 400
 
         rec_id = data.get('id')
@@ -579,22 +771,22 @@ def performance_tune():
         recommendations = [rec for rec in data.get('recommendations', []) if rec["id"] == rec_id]
         if not recommendations:
             error_msg = f"Recommendation {rec_id} not found in provided recommendations"
-            socketio.emit('progress_update', {"step": error_msg, "percent": 0, "error": error_msg})
+            _progress(error_msg, 0, error_msg)
             return jsonify({"success": False, "error": error_msg}), 404
         rec = recommendations[0]
 
-        blocklist = ['kill', 'rm', 'reboot']
-        if any(word in ' '.join(rec["commands"]).lower() for word in blocklist) or 'thermal' in rec["title"].lower():
-            socketio.emit('progress_update', {"step": "High-risk command blocked", "percent": 0, "error": "High-risk command blocked. Use script manually."})
+        commands = ' '.join(rec["commands"])
+        if BLOCKED_COMMAND.search(commands) or BLOCKED_TITLE.search(rec["title"]):
+            _progress("High-risk command blocked", 0, "High-risk command blocked. Use script manually.")
             return jsonify({"success": False, "error": "High-risk command blocked. Use script manually."}), 403
 
         inputs = data.get('inputs', {})
         app_path = inputs.get("appPath", "")
-        if "/path/to/hft_app" in ' '.join(rec["commands"]) and not app_path:
-            socketio.emit('progress_update', {"step": "Application path required", "percent": 0, "error": "Application path required for numactl"})
+        if "/path/to/hft_app" in commands and not app_path:
+            _progress("Application path required", 0, "Application path required for numactl")
             return jsonify({"success": False, "error": "Application path required for numactl"}), 400
         if app_path and not os.access(app_path, os.X_OK):
-            socketio.emit('progress_update', {"step": "Invalid application path", "percent": 0, "error": "Invalid or non-executable application path"})
+            _progress("Invalid application path", 0, "Invalid or non-executable application path")
             return jsonify({"success": False, "error": "Invalid or non-executable application path"}), 400
 
         # Step 4 & 5: Tune and Validate Post-Tuning
@@ -602,12 +794,12 @@ def performance_tune():
         pre_metrics = data.get('pre_metrics', {})
         tuning_applied, validation = apply_tuning(
             [rec], inputs, dynamic_metrics, pre_metrics,
-            progress_callback=lambda x: socketio.emit('progress_update', x)
+            progress_callback=queued_emitter('progress_update')
         )
 
         if not tuning_applied:
             error = str(tuning_applied) if isinstance(tuning_applied, str) else "Tuning failed"
-            socketio.emit('progress_update', {"step": error, "percent": 70, "error": error})
+            _progress(error, 70, error)
             return jsonify({"success": False, "error": error}), 500
 
         with open(TUNE_LOG_PATH, "a", encoding="utf-8") as f:
@@ -615,7 +807,7 @@ def performance_tune():
         return jsonify({"success": True, "validation": validation})
     except Exception as e:
         error = f"Tuning failed: {e}"
-        socketio.emit('progress_update', {"step": error, "percent": 70, "error": error})
+        _progress(error, 70, error)
         print(f"Error tuning: {e}")
         return jsonify({"success": False, "error": error}), 500
 
@@ -648,38 +840,38 @@ def upgrade_run():
         category = data.get('category')
         budget = data.get('budget')
         if analysis_type == 'specific' and not category:
-            socketio.emit('upgrade_progress_update', {"step": "Category required for specific analysis", "percent": 0, "error": "Category required for specific analysis"})
+            queue_progress('upgrade_progress_update', {"step": "Category required for specific analysis", "percent": 0, "error": "Category required for specific analysis"})
             return jsonify({"success": False, "error": "Category required for specific analysis"}), 400
 
         api_key_path = locate_file("api_key.txt")
         if not api_key_path:
-            socketio.emit('upgrade_progress_update', {"step": "api_key.txt not found", "percent": 0, "error": "api_key.txt not found"})
+            queue_progress('upgrade_progress_update', {"step": "api_key.txt not found", "percent": 0, "error": "api_key.txt not found"})
             return jsonify({"success": False, "error": "api_key.txt not found"}), 400
         with open(api_key_path, "r", encoding="utf-8-sig") as f:
             api_key = f.read().strip()
         if not api_key:
-            socketio.emit('upgrade_progress_update', {"step": "API key is empty", "percent": 0, "error": "API key is empty"})
+            queue_progress('upgrade_progress_update', {"step": "API key is empty", "percent": 0, "error": "API key is empty"})
             return jsonify({"success": False, "error": "API key is empty"}), 400
 
         system_info_path = locate_file("system_info.txt")
         if not system_info_path:
-            socketio.emit('upgrade_progress_update', {"step": "system_info.txt not found", "percent": 0, "error": "system_info.txt not found"})
+            queue_progress('upgrade_progress_update', {"step": "system_info.txt not found", "percent": 0, "error": "system_info.txt not found"})
             return jsonify({"success": False, "error": "system_info.txt not found"}), 400
 
         sections, system_data = parse_system_info(system_info_path)
         if not sections:
-            socketio.emit('upgrade_progress_update', {"step": "system_info.txt is empty or malformed", "percent": 0, "error": "system_info.txt is empty or malformed"})
+            queue_progress('upgrade_progress_update', {"step": "system_info.txt is empty or malformed", "percent": 0, "error": "system_info.txt is empty or malformed"})
             return jsonify({"success": False, "error": "system_info.txt is empty or malformed"}), 400
 
         data_hash = hashlib.sha256(system_data.encode("utf-8")).hexdigest()
         data = generate_summary(sections) if analysis_type == 'general' else sections.get(category, "")
         if not data:
-            socketio.emit('upgrade_progress_update', {"step": f"No data for {category or 'general analysis'}", "percent": 0, "error": f"No data for {category or 'general analysis'}"})
+            queue_progress('upgrade_progress_update', {"step": f"No data for {category or 'general analysis'}", "percent": 0, "error": f"No data for {category or 'general analysis'}"})
             return jsonify({"success": False, "error": f"No data for {category or 'general analysis'}"}), 400
 
         analysis, recommendations = upgrade_analyze_system(
             api_key, data, analysis_type, category, budget,
-            progress_callback=lambda x: socketio.emit('upgrade_progress_update', x)
+            progress_callback=queued_emitter('upgrade_progress_update')
         )
 
         output_dir = os.path.dirname(system_info_path)
@@ -693,7 +885,7 @@ def upgrade_run():
             "system_data": system_data
         })
     except Exception as e:
-        socketio.emit('upgrade_progress_update', {"step": "Analysis failed", "percent": 0, "error": str(e)})
+        queue_progress('upgrade_progress_update', {"step": "Analysis failed", "percent": 0, "error": str(e)})
         print(f"Error running upgrade analysis: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -706,27 +898,27 @@ def upgrade_qa():
         recommendations = data.get('recommendations', [])
         system_data = data.get('system_data')
         if not question:
-            socketio.emit('upgrade_qa_update', {"step": "Question required", "percent": 0, "error": "Question required"})
+            queue_progress('upgrade_qa_update', {"step": "Question required", "percent": 0, "error": "Question required"})
             return jsonify({"success": False, "error": "Question required"}), 400
 
         api_key_path = locate_file("api_key.txt")
         if not api_key_path:
-            socketio.emit('upgrade_qa_update', {"step": "api_key.txt not found", "percent": 0, "error": "api_key.txt not found"})
+            queue_progress('upgrade_qa_update', {"step": "api_key.txt not found", "percent": 0, "error": "api_key.txt not found"})
             return jsonify({"success": False, "error": "api_key.txt not found"}), 400
         with open(api_key_path, "r", encoding="utf-8-sig") as f:
             api_key = f.read().strip()
         if not api_key:
-            socketio.emit('upgrade_qa_update', {"step": "API key is empty", "percent": 0, "error": "API key is empty"})
+            queue_progress('upgrade_qa_update', {"step": "API key is empty", "percent": 0, "error": "API key is empty"})
             return jsonify({"success": False, "error": "API key is empty"}), 400
 
         answer = post_report_qa(
             api_key, analysis, recommendations, "", "", "", "", None, system_data, question,
-            progress_callback=lambda x: socketio.emit('upgrade_qa_update', x)
+            progress_callback=queued_emitter('upgrade_qa_update')
         )
 
         return jsonify({"success": True, "answer": answer})
     except Exception as e:
-        socketio.emit('upgrade_qa_update', {"step": "Q&A failed", "percent": 0, "error": str(e)})
+        queue_progress('upgrade_qa_update', {"step": "Q&A failed", "percent": 0, "error": str(e)})
         print(f"Error processing Q&A: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -778,7 +970,7 @@ def add_custom_metric():
         if not is_valid_metric(metric):
             return jsonify({"success": False, "error": "Invalid command output"}), 400
         
-        config = load_json(METRICS_CONFIG_PATH, {"custom_metrics": [], "sections": []})
+        config = load_json(METRICS_CONFIG_PATH, {"custom_metrics": [], "sections": []}, mutable=True)
         if any(m["name"] == metric["name"] for m in config.get("custom_metrics", [])):
             return jsonify({"success": False, "error": "Metric name already exists"}), 400
         
@@ -800,7 +992,7 @@ def add_custom_metric():
 @app.route('/api/custom_metrics/<name>', methods=['DELETE'])
 def delete_custom_metric(name):
     try:
-        config = load_json(METRICS_CONFIG_PATH, {"custom_metrics": [], "sections": []})
+        config = load_json(METRICS_CONFIG_PATH, {"custom_metrics": [], "sections": []}, mutable=True)
         config["custom_metrics"] = [m for m in config["custom_metrics"] if m["name"] != name]
         for section in config["sections"]:
             if section["title"] == "Custom Metrics":
@@ -815,4 +1007,6 @@ def delete_custom_metric(name):
         return jsonify({"success": False, "error": str(e)}), 500
 
 if __name__ == '__main__':
+    # First inference and the system_info index are built off the main thread so startup isn't delayed
+    threading.Thread(target=rag_implement_v3.warmup, daemon=True).start()
     socketio.run(app, host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file